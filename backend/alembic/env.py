@@ -29,7 +29,7 @@ target_metadata = Base.metadata
 # ... etc.
 
 def get_url():
-    return f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_SERVER}/{settings.POSTGRES_DB}"
+    return f"postgresql+psycopg2://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_SERVER}/{settings.POSTGRES_DB}"
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
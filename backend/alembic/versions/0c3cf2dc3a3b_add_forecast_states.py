@@ -0,0 +1,37 @@
+"""add forecast_states
+
+Revision ID: 0c3cf2dc3a3b
+Revises:
+Create Date: 2026-10-18 14:34:25.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c3cf2dc3a3b'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'forecast_states',
+        sa.Column('sku_id', sa.String(), nullable=False),
+        sa.Column('bucket_date', sa.Date(), nullable=False),
+        sa.Column('bucket_quantity', sa.Float(), nullable=True),
+        sa.Column('level', sa.Float(), nullable=True),
+        sa.Column('trend', sa.Float(), nullable=True),
+        sa.Column('season', sa.ARRAY(sa.Float()), nullable=True),
+        sa.Column('n_observations', sa.Integer(), nullable=True),
+        sa.Column('sq_error', sa.Float(), nullable=True),
+        sa.Column('n_errors', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sku_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('forecast_states')
@@ -0,0 +1,31 @@
+"""add inventory.unit_cost and partial low-stock index
+
+Revision ID: 2270e766c668
+Revises: bc0448d6c265
+Create Date: 2026-10-18 16:10:42.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2270e766c668'
+down_revision = 'bc0448d6c265'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'inventory', sa.Column('unit_cost', sa.Float(), nullable=True, server_default='0')
+    )
+    op.create_index(
+        'ix_inventory_low_stock', 'inventory', ['outlet_id', 'sku_id'], unique=False,
+        postgresql_where=sa.text('quantity < reorder_point'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inventory_low_stock', table_name='inventory')
+    op.drop_column('inventory', 'unit_cost')
@@ -0,0 +1,30 @@
+"""add fulfillment node coordinates and order destinations
+
+Revision ID: 3f9c1e7a4b62
+Revises: a83f5d27c914
+Create Date: 2026-10-18 21:37:52.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1e7a4b62'
+down_revision = 'a83f5d27c914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('fulfillment_nodes', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('fulfillment_nodes', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('order_sources', sa.Column('destination_latitude', sa.Float(), nullable=True))
+    op.add_column('order_sources', sa.Column('destination_longitude', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('order_sources', 'destination_longitude')
+    op.drop_column('order_sources', 'destination_latitude')
+    op.drop_column('fulfillment_nodes', 'longitude')
+    op.drop_column('fulfillment_nodes', 'latitude')
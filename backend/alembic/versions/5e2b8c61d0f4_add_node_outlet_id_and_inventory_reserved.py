@@ -0,0 +1,30 @@
+"""add fulfillment_nodes.outlet_id and inventory.reserved
+
+Revision ID: 5e2b8c61d0f4
+Revises: 7d41f0a9c2e5
+Create Date: 2026-10-18 20:02:47.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2b8c61d0f4'
+down_revision = '7d41f0a9c2e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('fulfillment_nodes', sa.Column('outlet_id', sa.String(), nullable=True))
+    op.create_index(op.f('ix_fulfillment_nodes_outlet_id'), 'fulfillment_nodes', ['outlet_id'], unique=True)
+
+    op.add_column('inventory', sa.Column('reserved', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('inventory', 'reserved')
+
+    op.drop_index(op.f('ix_fulfillment_nodes_outlet_id'), table_name='fulfillment_nodes')
+    op.drop_column('fulfillment_nodes', 'outlet_id')
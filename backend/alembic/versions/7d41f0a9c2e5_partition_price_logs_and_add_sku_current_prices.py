@@ -0,0 +1,138 @@
+"""partition price_logs by month and add sku_current_prices
+
+Revision ID: 7d41f0a9c2e5
+Revises: ba6968809c81
+Create Date: 2026-10-18 19:20:11.000000
+
+"""
+from datetime import date, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d41f0a9c2e5'
+down_revision = 'ba6968809c81'
+branch_labels = None
+depends_on = None
+
+# Monthly partitions created past the current month
+MONTHS_AHEAD = 3
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Move the old table aside, freeing its index and constraint names
+    op.rename_table('price_logs', 'price_logs_old')
+    op.execute('ALTER TABLE price_logs_old RENAME CONSTRAINT price_logs_pkey TO price_logs_old_pkey')
+    op.drop_index('ix_price_logs_id', table_name='price_logs_old')
+    op.drop_index('ix_price_logs_sku_id', table_name='price_logs_old')
+    op.execute('ALTER SEQUENCE price_logs_id_seq OWNED BY NONE')
+
+    # The partition key must be part of the primary key
+    op.create_table(
+        'price_logs',
+        sa.Column('id', sa.BigInteger(), server_default=sa.text("nextval('price_logs_id_seq')"), nullable=False),
+        sa.Column('sku_id', sa.String(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('old_price', sa.Float(), nullable=False),
+        sa.Column('new_price', sa.Float(), nullable=False),
+        sa.Column('reason', sa.String(), nullable=True),
+        sa.Column('model_version', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id', 'timestamp'),
+        postgresql_partition_by='RANGE (timestamp)'
+    )
+    op.execute('ALTER SEQUENCE price_logs_id_seq AS bigint OWNED BY price_logs.id')
+
+    first = bind.execute(sa.text('SELECT min(timestamp) FROM price_logs_old')).scalar()
+    month = (first.date() if first else date.today()).replace(day=1)
+    last = date.today().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        following = _next_month(month)
+        op.execute(
+            f"CREATE TABLE price_logs_y{month.year}m{month.month:02d} PARTITION OF price_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        month = following
+    op.execute('CREATE TABLE price_logs_default PARTITION OF price_logs DEFAULT')
+
+    # Rows written by the app always have a timestamp; stray NULLs get the migration time
+    op.execute(
+        """
+        INSERT INTO price_logs (id, sku_id, timestamp, old_price, new_price, reason, model_version)
+        SELECT id, sku_id, coalesce(timestamp, now() at time zone 'utc'), old_price, new_price, reason, model_version
+        FROM price_logs_old
+        """
+    )
+    op.drop_table('price_logs_old')
+    op.create_index(
+        'ix_price_logs_sku_id_timestamp', 'price_logs', ['sku_id', sa.text('timestamp DESC')], unique=False
+    )
+
+    op.create_table(
+        'sku_current_prices',
+        sa.Column('sku_id', sa.String(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.Column('previous_price', sa.Float(), nullable=True),
+        sa.Column('previous_changed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sku_id')
+    )
+    # Latest and second-latest log per SKU; with a single log, its old_price came before
+    op.execute(
+        """
+        INSERT INTO sku_current_prices (sku_id, price, changed_at, previous_price, previous_changed_at)
+        SELECT sku_id, new_price, timestamp, coalesce(previous_price, old_price), previous_changed_at
+        FROM (
+            SELECT
+                sku_id, new_price, old_price, timestamp,
+                lead(new_price) OVER w AS previous_price,
+                lead(timestamp) OVER w AS previous_changed_at,
+                row_number() OVER w AS n
+            FROM price_logs
+            WINDOW w AS (PARTITION BY sku_id ORDER BY timestamp DESC, id DESC)
+        ) latest
+        WHERE n = 1
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sku_current_prices')
+
+    op.drop_index('ix_price_logs_sku_id_timestamp', table_name='price_logs')
+    op.rename_table('price_logs', 'price_logs_partitioned')
+    op.execute('ALTER TABLE price_logs_partitioned RENAME CONSTRAINT price_logs_pkey TO price_logs_partitioned_pkey')
+    op.execute('ALTER SEQUENCE price_logs_id_seq OWNED BY NONE')
+
+    op.create_table(
+        'price_logs',
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('price_logs_id_seq')"), nullable=False),
+        sa.Column('sku_id', sa.String(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('old_price', sa.Float(), nullable=False),
+        sa.Column('new_price', sa.Float(), nullable=False),
+        sa.Column('reason', sa.String(), nullable=True),
+        sa.Column('model_version', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('ALTER SEQUENCE price_logs_id_seq AS integer OWNED BY price_logs.id')
+    op.execute(
+        """
+        INSERT INTO price_logs (id, sku_id, timestamp, old_price, new_price, reason, model_version)
+        SELECT id, sku_id, timestamp, old_price, new_price, reason, model_version
+        FROM price_logs_partitioned
+        """
+    )
+    # Dropping the parent drops its partitions
+    op.drop_table('price_logs_partitioned')
+    op.create_index(op.f('ix_price_logs_id'), 'price_logs', ['id'], unique=False)
+    op.create_index(op.f('ix_price_logs_sku_id'), 'price_logs', ['sku_id'], unique=False)
@@ -0,0 +1,27 @@
+"""add order_allocations (fulfillment_node_id, created_at) index
+
+Revision ID: 9d4e7b2a5c31
+Revises: f3b7d92c6a18
+Create Date: 2026-10-19 10:12:44.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4e7b2a5c31'
+down_revision = 'f3b7d92c6a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_order_allocations_node_id_created_at', 'order_allocations', ['fulfillment_node_id', 'created_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_allocations_node_id_created_at', table_name='order_allocations')
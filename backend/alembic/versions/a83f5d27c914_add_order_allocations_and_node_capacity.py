@@ -0,0 +1,44 @@
+"""add order_allocations and fulfillment_nodes.capacity
+
+Revision ID: a83f5d27c914
+Revises: 5e2b8c61d0f4
+Create Date: 2026-10-18 20:41:09.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a83f5d27c914'
+down_revision = '5e2b8c61d0f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('fulfillment_nodes', sa.Column('capacity', sa.Integer(), nullable=True))
+
+    op.create_table(
+        'order_allocations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('fulfillment_node_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['order_sources.id'], name='order_allocations_order_id_fkey'),
+        sa.ForeignKeyConstraint(
+            ['fulfillment_node_id'], ['fulfillment_nodes.id'], name='order_allocations_fulfillment_node_id_fkey'
+        ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_allocations_id'), 'order_allocations', ['id'], unique=False)
+    op.create_index(op.f('ix_order_allocations_order_id'), 'order_allocations', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_order_allocations_order_id'), table_name='order_allocations')
+    op.drop_index(op.f('ix_order_allocations_id'), table_name='order_allocations')
+    op.drop_table('order_allocations')
+
+    op.drop_column('fulfillment_nodes', 'capacity')
@@ -0,0 +1,62 @@
+"""add replenishment_runs, inventory.supplier_id and purchase_orders.run_id
+
+Revision ID: ba6968809c81
+Revises: cdf01682d1b7
+Create Date: 2026-10-18 18:05:37.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ba6968809c81'
+down_revision = 'cdf01682d1b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'replenishment_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('last_inventory_id', sa.Integer(), nullable=False),
+        sa.Column('pairs_scanned', sa.Integer(), nullable=False),
+        sa.Column('pairs_below_reorder_point', sa.Integer(), nullable=False),
+        sa.Column('units_ordered', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_replenishment_runs_id'), 'replenishment_runs', ['id'], unique=False)
+
+    op.add_column('inventory', sa.Column('supplier_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'inventory_supplier_id_fkey', 'inventory', 'suppliers', ['supplier_id'], ['id']
+    )
+    op.create_index(op.f('ix_inventory_supplier_id'), 'inventory', ['supplier_id'], unique=False)
+
+    op.add_column('purchase_orders', sa.Column('run_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'purchase_orders_run_id_fkey', 'purchase_orders', 'replenishment_runs', ['run_id'], ['id']
+    )
+    op.create_index(op.f('ix_purchase_orders_run_id'), 'purchase_orders', ['run_id'], unique=False)
+    op.create_unique_constraint(
+        'uq_purchase_orders_run_supplier_sku', 'purchase_orders', ['run_id', 'supplier_id', 'sku_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_purchase_orders_run_supplier_sku', 'purchase_orders', type_='unique')
+    op.drop_index(op.f('ix_purchase_orders_run_id'), table_name='purchase_orders')
+    op.drop_constraint('purchase_orders_run_id_fkey', 'purchase_orders', type_='foreignkey')
+    op.drop_column('purchase_orders', 'run_id')
+
+    op.drop_index(op.f('ix_inventory_supplier_id'), table_name='inventory')
+    op.drop_constraint('inventory_supplier_id_fkey', 'inventory', type_='foreignkey')
+    op.drop_column('inventory', 'supplier_id')
+
+    op.drop_index(op.f('ix_replenishment_runs_id'), table_name='replenishment_runs')
+    op.drop_table('replenishment_runs')
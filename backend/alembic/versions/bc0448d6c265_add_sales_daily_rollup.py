@@ -0,0 +1,47 @@
+"""add sales_daily_rollup and sales_data (sku_id, timestamp) index
+
+Revision ID: bc0448d6c265
+Revises: 0c3cf2dc3a3b
+Create Date: 2026-10-18 15:02:11.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bc0448d6c265'
+down_revision = '0c3cf2dc3a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_sales_data_sku_id_timestamp', 'sales_data', ['sku_id', 'timestamp'], unique=False
+    )
+    op.create_table(
+        'sales_daily_rollup',
+        sa.Column('sku_id', sa.String(), nullable=False),
+        sa.Column('outlet_id', sa.String(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('units', sa.Float(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('transaction_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('sku_id', 'outlet_id', 'day')
+    )
+    # Seed from existing sales; afterwards it is maintained on ingest
+    op.execute(
+        """
+        INSERT INTO sales_daily_rollup (sku_id, outlet_id, day, units, revenue, transaction_count)
+        SELECT sku_id, COALESCE(outlet_id, ''), CAST(timestamp AS DATE),
+               SUM(quantity), SUM(quantity * price), COUNT(*)
+        FROM sales_data
+        GROUP BY sku_id, COALESCE(outlet_id, ''), CAST(timestamp AS DATE)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sales_daily_rollup')
+    op.drop_index('ix_sales_data_sku_id_timestamp', table_name='sales_data')
@@ -0,0 +1,56 @@
+"""dedupe order_sources and make (channel_id, external_order_id) unique
+
+Revision ID: c52d8e1f9a37
+Revises: 3f9c1e7a4b62
+Create Date: 2026-10-18 22:14:06.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52d8e1f9a37'
+down_revision = '3f9c1e7a4b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Per (channel, external id), keep the routed order if any, else the first one
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE order_duplicates ON COMMIT DROP AS
+        SELECT id, fulfillment_node_id IS NOT NULL
+            OR EXISTS (SELECT 1 FROM order_allocations a WHERE a.order_id = ranked.id) AS routed
+        FROM (
+            SELECT
+                id, fulfillment_node_id,
+                row_number() OVER (
+                    PARTITION BY channel_id, external_order_id
+                    ORDER BY fulfillment_node_id IS NULL, id
+                ) AS n
+            FROM order_sources
+            WHERE channel_id IS NOT NULL
+        ) ranked
+        WHERE n > 1
+        """
+    )
+    op.execute(
+        'DELETE FROM order_sources WHERE id IN (SELECT id FROM order_duplicates WHERE NOT routed)'
+    )
+    # Duplicates that were routed too hold stock reservations: keep them under a new external id
+    op.execute(
+        """
+        UPDATE order_sources SET external_order_id = external_order_id || ':duplicate:' || id
+        WHERE id IN (SELECT id FROM order_duplicates WHERE routed)
+        """
+    )
+    op.create_index(
+        'ix_order_sources_channel_id_external_order_id', 'order_sources',
+        ['channel_id', 'external_order_id'], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_sources_channel_id_external_order_id', table_name='order_sources')
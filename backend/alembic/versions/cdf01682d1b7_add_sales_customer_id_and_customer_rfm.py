@@ -0,0 +1,42 @@
+"""add sales_data.customer_id and customer_rfm
+
+Revision ID: cdf01682d1b7
+Revises: 2270e766c668
+Create Date: 2026-10-18 16:48:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cdf01682d1b7'
+down_revision = '2270e766c668'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sales_data', sa.Column('customer_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'sales_data_customer_id_fkey', 'sales_data', 'customers', ['customer_id'], ['id']
+    )
+    op.create_index(op.f('ix_sales_data_customer_id'), 'sales_data', ['customer_id'], unique=False)
+    op.create_table(
+        'customer_rfm',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('last_purchase_at', sa.DateTime(), nullable=False),
+        sa.Column('frequency', sa.Integer(), nullable=False),
+        sa.Column('monetary', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id']),
+        sa.PrimaryKeyConstraint('customer_id')
+    )
+    # Existing sales have no customer reference yet, so the table starts empty
+
+
+def downgrade() -> None:
+    op.drop_table('customer_rfm')
+    op.drop_index(op.f('ix_sales_data_customer_id'), table_name='sales_data')
+    op.drop_constraint('sales_data_customer_id_fkey', 'sales_data', type_='foreignkey')
+    op.drop_column('sales_data', 'customer_id')
@@ -0,0 +1,36 @@
+"""add event_dead_letters
+
+Revision ID: e8a4f60b2d19
+Revises: c52d8e1f9a37
+Create Date: 2026-10-19 09:12:40.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a4f60b2d19'
+down_revision = 'c52d8e1f9a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'event_dead_letters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('topic', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('error', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_event_dead_letters_id'), 'event_dead_letters', ['id'], unique=False)
+    op.create_index(op.f('ix_event_dead_letters_topic'), 'event_dead_letters', ['topic'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_event_dead_letters_topic'), table_name='event_dead_letters')
+    op.drop_index(op.f('ix_event_dead_letters_id'), table_name='event_dead_letters')
+    op.drop_table('event_dead_letters')
@@ -0,0 +1,26 @@
+"""add sales_data.event_id
+
+Revision ID: f3b7d92c6a18
+Revises: e8a4f60b2d19
+Create Date: 2026-10-19 09:41:27.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b7d92c6a18'
+down_revision = 'e8a4f60b2d19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sales_data', sa.Column('event_id', sa.String(), nullable=True))
+    op.create_index('ix_sales_data_event_id', 'sales_data', ['event_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sales_data_event_id', table_name='sales_data')
+    op.drop_column('sales_data', 'event_id')
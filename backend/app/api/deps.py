@@ -1,14 +1,16 @@
-from typing import Generator
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, Generator
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models, schemas
 from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.ml_client import MLClient
+from app.db.session import SessionLocal, AsyncSessionLocal
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -21,6 +23,23 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_ml_client(request: Request) -> MLClient:
+    return request.app.state.ml_client
+
+def get_stock_index(request: Request):
+    return request.app.state.stock_index
+
+def get_node_locator(request: Request):
+    return request.app.state.node_locator
+
+def get_event_bus(request: Request):
+    # None when EVENT_BACKEND is "sync"
+    return request.app.state.event_bus
+
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> models.User:
@@ -1,78 +1,96 @@
 from typing import Any, Dict
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-import json
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 
 from app import models
 from app.api import deps
-from app.core.redis import get_redis_pool
+from app.core.cache import cached
 
 router = APIRouter()
 
 @router.get("/sales")
+@cached("analytics:sales", ttl=60)
 async def get_sales_analytics(
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Get sales analytics (Total Revenue, Total Units Sold).
     Cached for 60 seconds.
     """
-    redis = await get_redis_pool()
-    cache_key = "analytics:sales"
-    cached_data = await redis.get(cache_key)
-    
-    if cached_data:
-        return json.loads(cached_data)
-
-    # Calculate Total Revenue (Mock: assuming price is constant or we sum up sales * price)
-    # For MVP, we'll just sum the 'quantity' from SalesData and multiply by a mock avg price
-    total_units = db.query(func.sum(models.SalesData.quantity)).scalar() or 0
-    total_revenue = total_units * 25.0 # Mock average price
+    # Totals come from the daily rollup, not a scan of raw sales rows
+    result = await db.execute(select(
+        func.coalesce(func.sum(models.SalesDailyRollup.units), 0),
+        func.coalesce(func.sum(models.SalesDailyRollup.revenue), 0),
+    ))
+    total_units, total_revenue = result.one()
     
     data = {
         "total_revenue": total_revenue,
         "total_units_sold": total_units,
         "revenue_growth": 12.5, # Mock growth percentage
     }
-    
-    await redis.set(cache_key, json.dumps(data), ex=60)
     return data
 
 @router.get("/inventory")
+@cached("analytics:inventory", ttl=60)
 async def get_inventory_analytics(
-    db: Session = Depends(deps.get_db),
+    by_outlet: bool = False,
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Get inventory analytics (Low Stock Items, Total Value).
+    by_outlet: also return the same figures per outlet.
+    Cached for 60 seconds.
     """
-    # Count items below reorder point
-    low_stock_count = 0
-    inventory_items = db.query(models.Inventory).all()
-    for item in inventory_items:
-        if item.quantity < item.reorder_point:
-            low_stock_count += 1
-            
-    return {
+    # Aggregated in SQL: no inventory rows are loaded into the API worker
+    inventory = models.Inventory
+    metrics = (
+        func.count().filter(inventory.quantity < inventory.reorder_point),
+        func.count(),
+        func.coalesce(func.sum(inventory.quantity * inventory.unit_cost), 0.0),
+    )
+    low_stock_count, total_count, stock_value = (await db.execute(select(*metrics))).one()
+
+    data = {
         "low_stock_items": low_stock_count,
-        "total_sku_count": len(inventory_items),
+        "total_sku_count": total_count,
+        "total_stock_value": stock_value,
         "inventory_turnover_rate": 4.2 # Mock
     }
+    if by_outlet:
+        rows = (await db.execute(
+            select(inventory.outlet_id, *metrics)
+            .group_by(inventory.outlet_id).order_by(inventory.outlet_id)
+        )).all()
+        data["outlets"] = [
+            {
+                "outlet_id": outlet_id,
+                "low_stock_items": low,
+                "total_sku_count": total,
+                "total_stock_value": value,
+            }
+            for outlet_id, low, total, value in rows
+        ]
+    return data
 
 @router.get("/fulfillment")
+@cached("analytics:fulfillment", ttl=60)
 async def get_fulfillment_analytics(
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Get fulfillment analytics (Orders by Channel, Status).
+    Cached for 60 seconds.
     """
     # Orders by Channel
-    channel_stats = db.query(
-        models.Channel.name, func.count(models.OrderSource.id)
-    ).join(models.OrderSource).group_by(models.Channel.name).all()
+    channel_stats = (await db.execute(
+        select(models.Channel.name, func.count(models.OrderSource.id))
+        .join(models.OrderSource).group_by(models.Channel.name)
+    )).all()
     
     return {
         "orders_by_channel": [{"name": name, "count": count} for name, count in channel_stats],
@@ -1,13 +1,20 @@
 from typing import Any, List
+import json
 import httpx
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime, timedelta
 
 from app import models, schemas
 from app.api import deps
+from app.core.cache import cached, invalidate
 from app.core.config import settings
+from app.core.ml_client import MLClient, MLServiceError, MLServiceUnavailable
+from app.db.bulk import bulk_update
+from app.services import customer_rfm
 
 router = APIRouter()
 
@@ -43,83 +50,100 @@ def read_customers(
 @router.post("/segment")
 async def segment_customers(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     request: schemas.SegmentationRequest,
+    ml: MLClient = Depends(deps.get_ml_client),
     current_user: models.User = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Trigger customer segmentation using ML.
     """
-    # 1. Get customers to segment
-    if request.customer_ids:
-        customers = db.query(models.Customer).filter(
-            models.Customer.id.in_(request.customer_ids)
-        ).all()
-    else:
-        customers = db.query(models.Customer).all()
-    
-    if not customers:
-        raise HTTPException(status_code=404, detail="No customers found")
-    
-    # 2. Calculate RFM metrics from sales data
-    customer_data = []
-    for customer in customers:
-        # Mock RFM calculation (in real system, join with sales data)
-        # For demo, we'll use random-ish values based on customer ID
-        recency = (customer.id % 30) + 1  # Days since last purchase
-        frequency = (customer.id % 10) + 1  # Number of purchases
-        monetary = (customer.id % 100) * 10.0 + 100.0  # Total spend
-        
-        customer_data.append({
-            "customer_id": customer.id,
-            "recency": recency,
-            "frequency": frequency,
-            "monetary": monetary
-        })
-    
-    # 3. Call ML Service
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.ML_SERVICE_URL}/segment_customers",
-                json={"customers": customer_data}
-            )
-            response.raise_for_status()
-            result = response.json()
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
-    
-    # 4. Ensure segments exist in DB
-    segment_names = ["Low Value", "Medium Value", "High Value"]
-    for i, name in enumerate(segment_names):
-        segment = db.query(models.CustomerSegment).filter(
-            models.CustomerSegment.name == name
-        ).first()
-        if not segment:
-            segment = models.CustomerSegment(id=i, name=name, description=f"{name} customers")
-            db.add(segment)
-    db.commit()
-    
-    # 5. Update customer segments
-    segments_map = result["segments"]
-    for customer in customers:
-        if str(customer.id) in segments_map:
-            customer.segment_id = segments_map[str(customer.id)]
-        elif customer.id in segments_map:
-            customer.segment_id = segments_map[customer.id]
-        db.add(customer)
-    
-    db.commit()
+    # 1. Stream RFM features from a server-side cursor as columnar NDJSON batches
+    query = customer_rfm.features_query(request.customer_ids or None)
+
+    async def feature_batches():
+        result = await db.stream(query.execution_options(yield_per=settings.SEGMENT_STREAM_BATCH_SIZE))
+        async for partition in result.partitions():
+            customer_ids, recency, frequency, monetary = zip(*partition)
+            yield (json.dumps({
+                "customer_id": customer_ids,
+                "recency": recency,
+                "frequency": frequency,
+                "monetary": monetary,
+            }) + "\n").encode("utf-8")
+
+    # 2. Call ML Service; assignments stream back in BULK_UPDATE_CHUNK_SIZE lines
+    params = {"mode": request.mode, "fit": request.fit, "chunk_size": settings.BULK_UPDATE_CHUNK_SIZE}
+    if request.n_segments:
+        params["n_segments"] = request.n_segments
+    segment_counts = {}
+    try:
+        async with ml.stream(
+            "POST", "/segment_customers/stream",
+            params=params,
+            content=feature_batches(),
+            headers={"Content-Type": "application/x-ndjson"},
+            timeout=httpx.Timeout(settings.ML_SEGMENT_TIMEOUT_SECONDS, connect=settings.ML_CONNECT_TIMEOUT_SECONDS),
+        ) as response:
+            lines = response.aiter_lines()
+            try:
+                header = json.loads(await lines.__anext__())
+            except StopAsyncIteration:
+                header = None
+            if header is None:
+                raise HTTPException(status_code=502, detail="ML Service ended the segment stream before its header")
+            if not header["count"]:
+                raise HTTPException(status_code=404, detail="No customers with sales history found")
+
+            # 3. Upsert segments by name in one statement; cluster i maps to labels[i]
+            segment_names = header["labels"]
+            stmt = insert(models.CustomerSegment).values([
+                {"name": name, "description": f"{name} customers"} for name in segment_names
+            ])
+            upserted = await db.execute(stmt.on_conflict_do_update(
+                index_elements=["name"],
+                set_={"description": stmt.excluded.description},
+            ).returning(models.CustomerSegment.name, models.CustomerSegment.id))
+            segment_ids = dict(upserted.all())
+
+            # 4. Write each chunk back with one UPDATE ... FROM as it arrives
+            async for line in lines:
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                assignments = [
+                    {"id": customer_id, "segment_id": segment_ids[segment_names[cluster]]}
+                    for customer_id, cluster in zip(chunk["customer_id"], chunk["segment"])
+                ]
+                for statement, values in bulk_update(
+                    models.Customer.__table__, "id", assignments, settings.BULK_UPDATE_CHUNK_SIZE,
+                    skip_unchanged=True,
+                ):
+                    await db.execute(statement, values)
+                for cluster in chunk["segment"]:
+                    name = segment_names[cluster]
+                    segment_counts[name] = segment_counts.get(name, 0) + 1
+    except MLServiceUnavailable as exc:
+        await db.rollback()
+        raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
+    except MLServiceError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=exc.status_code, detail=f"ML Service error: {exc.detail}")
+
+    await db.commit()
+    await invalidate("segments")
     
-    return {"message": f"Segmented {len(customers)} customers", "segments": segments_map}
+    return {"message": f"Segmented {header['count']} customers", "segments": segment_counts}
 
 @router.get("/segments", response_model=List[schemas.CustomerSegment])
-def read_segments(
-    db: Session = Depends(deps.get_db),
+@cached("segments", ttl=300)
+async def read_segments(
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Retrieve customer segments.
+    Cached for 5 minutes.
     """
-    segments = db.query(models.CustomerSegment).all()
-    return segments
+    segments = (await db.execute(select(models.CustomerSegment))).scalars().all()
+    return [schemas.CustomerSegment.model_validate(segment) for segment in segments]
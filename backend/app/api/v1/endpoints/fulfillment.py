@@ -1,10 +1,19 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import uuid
 
+import anyio
+from redis.exceptions import RedisError
+
 from app import models, schemas
 from app.api import deps
+from app.core.cache import cached, invalidate, invalidate_sync
+from app.core.config import settings
+from app.core.ml_client import MLClient, MLServiceError, MLServiceUnavailable
+from app.services import event_ingest, order_ingest, routing
 from datetime import datetime
 
 router = APIRouter()
@@ -23,26 +32,33 @@ def create_channel(
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
+    invalidate_sync("channels")
     return db_obj
 
 @router.get("/channels", response_model=List[schemas.Channel])
-def read_channels(
-    db: Session = Depends(deps.get_db),
+@cached("channels", ttl=300)
+async def read_channels(
+    db: AsyncSession = Depends(deps.get_async_db),
     skip: int = 0,
     limit: int = 100,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Retrieve channels.
+    Cached for 5 minutes.
     """
-    channels = db.query(models.Channel).offset(skip).limit(limit).all()
-    return channels
+    channels = (await db.execute(
+        select(models.Channel).offset(skip).limit(limit)
+    )).scalars().all()
+    return [schemas.Channel.model_validate(channel) for channel in channels]
 
 @router.post("/nodes", response_model=schemas.FulfillmentNode)
 def create_fulfillment_node(
     *,
     db: Session = Depends(deps.get_db),
     node_in: schemas.FulfillmentNodeCreate,
+    stock_index = Depends(deps.get_stock_index),
+    node_locator = Depends(deps.get_node_locator),
     current_user: models.User = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
@@ -52,66 +68,191 @@ def create_fulfillment_node(
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
+    anyio.from_thread.run(stock_index.invalidate_all)
+    anyio.from_thread.run(node_locator.invalidate)
     return db_obj
 
-@router.post("/orders", response_model=schemas.OrderSource)
+@router.patch("/nodes/{node_id}", response_model=schemas.FulfillmentNode)
+def update_fulfillment_node(
+    *,
+    db: Session = Depends(deps.get_db),
+    node_id: int,
+    node_in: schemas.FulfillmentNodeUpdate,
+    stock_index = Depends(deps.get_stock_index),
+    node_locator = Depends(deps.get_node_locator),
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Update a fulfillment node, e.g. set the outlet_id it ships from: routing
+    only considers nodes linked to an outlet's inventory.
+    """
+    db_obj = db.get(models.FulfillmentNode, node_id)
+    if not db_obj:
+        raise HTTPException(status_code=404, detail="Fulfillment node not found")
+    changes = node_in.dict(exclude_unset=True)
+    if changes.get("outlet_id") is not None and db.scalar(
+        select(models.FulfillmentNode.id).where(
+            models.FulfillmentNode.outlet_id == changes["outlet_id"], models.FulfillmentNode.id != node_id
+        )
+    ):
+        raise HTTPException(status_code=409, detail="Another fulfillment node already ships from this outlet")
+    for field, value in changes.items():
+        setattr(db_obj, field, value)
+    db.commit()
+    db.refresh(db_obj)
+    anyio.from_thread.run(stock_index.invalidate_all)
+    anyio.from_thread.run(node_locator.invalidate)
+    return db_obj
+
+@router.post("/orders", response_model=Union[schemas.OrderSource, schemas.EventQueued])
 def ingest_order(
     *,
     db: Session = Depends(deps.get_db),
     order_in: schemas.OrderSourceCreate,
+    response: Response,
+    event_bus = Depends(deps.get_event_bus),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Ingest an order from an external channel.
+    Ingest an order from an external channel. An order the channel already
+    sent (same external_order_id) is returned as stored, not duplicated.
+    With an event backend configured, the order is published for the event
+    consumer to write in a batch, and this returns 202 right away.
     """
-    db_obj = models.OrderSource(
-        **order_in.dict(),
-        status="pending",
-        created_at=datetime.utcnow()
-    )
-    db.add(db_obj)
+    if event_bus is not None:
+        event_bus.publish(
+            settings.KAFKA_ORDERS_TOPIC,
+            event_ingest.order_event(order_in, datetime.utcnow()),
+            key=f"{order_in.channel_id}:{order_in.external_order_id}",
+        )
+        response.status_code = 202
+        return schemas.EventQueued(topic=settings.KAFKA_ORDERS_TOPIC)
+
+    if order_ingest.unknown_channels(db, [order_in.channel_id]):
+        raise HTTPException(status_code=422, detail=f"Unknown channel_id: {order_in.channel_id}")
+    [(order_id, created)] = order_ingest.insert_orders(db, [order_in.dict()])
     db.commit()
-    db.refresh(db_obj)
-    return db_obj
+    if created:
+        invalidate_sync("analytics:fulfillment")
+    return db.get(models.OrderSource, order_id)
 
-@router.post("/route", response_model=schemas.OrderSource)
-def route_order(
+@router.post("/orders/bulk", response_model=schemas.OrderBulkResult)
+def ingest_orders_bulk(
     *,
     db: Session = Depends(deps.get_db),
+    orders_in: schemas.OrderBulkCreate,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Ingest a burst of orders from external channels in one transaction,
+    up to ORDER_BULK_MAX_SIZE per request. Orders a channel already sent
+    are skipped, so retried deliveries are safe; each result says whether
+    its order was created or a duplicate. A request naming a channel that
+    doesn't exist is rejected whole with 422.
+    """
+    if len(orders_in.orders) > settings.ORDER_BULK_MAX_SIZE:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.ORDER_BULK_MAX_SIZE} orders per request"
+        )
+
+    unknown = order_ingest.unknown_channels(db, {order.channel_id for order in orders_in.orders})
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown channel_id: {', '.join(str(channel_id) for channel_id in unknown)}"
+        )
+
+    orders = [order.dict() for order in orders_in.orders]
+    try:
+        results = order_ingest.insert_orders(db, orders)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    created = sum(new for _, new in results)
+    if created:
+        invalidate_sync("analytics:fulfillment")
+    return {
+        "created": created,
+        "duplicates": len(results) - created,
+        "results": [
+            {"id": order_id, "channel_id": order["channel_id"], "external_order_id": order["external_order_id"], "created": new}
+            for order, (order_id, new) in zip(orders, results)
+        ],
+    }
+
+@router.post("/route", response_model=schemas.OrderSource)
+async def route_order(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
     request: schemas.RoutingRequest,
+    stock_index = Depends(deps.get_stock_index),
+    node_locator = Depends(deps.get_node_locator),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Route an order to the optimal fulfillment node.
     """
-    order = db.query(models.OrderSource).filter(models.OrderSource.id == request.order_id).first()
+    # Locked, so a concurrent batch routing run skips it
+    order = await db.get(models.OrderSource, request.order_id, with_for_update=True)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    
-    # Simple Routing Logic:
-    # 1. Find active nodes
-    # 2. Check inventory (Mocked: assume priority 1 node has stock)
-    # 3. Assign to highest priority node
-    
-    nodes = db.query(models.FulfillmentNode).filter(
-        models.FulfillmentNode.is_active == True
-    ).order_by(models.FulfillmentNode.priority).all()
-    
-    if not nodes:
-        raise HTTPException(status_code=400, detail="No active fulfillment nodes available")
-        
-    # Assign to the first available node (highest priority)
-    # In a real system, we would check `models.Inventory` for this node + SKU
-    best_node = nodes[0]
-    
-    order.fulfillment_node_id = best_node.id
-    order.status = "routed"
-    db.add(order)
-    db.commit()
-    db.refresh(order)
-    
+    if order.fulfillment_node_id is not None:
+        raise HTTPException(status_code=409, detail="Order is already routed")
+
+    # Cheapest nearby (else highest-priority) active node with enough stock and capacity, reserved atomically
+    try:
+        await routing.route(db, stock_index, order, node_locator)
+    except routing.OutOfStock:
+        raise HTTPException(status_code=409, detail="No active fulfillment node has enough stock and capacity for this order")
+    except RedisError as exc:
+        raise HTTPException(status_code=503, detail=f"Stock index unavailable: {exc}")
+
+    await db.refresh(order)
+    await invalidate("analytics:fulfillment")
     return order
 
+@router.post("/route_batch")
+async def route_order_batch(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    limit: int = Query(settings.ROUTING_BATCH_SIZE, gt=0),
+    window_minutes: Optional[int] = Query(None, gt=0),
+    ml: MLClient = Depends(deps.get_ml_client),
+    stock_index = Depends(deps.get_stock_index),
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Route pending orders in one min-cost assignment across nodes, splitting
+    orders where that is cheaper or the only way to fill them. Orders that
+    can't be filled stay pending.
+    """
+    try:
+        summary = await routing.route_batch(db, ml, stock_index, limit, window_minutes)
+    except MLServiceUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
+    except MLServiceError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=f"ML Service error: {exc.detail}")
+
+    if summary["routed"]:
+        await invalidate("analytics:fulfillment")
+    return summary
+
+@router.get("/orders/{order_id}/allocations", response_model=List[schemas.OrderAllocation])
+async def read_order_allocations(
+    order_id: int,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Shipments an order was routed to.
+    """
+    return (await db.execute(
+        select(models.OrderAllocation)
+        .where(models.OrderAllocation.order_id == order_id)
+        .order_by(models.OrderAllocation.id)
+    )).scalars().all()
+
 @router.get("/orders", response_model=List[schemas.OrderSource])
 def read_orders(
     db: Session = Depends(deps.get_db),
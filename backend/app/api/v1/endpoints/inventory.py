@@ -1,11 +1,14 @@
 from typing import Any, List
-import httpx
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models, schemas
 from app.api import deps
+from app.core.cache import invalidate
 from app.core.config import settings
+from app.core.ml_client import MLClient, MLServiceError, MLServiceUnavailable
 from datetime import datetime
 
 router = APIRouter()
@@ -42,28 +45,33 @@ def read_suppliers(
 @router.post("/replenish", response_model=schemas.PurchaseOrder)
 async def trigger_replenishment(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     request: schemas.ReplenishRequest,
+    ml: MLClient = Depends(deps.get_ml_client),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Trigger replenishment logic for a SKU.
     """
     # 1. Get Inventory and Supplier info
-    inventory = db.query(models.Inventory).filter(
+    inventory = (await db.execute(select(models.Inventory).where(
         models.Inventory.sku_id == request.sku_id,
         models.Inventory.outlet_id == request.outlet_id
-    ).first()
+    ))).scalars().first()
     
     if not inventory:
         # Create initial inventory record if not exists
         inventory = models.Inventory(sku_id=request.sku_id, outlet_id=request.outlet_id, quantity=0)
         db.add(inventory)
-        db.commit()
-        db.refresh(inventory)
+        await db.commit()
+        await db.refresh(inventory)
 
-    # Mocking getting the preferred supplier
-    supplier = db.query(models.Supplier).first()
+    # Preferred supplier, falling back to any supplier
+    supplier = None
+    if inventory.supplier_id is not None:
+        supplier = await db.get(models.Supplier, inventory.supplier_id)
+    if supplier is None:
+        supplier = (await db.execute(select(models.Supplier).order_by(models.Supplier.id))).scalars().first()
     if not supplier:
          raise HTTPException(status_code=404, detail="No suppliers found")
 
@@ -72,20 +80,25 @@ async def trigger_replenishment(
     forecast_std = 10.0
 
     # 3. Call ML Service
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.ML_SERVICE_URL}/optimize_inventory",
-                json={
-                    "forecast_mean": forecast_mean,
-                    "forecast_std": forecast_std,
-                    "lead_time_days": supplier.lead_time_days
-                }
-            )
-            response.raise_for_status()
-            result = response.json()
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
+    try:
+        result = await ml.post_json(
+            "/optimize_inventory",
+            {
+                "forecast_mean": forecast_mean,
+                "forecast_std": forecast_std,
+                "lead_time_days": (
+                    settings.PLANNER_DEFAULT_LEAD_TIME_DAYS if supplier.lead_time_days is None else supplier.lead_time_days
+                ),
+                "service_level": settings.INVENTORY_SERVICE_LEVEL,
+                # EOQ needs a unit cost; without one the ML service falls back to days of cover
+                "holding_cost": (inventory.unit_cost or 0.0) * settings.INVENTORY_HOLDING_COST_RATE,
+                "ordering_cost": settings.INVENTORY_ORDERING_COST,
+            }
+        )
+    except MLServiceUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
+    except MLServiceError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=f"ML Service error: {exc.detail}")
 
     # 4. Update Reorder Point
     inventory.reorder_point = result["reorder_point"]
@@ -94,20 +107,38 @@ async def trigger_replenishment(
     # 5. Create PO if needed
     if inventory.quantity < inventory.reorder_point:
         po = models.PurchaseOrder(
-            supplier_id=supplier.id,
+            supplier=supplier,
             sku_id=request.sku_id,
             quantity=result["suggested_order_quantity"],
             created_at=datetime.utcnow()
         )
         db.add(po)
-        db.commit()
-        db.refresh(po)
+        # No refresh: it would expire `supplier`, which can't lazy-load under asyncio
+        await db.commit()
+        await invalidate("analytics:inventory")
         return po
     else:
         # Return a dummy PO or handle this case better in a real app
         # For now, we raise an exception or return empty
+        await db.commit()
+        await invalidate("analytics:inventory")
         raise HTTPException(status_code=200, detail="Inventory levels sufficient, no PO generated")
 
+@router.get("/replenishment_runs", response_model=List[schemas.ReplenishmentRun])
+def read_replenishment_runs(
+    db: Session = Depends(deps.get_db),
+    skip: int = 0,
+    limit: int = 20,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Retrieve replenishment planner runs and their progress, newest first.
+    """
+    runs = db.query(models.ReplenishmentRun).order_by(
+        models.ReplenishmentRun.id.desc()
+    ).offset(skip).limit(limit).all()
+    return runs
+
 @router.get("/orders", response_model=List[schemas.PurchaseOrder])
 def read_orders(
     db: Session = Depends(deps.get_db),
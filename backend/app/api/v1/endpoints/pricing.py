@@ -1,11 +1,21 @@
-from typing import Any, List
-import httpx
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, List, Literal
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models, schemas
 from app.api import deps
-from app.core.config import settings
+from app.core.ml_client import MLClient, MLServiceError, MLServiceUnavailable
+from app.db.session import AsyncSessionLocal
+from app.services import pricing, repricing
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -28,55 +38,117 @@ def create_pricing_rule(
 @router.post("/optimize", response_model=schemas.PriceLog)
 async def optimize_price(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     request: schemas.OptimizeRequest,
+    ml: MLClient = Depends(deps.get_ml_client),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Calculate optimal price for a SKU.
     """
     # 1. Get Pricing Rule
-    rule = db.query(models.PricingRule).filter(
+    rule = (await db.execute(select(models.PricingRule).where(
         models.PricingRule.sku_id == request.sku_id,
         models.PricingRule.is_active == True
-    ).first()
+    ))).scalars().first()
     
     if not rule:
         raise HTTPException(status_code=404, detail="No active pricing rule found for this SKU")
 
-    # 2. Get Forecast (Simplification: calling ML service directly or using cached forecast)
-    # For this MVP, we'll assume we pass a dummy forecast value or fetch it.
-    # Let's fetch the latest forecast from DB or assume a value.
-    forecast_val = 150.0 # Mock forecast value
+    # 2. Current price (the stored one wins over the caller's) and the price 24h ago
+    current = await pricing.current_prices(db, [request.sku_id])
+    reference = await pricing.reference_prices(db, current)
+    current_price = current[request.sku_id].price if request.sku_id in current else request.current_price
+    if current_price is None:
+        raise HTTPException(status_code=400, detail="No current price recorded for this SKU; pass current_price")
 
-    # 3. Call ML Service for Optimization
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.ML_SERVICE_URL}/optimize_price",
-                json={
-                    "current_price": request.current_price,
-                    "forecast": forecast_val,
-                    "inventory_level": request.inventory_level,
-                    "min_price": rule.min_price,
-                    "max_price": rule.max_price
-                }
-            )
-            response.raise_for_status()
-            result = response.json()
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
+    # 3. Daily price/quantity history for the elasticity fit, and the demand forecast
+    history = pricing.history_payload((await db.execute(pricing.history_query([request.sku_id]))).all())
+    states = (await db.execute(
+        select(models.ForecastState).where(models.ForecastState.sku_id == request.sku_id)
+    )).scalars().all()
+    forecast = pricing.demand_forecast([request.sku_id], states, history)
+
+    # 4. Call ML Service for Optimization
+    try:
+        result = await ml.post_json(
+            "/optimize_price_batch",
+            {
+                "sku_id": [request.sku_id],
+                "current_price": [current_price],
+                "forecast": forecast,
+                "inventory_level": [request.inventory_level],
+                "min_price": [rule.min_price],
+                "max_price": [rule.max_price],
+                "max_increase_pct": [rule.max_daily_increase_pct],
+                "reference_price": [reference.get(request.sku_id)],
+                "unit_cost": [request.unit_cost],
+                "history": history,
+                "objective": request.objective,
+            }
+        )
+    except MLServiceUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
+    except MLServiceError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=f"ML Service error: {exc.detail}")
 
-    # 4. Log the price change
+    # 5. Log the price change and make it the current price
     price_log = models.PriceLog(
         sku_id=request.sku_id,
-        old_price=request.current_price,
-        new_price=result["recommended_price"],
-        reason=result["reason"],
-        model_version="v1"
+        timestamp=datetime.utcnow(),
+        old_price=current_price,
+        new_price=result["recommended_price"][0],
+        reason=result["reason"][0],
+        model_version="elasticity-v1"
     )
     db.add(price_log)
-    db.commit()
-    db.refresh(price_log)
+    await pricing.update_current_prices(db, [{
+        "sku_id": price_log.sku_id,
+        "timestamp": price_log.timestamp,
+        "old_price": price_log.old_price,
+        "new_price": price_log.new_price,
+    }])
+    await db.commit()
+    await db.refresh(price_log)
     
     return price_log
+
+@router.post("/reprice")
+async def reprice_catalog(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    objective: Literal["revenue", "margin"] = "margin",
+    ml: MLClient = Depends(deps.get_ml_client),
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Reprice every SKU with an active pricing rule.
+    Streams NDJSON: one line per SKU as each batch is committed, then a
+    {"summary": ...} line. An {"error": ...} line ends the stream early;
+    batches already committed are kept.
+    """
+    # 1. Load all active rules in one query
+    rules = await repricing.load_rules(db)
+    if not rules:
+        raise HTTPException(status_code=404, detail="No active pricing rules found")
+
+    async def lines():
+        # 2. One ML call and one PriceLog INSERT per batch
+        started = time.monotonic()
+        counts = {}
+        try:
+            async with AsyncSessionLocal() as session:
+                async for results in repricing.reprice_catalog(session, ml, rules, objective):
+                    repricing.summarize(counts, results)
+                    yield "".join(json.dumps(result) + "\n" for result in results)
+        except MLServiceError as exc:
+            yield json.dumps({"error": f"ML Service error: {exc.detail}"}) + "\n"
+        except Exception:
+            logger.exception("Catalog repricing failed")
+            yield json.dumps({"error": "Repricing failed"}) + "\n"
+
+        # 3. Summary
+        summary = {"skus": sum(counts.values()), **counts, "seconds": round(time.monotonic() - started, 3)}
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
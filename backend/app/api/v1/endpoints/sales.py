@@ -1,61 +1,222 @@
-from typing import Any, List
-import httpx
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional, Union
+import asyncio
+import zlib
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models, schemas
 from app.api import deps
+from app.core.cache import cached, invalidate, invalidate_sync
 from app.core.config import settings
+from app.core.ml_client import MLClient, MLServiceError, MLServiceUnavailable
+from app.services import customer_rfm, event_ingest, forecast_state, sales_rollup
+from app.services.sales_ingest import SalesStreamParser, unknown_customers, write_chunk, MAX_REPORTED_ERRORS
 
 router = APIRouter()
 
-@router.post("/", response_model=schemas.SalesData)
+@router.post("/", response_model=Union[schemas.SalesData, schemas.EventQueued])
 def create_sales_data(
     *,
     db: Session = Depends(deps.get_db),
     sales_in: schemas.SalesDataCreate,
+    response: Response,
+    event_bus = Depends(deps.get_event_bus),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Ingest sales data.
+    With an event backend configured, the sale is published for the event
+    consumer to write in a batch, and this returns 202 right away.
     """
+    if event_bus is not None:
+        event = event_ingest.sales_events([sales_in.dict()])[0]
+        event_bus.publish(settings.KAFKA_SALES_TOPIC, event, key=sales_in.sku_id)
+        response.status_code = 202
+        return schemas.EventQueued(topic=settings.KAFKA_SALES_TOPIC)
+
+    if sales_in.customer_id is not None and unknown_customers(db, [sales_in.customer_id]):
+        raise HTTPException(status_code=422, detail=f"Unknown customer_id: {sales_in.customer_id}")
     db_obj = models.SalesData(**sales_in.dict())
     db.add(db_obj)
+    sales_rollup.apply_sales(db, [sales_in.dict()])
+    customer_rfm.apply_sales(db, [sales_in.dict()])
+    forecast_state.apply_sale(db, sales_in.sku_id, sales_in.timestamp, sales_in.quantity)
     db.commit()
     db.refresh(db_obj)
+    invalidate_sync("analytics:sales")
+    invalidate_sync("forecast", sales_in.sku_id)
     return db_obj
 
+@router.post("/bulk", response_model=schemas.BulkIngestResult)
+async def bulk_ingest_sales_data(
+    request: Request,
+    format: Optional[str] = None,
+    update_forecasts: bool = True,
+    db: Session = Depends(deps.get_db),
+    event_bus = Depends(deps.get_event_bus),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Bulk-ingest sales data from an NDJSON or CSV request body (optionally
+    gzip-compressed). Rows are validated and written in chunks of
+    SALES_BULK_CHUNK_SIZE, one transaction per chunk, while the next chunk
+    is being parsed. Rows naming a customer that doesn't exist are rejected
+    one by one, like rows that fail validation.
+    format: "ndjson" or "csv"; inferred from Content-Type when omitted.
+    update_forecasts: set to false for large backfills, then rebuild state.
+    An upload that can't be read (bad gzip, bad CSV header) fails with 400
+    before any chunk is written; once chunks are written, the rows read so
+    far are kept and a last chunk reports the line where reading stopped.
+    With an event backend configured, valid rows are published for the
+    event consumer instead (counted as queued), which always updates
+    forecasts.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    try:
+        parser = SalesStreamParser(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = []
+    sku_ids = set()
+    pending_write = None
+
+    async def flush(lines):
+        nonlocal pending_write
+        rows, rejects = parser.parse(lines)
+        # Rows keep the order of their lines, minus the rejected ones
+        rejected_lines = {reject["line"] for reject in rejects}
+        row_lines = [line_no for line_no, _ in lines if line_no not in rejected_lines]
+        sku_ids.update(row["sku_id"] for row in rows)
+        result = schemas.BulkChunkResult(
+            chunk=len(results),
+            rows=len(lines),
+            inserted=0,
+            rejected=len(rejects),
+            errors=rejects[:MAX_REPORTED_ERRORS],
+        )
+        results.append(result)
+        if event_bus is not None:
+            for row in event_ingest.sales_events(rows):
+                event_bus.publish(settings.KAFKA_SALES_TOPIC, row, key=row["sku_id"])
+            result.queued = len(rows)
+            return
+        # Only one write in flight: the session is not shared across threads
+        if pending_write is not None:
+            await pending_write
+        pending_write = asyncio.ensure_future(_write(result, rows, row_lines))
+
+    async def _write(result, rows, row_lines):
+        try:
+            result.inserted, rejects = await run_in_threadpool(write_chunk, db, rows, row_lines, update_forecasts)
+            result.rejected += len(rejects)
+            result.errors.extend(
+                schemas.BulkRowError(**reject) for reject in rejects[:MAX_REPORTED_ERRORS - len(result.errors)]
+            )
+        except Exception as e:
+            result.rejected += len(rows)
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(schemas.BulkRowError(line=0, error=f"Chunk write failed: {e}"))
+
+    async def invalidate_written():
+        if any(r.inserted for r in results):
+            await invalidate("analytics:sales")
+            await invalidate("forecast", *sku_ids)
+
+    lines = []
+    read_error = None
+    try:
+        async for data in request.stream():
+            lines.extend(parser.feed(data))
+            while len(lines) >= settings.SALES_BULK_CHUNK_SIZE:
+                await flush(lines[:settings.SALES_BULK_CHUNK_SIZE])
+                lines = lines[settings.SALES_BULK_CHUNK_SIZE:]
+        lines.extend(parser.finish())
+    except (ValueError, zlib.error) as e:
+        read_error = f"Could not read upload: {e}"
+        if not results:
+            raise HTTPException(status_code=400, detail=read_error)
+
+    if lines:
+        await flush(lines)
+    if read_error is not None:
+        # Earlier chunks are already written: report where reading stopped instead of failing
+        results.append(schemas.BulkChunkResult(
+            chunk=len(results),
+            rows=0,
+            inserted=0,
+            rejected=0,
+            errors=[schemas.BulkRowError(line=parser.line_no + 1, error=read_error)],
+        ))
+    if pending_write is not None:
+        await pending_write
+    await invalidate_written()
+
+    return {
+        "chunks": results,
+        "total_inserted": sum(r.inserted for r in results),
+        "total_rejected": sum(r.rejected for r in results),
+        "total_queued": sum(r.queued for r in results),
+    }
+
 @router.get("/forecast/{sku_id}", response_model=schemas.Forecast)
+@cached("forecast", ttl=300, scope_param="sku_id")
 async def get_forecast(
     sku_id: str,
     days: int = 7,
-    db: Session = Depends(deps.get_db),
+    engine: str = "prophet",
+    db: AsyncSession = Depends(deps.get_async_db),
+    ml: MLClient = Depends(deps.get_ml_client),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Get forecast for a SKU.
+    engine: "prophet" (default), "fast" for the lightweight NumPy models, or
+    "incremental" to serve from the running state kept up to date on ingest.
     """
-    # 1. Fetch historical data from DB
-    history = db.query(models.SalesData).filter(models.SalesData.sku_id == sku_id).all()
+    if engine == "incremental":
+        state = await db.scalar(
+            select(models.ForecastState).where(models.ForecastState.sku_id == sku_id)
+        )
+        if not state:
+            # First request for a SKU without state: seed it once from history
+            state = await db.run_sync(forecast_state.rebuild_state, sku_id)
+            if not state:
+                raise HTTPException(status_code=404, detail="No sales history for this SKU")
+            await db.commit()
+        latest_forecast = forecast_state.forecast(state, days)[-1]
+        return {
+            "id": 0, # Placeholder
+            "sku_id": sku_id,
+            "timestamp": latest_forecast["ds"],
+            "predicted_quantity": latest_forecast["yhat"],
+            "confidence_lower": latest_forecast["yhat_lower"],
+            "confidence_upper": latest_forecast["yhat_upper"],
+            "model_version": "incremental-v1"
+        }
+
+    # 1. Fetch daily totals from the rollup rather than raw sales rows
+    history = await db.run_sync(sales_rollup.daily_units, sku_id)
     
     # Format for ML service
     history_data = [
-        {"ds": d.timestamp.isoformat(), "y": d.quantity} for d in history
+        {"ds": day.isoformat(), "y": units} for day, units in history
     ]
 
     # 2. Call ML Service
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.ML_SERVICE_URL}/predict",
-                json={"history": history_data, "days": days}
-            )
-            response.raise_for_status()
-            prediction = response.json()
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
-        except httpx.HTTPStatusError as exc:
-             raise HTTPException(status_code=exc.response.status_code, detail=f"ML Service error: {exc.response.text}")
+    try:
+        prediction = await ml.post_json(
+            "/predict",
+            {"sku_id": sku_id, "history": history_data, "days": days, "engine": engine}
+        )
+    except MLServiceUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"ML Service unavailable: {exc}")
+    except MLServiceError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=f"ML Service error: {exc.detail}")
 
     # 3. Save forecast to DB (optional, but good for caching/audit)
     # For now, just return the prediction
@@ -0,0 +1,155 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import uuid
+from typing import Any, Callable, Optional
+
+import anyio
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 0.05
+
+# Delete the lock only if we still hold it
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def cached(namespace: str, ttl: int = 60, scope_param: Optional[str] = None, user_scoped: bool = False):
+    """
+    Cache-aside decorator for async read endpoints.
+
+    Responses are cached in Redis under the namespace, the endpoint and its
+    query/body parameters (dependencies such as sessions are ignored), plus
+    the user id when `user_scoped`. `scope_param` names a parameter whose
+    value partitions the namespace so writes can invalidate just that slice,
+    e.g. one SKU's forecasts. Concurrent misses for the same key are
+    collapsed: one request recomputes while the others wait for its result.
+    If Redis is unreachable the endpoint is simply called.
+    """
+    def decorator(func: Callable) -> Callable:
+        if not asyncio.iscoroutinefunction(func):
+            raise TypeError("cached() only wraps async endpoints")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            redis = get_redis()
+            scope = kwargs.get(scope_param) if scope_param else None
+            try:
+                key = await _cache_key(redis, namespace, scope, func, kwargs, user_scoped)
+                hit = await redis.get(key)
+            except RedisError as e:
+                logger.warning("Cache unavailable for %s: %s", namespace, e)
+                return await func(*args, **kwargs)
+            if hit is not None:
+                return json.loads(hit)
+            return await _compute_once(redis, key, ttl, func, args, kwargs)
+
+        return wrapper
+    return decorator
+
+
+async def invalidate(namespace: str, *scopes: Any) -> None:
+    """
+    Drop cached responses for a namespace, or only for the given scopes.
+    Keys are versioned, so this is one INCR per scope rather than a scan.
+    """
+    redis = get_redis()
+    try:
+        if not scopes:
+            await redis.incr(_version_key(namespace))
+            return
+        async with redis.pipeline(transaction=False) as pipe:
+            for scope in scopes:
+                pipe.incr(_version_key(namespace, scope))
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Could not invalidate cache for %s: %s", namespace, e)
+
+
+def invalidate_sync(namespace: str, *scopes: Any) -> None:
+    """
+    `invalidate` for sync endpoints, which run in a worker thread.
+    """
+    anyio.from_thread.run(invalidate, namespace, *scopes)
+
+
+async def _cache_key(redis, namespace, scope, func, kwargs, user_scoped) -> str:
+    version_keys = [_version_key(namespace)]
+    if scope is not None:
+        version_keys.append(_version_key(namespace, scope))
+    versions = await redis.mget(version_keys)
+
+    params = {}
+    for name, value in sorted(kwargs.items()):
+        if isinstance(value, BaseModel):
+            params[name] = value.model_dump(mode="json")
+        elif isinstance(value, _SCALARS) or (
+            isinstance(value, (list, tuple)) and all(isinstance(v, _SCALARS) for v in value)
+        ):
+            params[name] = value
+    identity = {"route": f"{func.__module__}.{func.__qualname__}", "params": params}
+    if user_scoped:
+        identity["user"] = kwargs["current_user"].id
+
+    digest = hashlib.sha1(json.dumps(identity, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    version = ".".join(v or "0" for v in versions)
+    prefix = f"cache:{namespace}" if scope is None else f"cache:{namespace}:{scope}"
+    return f"{prefix}:v{version}:{digest}"
+
+
+async def _compute_once(redis, key, ttl, func, args, kwargs):
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    timeout = settings.CACHE_LOCK_TIMEOUT_SECONDS
+    try:
+        acquired = await redis.set(lock_key, token, nx=True, px=int(timeout * 1000))
+    except RedisError:
+        return await func(*args, **kwargs)
+
+    if not acquired:
+        # Someone else is recomputing this key: wait for their result
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while loop.time() < deadline:
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                hit = await redis.get(key)
+                if hit is not None:
+                    return json.loads(hit)
+        except RedisError:
+            pass
+        return await func(*args, **kwargs)
+
+    try:
+        result = await func(*args, **kwargs)
+        try:
+            await redis.set(key, json.dumps(jsonable_encoder(result)), ex=ttl)
+        except RedisError as e:
+            logger.warning("Could not cache %s: %s", key, e)
+        return result
+    finally:
+        try:
+            await redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+        except RedisError:
+            pass
+
+
+def _version_key(namespace: str, scope: Any = None) -> str:
+    if scope is None:
+        return f"cache:{namespace}:version"
+    return f"cache:{namespace}:{scope}:version"
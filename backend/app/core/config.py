@@ -10,7 +10,48 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "password"
     POSTGRES_DB: str = "optibrain"
+    # Connection pool, applied to both the sync and the async engine
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
     
+    # Bulk sales ingestion: rows validated and written per transaction
+    SALES_BULK_CHUNK_SIZE: int = 50000
+    # Replenishment: target service level and EOQ cost inputs
+    INVENTORY_SERVICE_LEVEL: float = 0.95
+    INVENTORY_HOLDING_COST_RATE: float = 0.25 # Yearly holding cost as a fraction of unit cost
+    INVENTORY_ORDERING_COST: float = 50.0 # Fixed cost per purchase order
+
+    # Nightly replenishment planner (app.workers.replenishment_planner)
+    PLANNER_BATCH_SIZE: int = 20000 # Inventory rows per ML call and transaction
+    PLANNER_DEMAND_WINDOW_DAYS: int = 28 # Sales history used for outlet demand and variability
+    PLANNER_FORECAST_HORIZON_DAYS: int = 14
+    PLANNER_DEFAULT_LEAD_TIME_DAYS: int = 3 # For suppliers with no lead time recorded
+
+    # Price optimization: elasticity is fitted on this much daily history
+    PRICING_HISTORY_DAYS: int = 90
+    PRICING_FORECAST_HORIZON_DAYS: int = 7 # Demand the recommended price is optimized over
+    PRICING_BATCH_SIZE: int = 10000 # SKUs per ML call and PriceLog INSERT in a catalog reprice
+    PRICING_ML_TIMEOUT_SECONDS: float = 120.0
+    PRICE_LOG_PARTITION_MONTHS_AHEAD: int = 3 # Monthly price_logs partitions kept ready
+    PRICE_LOG_PARTITION_CHECK_HOURS: float = 24.0 # How often each API process tops them up
+
+    # Order routing: "redis" shares the stock index across workers, "memory" keeps one per process
+    ROUTING_STOCK_INDEX: str = "redis"
+    ROUTING_INDEX_TTL_SECONDS: int = 3600 # Indexed SKUs are reloaded from the database after this
+    # Orders with a destination go to the cheapest of their nearest nodes, where cost is priority plus distance
+    ROUTING_NODE_INDEX_TTL_SECONDS: int = 300 # Node locations are reloaded from the database after this
+    ROUTING_CANDIDATE_NODES: int = 20
+    ROUTING_COST_PER_KM: float = 0.02 # 50 km costs as much as one priority level
+    # Batch routing: pending orders per solve, and the cost model (a node's priority is its cost per unit)
+    ROUTING_BATCH_SIZE: int = 2000
+    ROUTING_SHIPMENT_COST: float = 5.0 # Per shipment, so splitting an order has to pay off
+    ROUTING_SOLVER_TIME_LIMIT_SECONDS: float = 10.0
+
+    # Rows per bulk UPDATE statement (sent as one array per column)
+    BULK_UPDATE_CHUNK_SIZE: int = 10000
+
     # Security
     SECRET_KEY: str = "YOUR_SECRET_KEY_HERE" # Change this in production!
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8 # 8 days
@@ -18,12 +59,44 @@ class Settings(BaseSettings):
     # Redis
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
+    REDIS_MAX_CONNECTIONS: int = 50
+
+    # Response cache
+    CACHE_LOCK_TIMEOUT_SECONDS: float = 10.0 # How long other requests wait on a recompute
     
     # Kafka
     KAFKA_BOOTSTRAP_SERVERS: str = "kafka:9092"
+    KAFKA_LINGER_MS: int = 5
+    KAFKA_ORDERS_TOPIC: str = "orders"
+    KAFKA_SALES_TOPIC: str = "sales"
+    KAFKA_CONSUMER_GROUP: str = "optibrain-ingest"
+
+    # Bulk order ingestion: orders per request, all written in one transaction
+    ORDER_BULK_MAX_SIZE: int = 10000
+
+    # Order and sales ingestion: "sync" writes them in the request, "kafka" publishes them for
+    # the event consumer (app.workers.event_consumer), "memory" queues them to a consumer
+    # running inside the API process, for tests and development without a broker
+    EVENT_BACKEND: str = "sync"
+    EVENT_BATCH_SIZE: int = 5000 # Events per consumer transaction
+    EVENT_BATCH_TIMEOUT_MS: int = 1000 # Longest a partial batch waits for more events
+    EVENT_RETRY_BACKOFF_SECONDS: float = 5.0 # After a failed write, before re-reading the batch
 
     # ML Service
     ML_SERVICE_URL: str = "http://ml:8001"
+    ML_TIMEOUT_SECONDS: float = 30.0
+    ML_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    ML_MAX_CONNECTIONS: int = 100
+    ML_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    ML_MAX_CONCURRENCY: int = 50 # In-flight requests per backend worker
+    ML_HTTP2: bool = False # Requires the h2 package
+    ML_MAX_RETRIES: int = 3
+    ML_RETRY_BACKOFF_SECONDS: float = 0.2
+    ML_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    ML_CIRCUIT_RESET_SECONDS: float = 30.0
+    # Segmentation streams the whole customer base, so it gets a longer read timeout
+    ML_SEGMENT_TIMEOUT_SECONDS: float = 600.0
+    SEGMENT_STREAM_BATCH_SIZE: int = 10000 # Customers per streamed RFM batch
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.kafka import get_kafka_consumer, get_kafka_producer
+
+logger = logging.getLogger(__name__)
+
+# topic -> event payloads, in publish order per partition
+EventBatch = Dict[str, List[Dict[str, Any]]]
+
+EVENT_TOPICS = (settings.KAFKA_ORDERS_TOPIC, settings.KAFKA_SALES_TOPIC)
+
+
+class KafkaEventBus:
+    """
+    Publishes JSON events to Kafka. `publish` doesn't wait for the broker:
+    the producer batches sends in the background and `close` flushes them.
+    """
+
+    def __init__(self):
+        self._producer = get_kafka_producer()
+
+    def publish(self, topic: str, value: Dict[str, Any], key: Optional[str] = None) -> None:
+        self._producer.send(topic, value=value, key=key).add_errback(
+            lambda e: logger.error("Could not publish to %s: %s", topic, e)
+        )
+
+    def consumer(self, topics: Sequence[str]) -> "KafkaEventConsumer":
+        return KafkaEventConsumer(topics)
+
+    def close(self) -> None:
+        self._producer.flush()
+        self._producer.close()
+
+
+class KafkaEventConsumer:
+    """
+    Consumer-group member with manual offset commits, so the caller commits
+    only after a batch is written.
+    """
+
+    def __init__(self, topics: Sequence[str]):
+        self._consumer = get_kafka_consumer(
+            *topics, group_id=settings.KAFKA_CONSUMER_GROUP, enable_auto_commit=False
+        )
+
+    def poll(self, max_records: int, timeout_ms: int) -> EventBatch:
+        batch = defaultdict(list)
+        for partition, messages in self._consumer.poll(timeout_ms=timeout_ms, max_records=max_records).items():
+            batch[partition.topic].extend(message.value for message in messages)
+        return batch
+
+    def commit(self) -> None:
+        self._consumer.commit()
+
+    def rewind(self) -> None:
+        """
+        Go back to the last committed offsets, to re-read an unwritten batch.
+        """
+        for partition in self._consumer.assignment():
+            offset = self._consumer.committed(partition)
+            if offset is None:
+                self._consumer.seek_to_beginning(partition)
+            else:
+                self._consumer.seek(partition, offset)
+
+    def close(self) -> None:
+        self._consumer.close(autocommit=False)
+
+
+class MemoryEventBus:
+    """
+    In-process stand-in for Kafka with the same at-least-once semantics for
+    a single consumer: events stay queued until the consumer commits them.
+    """
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._topics: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+    def publish(self, topic: str, value: Dict[str, Any], key: Optional[str] = None) -> None:
+        with self._changed:
+            self._topics[topic].append(value)
+            self._changed.notify_all()
+
+    def consumer(self, topics: Sequence[str]) -> "MemoryEventConsumer":
+        return MemoryEventConsumer(self, topics)
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryEventConsumer:
+    def __init__(self, bus: MemoryEventBus, topics: Sequence[str]):
+        self._bus = bus
+        self._position = {topic: 0 for topic in topics} # Events read since the last commit
+
+    def poll(self, max_records: int, timeout_ms: int) -> EventBatch:
+        deadline = time.monotonic() + timeout_ms / 1000
+        batch = defaultdict(list)
+        with self._bus._changed:
+            while True:
+                for topic, position in self._position.items():
+                    events = self._bus._topics[topic][position:position + max_records - self._count(batch)]
+                    batch[topic].extend(events)
+                    self._position[topic] += len(events)
+                remaining = deadline - time.monotonic()
+                if self._count(batch) or remaining <= 0:
+                    return batch
+                self._bus._changed.wait(remaining)
+
+    def commit(self) -> None:
+        with self._bus._changed:
+            for topic, position in self._position.items():
+                del self._bus._topics[topic][:position]
+                self._position[topic] = 0
+
+    def rewind(self) -> None:
+        with self._bus._changed:
+            for topic in self._position:
+                self._position[topic] = 0
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _count(batch: EventBatch) -> int:
+        return sum(len(events) for events in batch.values())
+
+
+def create_event_bus():
+    """
+    The bus for EVENT_BACKEND, or None when orders and sales are written
+    synchronously.
+    """
+    if settings.EVENT_BACKEND == "kafka":
+        return KafkaEventBus()
+    if settings.EVENT_BACKEND == "memory":
+        return MemoryEventBus()
+    return None
@@ -5,14 +5,19 @@ from app.core.config import settings
 def get_kafka_producer():
     return KafkaProducer(
         bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
-        value_serializer=lambda v: json.dumps(v).encode('utf-8')
+        value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+        key_serializer=lambda k: k.encode('utf-8') if k is not None else None,
+        acks='all',
+        linger_ms=settings.KAFKA_LINGER_MS, # Batch sends from concurrent requests
     )
 
-def get_kafka_consumer(topic: str):
+def get_kafka_consumer(*topics: str, group_id=None, enable_auto_commit: bool = True, **kwargs):
     return KafkaConsumer(
-        topic,
+        *topics,
         bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
         value_deserializer=lambda x: json.loads(x.decode('utf-8')),
         auto_offset_reset='earliest',
-        enable_auto_commit=True,
+        group_id=group_id,
+        enable_auto_commit=enable_auto_commit,
+        **kwargs,
     )
@@ -0,0 +1,191 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+from app.core.config import settings
+
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class MLServiceError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class MLServiceUnavailable(MLServiceError):
+    def __init__(self, detail: str):
+        super().__init__(503, detail)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failures, then lets a
+    single trial request through once `reset_timeout` seconds have passed.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def end_trial(self) -> None:
+        """
+        Let the next trial through once this one is over, whatever its
+        outcome (including cancellation or an unexpected error).
+        """
+        self._trial_in_flight = False
+
+
+class MLClient:
+    """
+    Application-scoped client for the ML service: one keep-alive connection
+    pool, bounded concurrency, retries with jittered backoff on transport
+    errors and 502/503/504, and a circuit breaker.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float,
+        connect_timeout: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+        max_concurrency: int,
+        max_retries: int,
+        retry_backoff: float,
+        circuit_failure_threshold: int,
+        circuit_reset_timeout: float,
+        http2: bool = False,
+    ):
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            http2=http2,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.breaker = CircuitBreaker(circuit_failure_threshold, circuit_reset_timeout)
+
+    async def post_json(self, path: str, payload: Any, **kwargs) -> Any:
+        """
+        POST a JSON payload and return the decoded JSON response.
+        Raises MLServiceUnavailable when the service can't be reached and
+        MLServiceError for other error responses.
+        """
+        response = await self._request("POST", path, json=payload, **kwargs)
+        return response.json()
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Streamed request; not retried once the response has started.
+        """
+        if not self.breaker.allow():
+            raise MLServiceUnavailable("circuit open")
+        trial = self.breaker.opened_at is not None # The one request let through while open
+        try:
+            async with self._semaphore:
+                try:
+                    async with self._client.stream(method, path, **kwargs) as response:
+                        if response.status_code >= 400:
+                            await response.aread()
+                            self._raise_for_status(response)
+                        self.breaker.record_success()
+                        yield response
+                except httpx.TransportError as exc:
+                    self.breaker.record_failure()
+                    raise MLServiceUnavailable(str(exc)) from exc
+        finally:
+            if trial:
+                self.breaker.end_trial()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        if not self.breaker.allow():
+            raise MLServiceUnavailable("circuit open")
+        trial = self.breaker.opened_at is not None # The one request let through while open
+        try:
+            return await self._attempt(method, path, **kwargs)
+        finally:
+            if trial:
+                self.breaker.end_trial()
+
+    async def _attempt(self, method: str, path: str, **kwargs) -> httpx.Response:
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # Full jitter: sleep a random slice of the exponential backoff
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** (attempt - 1)))
+            try:
+                async with self._semaphore:
+                    response = await self._client.request(method, path, **kwargs)
+            except httpx.TransportError as exc:
+                last_error = MLServiceUnavailable(str(exc))
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                last_error = MLServiceUnavailable(response.text)
+                continue
+
+            self.breaker.record_success()
+            self._raise_for_status(response)
+            return response
+
+        self.breaker.record_failure()
+        raise last_error
+
+    def _raise_for_status(self, response: httpx.Response) -> None:
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            self.breaker.record_failure()
+            raise MLServiceUnavailable(response.text)
+        if response.status_code >= 400:
+            raise MLServiceError(response.status_code, response.text)
+
+
+def create_ml_client() -> MLClient:
+    return MLClient(
+        base_url=settings.ML_SERVICE_URL,
+        timeout=settings.ML_TIMEOUT_SECONDS,
+        connect_timeout=settings.ML_CONNECT_TIMEOUT_SECONDS,
+        max_connections=settings.ML_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.ML_MAX_KEEPALIVE_CONNECTIONS,
+        max_concurrency=settings.ML_MAX_CONCURRENCY,
+        max_retries=settings.ML_MAX_RETRIES,
+        retry_backoff=settings.ML_RETRY_BACKOFF_SECONDS,
+        circuit_failure_threshold=settings.ML_CIRCUIT_FAILURE_THRESHOLD,
+        circuit_reset_timeout=settings.ML_CIRCUIT_RESET_SECONDS,
+        http2=settings.ML_HTTP2,
+    )
@@ -1,9 +1,30 @@
+from typing import Optional
+
 import redis.asyncio as redis
 from app.core.config import settings
 
+# Process-wide client; its connection pool is shared by every request
+_redis: Optional[redis.Redis] = None
+
+def init_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.from_url(
+            f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
+            encoding="utf-8",
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+        )
+    return _redis
+
+async def close_redis() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+def get_redis() -> redis.Redis:
+    return init_redis()
+
 async def get_redis_pool():
-    return redis.from_url(
-        f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
-        encoding="utf-8",
-        decode_responses=True,
-    )
+    return get_redis()
@@ -0,0 +1,114 @@
+import csv
+import io
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import bindparam, column, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.orm import Session
+
+
+def copy_rows(db: Session, table, columns: Sequence[str], rows: List[Dict[str, Any]]) -> int:
+    """
+    Bulk-insert rows inside the session's current transaction.
+
+    Uses Postgres COPY when the session runs on psycopg2 and falls back to a
+    batched executemany insert otherwise. The caller owns the commit.
+    """
+    if not rows:
+        return 0
+
+    dbapi_conn = db.connection().connection.driver_connection
+    if type(dbapi_conn).__module__.startswith("psycopg2"):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(row.get(col)) for col in columns])
+        buffer.seek(0)
+        with dbapi_conn.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        return len(rows)
+
+    db.execute(insert(table), [{col: row.get(col) for col in columns} for row in rows])
+    return len(rows)
+
+
+def bulk_update(
+    table, key: str, rows: List[Dict[str, Any]], chunk_size: int, skip_unchanged: bool = False
+) -> Iterator[Tuple[Any, Dict[str, list]]]:
+    """
+    Yield (statement, params) pairs that update `rows` by `key`,
+    `chunk_size` rows per statement. Every row must have the same keys.
+
+    Each chunk is sent as one array per column and joined as
+    `UPDATE table SET ... FROM unnest(...) AS v WHERE table.key = v.key`,
+    so the statement compiles once and is reused whatever the chunk size,
+    unlike a literal VALUES list. With `skip_unchanged`, rows whose values
+    already match are left alone (no new row versions, no WAL). Works with
+    sync and async sessions; the caller executes the statements and owns
+    the commit.
+    """
+    if not rows:
+        return
+    names = list(rows[0])
+    v = _unnest(table, names)
+    set_columns = [name for name in names if name != key]
+    statement = (
+        update(table)
+        .where(table.c[key] == v.c[key])
+        .values({name: v.c[name] for name in set_columns})
+    )
+    if skip_unchanged:
+        statement = statement.where(or_(*(table.c[name].is_distinct_from(v.c[name]) for name in set_columns)))
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        yield statement, {f"v_{name}": [row[name] for row in chunk] for name in names}
+
+
+def _unnest(table, names: Sequence[str]):
+    return func.unnest(
+        *(bindparam(f"v_{name}", type_=ARRAY(table.c[name].type)) for name in names)
+    ).table_valued(*(column(name, table.c[name].type) for name in names)).render_derived(name="v")
+
+
+def bulk_insert_ignore(
+    table, conflict_columns: Sequence[str], rows: List[Dict[str, Any]], chunk_size: int,
+    returning: Sequence[str] = (),
+) -> Iterator[Tuple[Any, Dict[str, list]]]:
+    """
+    Yield (statement, params) pairs that insert `rows`, `chunk_size` rows
+    per statement, skipping rows that conflict with an existing row (or an
+    earlier one in the same statement) on the unique index over
+    `conflict_columns`. Every row must have the same keys.
+
+    Rows are sent as one array per column like bulk_update, and inserted
+    in conflict-key order so concurrent batches take index locks in the
+    same order. With `returning`, the statements return those columns of
+    the rows actually inserted. The caller owns the commit.
+    """
+    if not rows:
+        return
+    names = list(rows[0])
+    v = _unnest(table, names)
+    statement = (
+        pg_insert(table)
+        .from_select(names, select(*(v.c[name] for name in names)))
+        .on_conflict_do_nothing(index_elements=list(conflict_columns))
+    )
+    if returning:
+        statement = statement.returning(*(table.c[name] for name in returning))
+    rows = sorted(rows, key=lambda row: tuple((row[name] is None, row[name]) for name in conflict_columns))
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        yield statement, {f"v_{name}": [row[name] for row in chunk] for name in names}
+
+
+def _copy_value(value: Any) -> Any:
+    # Unquoted empty fields are NULL in COPY's csv format
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
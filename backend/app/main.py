@@ -1,11 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.core.config import settings
+from app.core.events import EVENT_TOPICS, MemoryEventBus, create_event_bus
+from app.core.ml_client import create_ml_client
+from app.core.redis import init_redis, close_redis
+from app.db.session import async_engine
+from app.services.node_locator import NodeLocator
+from app.services.stock_index import create_stock_index
+from app.workers import price_log_partitions
+from app.workers.event_consumer import consume
 
 from app.api.v1.api import api_router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled ML client per worker, shared by every request
+    app.state.ml_client = create_ml_client()
+    app.state.stock_index = create_stock_index()
+    app.state.node_locator = NodeLocator()
+    app.state.event_bus = create_event_bus()
+    init_redis()
+    # Keep next months' price_logs partitions ready; the check is idempotent across workers
+    stop_maintenance = asyncio.Event()
+    partition_task = asyncio.create_task(price_log_partitions.maintain(
+        settings.PRICE_LOG_PARTITION_CHECK_HOURS * 3600, stop_maintenance
+    ))
+    # The in-memory bus has no broker, so its consumer runs in this process
+    consumer_task, stop_consumer = None, asyncio.Event()
+    if isinstance(app.state.event_bus, MemoryEventBus):
+        consumer_task = asyncio.create_task(consume(
+            app.state.event_bus.consumer(EVENT_TOPICS),
+            settings.EVENT_BATCH_SIZE, settings.EVENT_BATCH_TIMEOUT_MS, stop_consumer,
+        ))
+    yield
+    stop_maintenance.set()
+    await partition_task
+    if consumer_task is not None:
+        stop_consumer.set()
+        await consumer_task
+    if app.state.event_bus is not None:
+        app.state.event_bus.close()
+    await app.state.ml_client.aclose()
+    await close_redis()
+    await async_engine.dispose()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
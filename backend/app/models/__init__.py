@@ -1,6 +1,7 @@
 from .user import User
-from .sales import SalesData, Forecast
-from .pricing import PricingRule, PriceLog
-from .inventory import Supplier, Inventory, PurchaseOrder
-from .fulfillment import Channel, FulfillmentNode, OrderSource
-from .customer import Customer, CustomerSegment
+from .sales import SalesData, SalesDailyRollup, Forecast, ForecastState
+from .pricing import PricingRule, PriceLog, SkuCurrentPrice
+from .inventory import Supplier, Inventory, PurchaseOrder, ReplenishmentRun
+from .fulfillment import Channel, FulfillmentNode, OrderSource, OrderAllocation
+from .customer import Customer, CustomerSegment, CustomerRFM
+from .event import EventDeadLetter
@@ -25,3 +25,13 @@ class CustomerSegment(Base):
     description = Column(String)
     
     customers = relationship("Customer", back_populates="segment")
+
+class CustomerRFM(Base):
+    __tablename__ = "customer_rfm"
+
+    # RFM features from sales; maintained on ingest, refresh with `python -m app.services.customer_rfm`
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    last_purchase_at = Column(DateTime, nullable=False) # Recency is derived at query time
+    frequency = Column(Integer, nullable=False, default=0) # Number of purchases
+    monetary = Column(Float, nullable=False, default=0.0) # Total spend
+    updated_at = Column(DateTime)
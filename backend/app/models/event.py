@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from app.db.base import Base
+from datetime import datetime
+
+class EventDeadLetter(Base):
+    __tablename__ = "event_dead_letters"
+
+    # An order or sales event the consumer couldn't write; replay it once fixed
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String, index=True, nullable=False)
+    payload = Column(JSON, nullable=False)
+    error = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 import enum
@@ -15,8 +15,12 @@ class FulfillmentNode(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
     location = Column(String) # e.g., "New York, NY"
+    latitude = Column(Float) # Degrees; nodes without coordinates are only routed to by priority
+    longitude = Column(Float)
+    outlet_id = Column(String, unique=True, index=True) # Inventory.outlet_id this node ships from
     is_active = Column(Boolean, default=True)
     priority = Column(Integer, default=1) # Lower number = higher priority
+    capacity = Column(Integer) # Max units routed to the node per day (UTC); None = unlimited
 
 class Channel(Base):
     __tablename__ = "channels"
@@ -36,7 +40,29 @@ class OrderSource(Base):
     quantity = Column(Integer, nullable=False)
     status = Column(String, default="pending")
     fulfillment_node_id = Column(Integer, ForeignKey("fulfillment_nodes.id"), nullable=True)
+    destination_latitude = Column(Float) # Where the order ships to, if known
+    destination_longitude = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     channel = relationship("Channel")
     fulfillment_node = relationship("FulfillmentNode")
+
+    __table_args__ = (
+        # Channels retry webhooks, so an order is ingested at most once per channel
+        Index("ix_order_sources_channel_id_external_order_id", "channel_id", "external_order_id", unique=True),
+    )
+
+class OrderAllocation(Base):
+    __tablename__ = "order_allocations"
+
+    # One shipment of an order; batch routing can split an order across nodes
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("order_sources.id"), index=True, nullable=False)
+    fulfillment_node_id = Column(Integer, ForeignKey("fulfillment_nodes.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Units allocated to a node today, checked against its daily capacity
+        Index("ix_order_allocations_node_id_created_at", "fulfillment_node_id", "created_at"),
+    )
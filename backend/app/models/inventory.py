@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 import enum
@@ -24,9 +24,20 @@ class Inventory(Base):
     sku_id = Column(String, index=True, nullable=False)
     outlet_id = Column(String, index=True, nullable=False)
     quantity = Column(Integer, default=0)
+    reserved = Column(Integer, default=0, nullable=False) # Held for routed orders
     reorder_point = Column(Integer, default=10)
+    unit_cost = Column(Float, default=0.0) # Used for stock valuation
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), index=True, nullable=True) # Preferred supplier
     last_updated = Column(DateTime)
 
+    __table_args__ = (
+        # Partial index: only rows currently below their reorder point
+        Index(
+            "ix_inventory_low_stock", "outlet_id", "sku_id",
+            postgresql_where=quantity < reorder_point,
+        ),
+    )
+
 class PurchaseOrder(Base):
     __tablename__ = "purchase_orders"
 
@@ -36,5 +47,25 @@ class PurchaseOrder(Base):
     quantity = Column(Integer, nullable=False)
     status = Column(String, default=POStatus.DRAFT)
     created_at = Column(DateTime)
+    run_id = Column(Integer, ForeignKey("replenishment_runs.id"), index=True, nullable=True) # Set by the planner
     
     supplier = relationship("Supplier")
+
+    __table_args__ = (
+        # The planner consolidates a run's orders into one PO per supplier and SKU
+        UniqueConstraint("run_id", "supplier_id", "sku_id", name="uq_purchase_orders_run_supplier_sku"),
+    )
+
+class ReplenishmentRun(Base):
+    __tablename__ = "replenishment_runs"
+
+    # Progress of one planner run; it resumes from last_inventory_id
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, default="running", nullable=False) # running, completed, failed
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    last_inventory_id = Column(Integer, default=0, nullable=False)
+    pairs_scanned = Column(Integer, default=0, nullable=False)
+    pairs_below_reorder_point = Column(Integer, default=0, nullable=False)
+    units_ordered = Column(Integer, default=0, nullable=False)
+    error = Column(String)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import DDL, BigInteger, Column, Integer, String, Float, DateTime, Boolean, Index, event
 from app.db.base import Base
 from datetime import datetime
 
@@ -15,10 +15,33 @@ class PricingRule(Base):
 class PriceLog(Base):
     __tablename__ = "price_logs"
 
-    id = Column(Integer, primary_key=True, index=True)
-    sku_id = Column(String, index=True, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    # Range-partitioned by month; see app.services.pricing.ensure_price_log_partitions
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    sku_id = Column(String, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     old_price = Column(Float, nullable=False)
     new_price = Column(Float, nullable=False)
     reason = Column(String) # e.g., "Demand Surge", "Competitor Match"
     model_version = Column(String)
+
+    __table_args__ = (
+        Index("ix_price_logs_sku_id_timestamp", sku_id, timestamp.desc()),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+# Catch-all partition, so rows outside the monthly partitions are never rejected
+event.listen(
+    PriceLog.__table__,
+    "after_create",
+    DDL("CREATE TABLE price_logs_default PARTITION OF price_logs DEFAULT"),
+)
+
+class SkuCurrentPrice(Base):
+    __tablename__ = "sku_current_prices"
+
+    # Latest price per SKU, maintained alongside price_logs
+    sku_id = Column(String, primary_key=True)
+    price = Column(Float, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+    previous_price = Column(Float) # Price before the latest change
+    previous_changed_at = Column(DateTime) # None when that price predates the log
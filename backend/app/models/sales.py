@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, ARRAY, Index
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -11,6 +11,24 @@ class SalesData(Base):
     quantity = Column(Float, nullable=False)
     price = Column(Float, nullable=False)
     outlet_id = Column(String, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), index=True, nullable=True)
+    event_id = Column(String, nullable=True) # Set for sales written from events, so redeliveries are skipped
+
+    __table_args__ = (
+        Index("ix_sales_data_sku_id_timestamp", "sku_id", "timestamp"),
+        Index("ix_sales_data_event_id", "event_id", unique=True),
+    )
+
+class SalesDailyRollup(Base):
+    __tablename__ = "sales_daily_rollup"
+
+    # Maintained on ingest; rebuild with `python -m app.services.sales_rollup`
+    sku_id = Column(String, primary_key=True)
+    outlet_id = Column(String, primary_key=True, default="") # "" when the sale had no outlet
+    day = Column(Date, primary_key=True)
+    units = Column(Float, nullable=False, default=0.0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    transaction_count = Column(Integer, nullable=False, default=0)
 
 class Forecast(Base):
     __tablename__ = "forecasts"
@@ -22,3 +40,18 @@ class Forecast(Base):
     confidence_lower = Column(Float)
     confidence_upper = Column(Float)
     model_version = Column(String)
+
+class ForecastState(Base):
+    __tablename__ = "forecast_states"
+
+    # Running exponential-smoothing state, updated on every sale
+    sku_id = Column(String, primary_key=True)
+    bucket_date = Column(Date, nullable=False) # Open (still accumulating) day
+    bucket_quantity = Column(Float, default=0.0)
+    level = Column(Float)
+    trend = Column(Float, default=0.0)
+    season = Column(ARRAY(Float)) # Additive weekly indices, by date ordinal % 7
+    n_observations = Column(Integer, default=0)
+    sq_error = Column(Float, default=0.0)
+    n_errors = Column(Integer, default=0)
+    updated_at = Column(DateTime)
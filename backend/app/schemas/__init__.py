@@ -0,0 +1,16 @@
+from .user import User, UserCreate, UserUpdate, UserInDB, Token, TokenPayload
+from .sales import (
+    SalesData, SalesDataCreate, SalesEvent, Forecast, ForecastRequest,
+    BulkRowError, BulkChunkResult, BulkIngestResult, EventQueued,
+)
+from .pricing import PricingRule, PricingRuleCreate, PriceLog, OptimizeRequest
+from .inventory import (
+    Supplier, SupplierCreate, Inventory, InventoryCreate,
+    PurchaseOrder, PurchaseOrderCreate, ReplenishRequest, ReplenishmentRun,
+)
+from .fulfillment import (
+    Channel, ChannelCreate, FulfillmentNode, FulfillmentNodeCreate, FulfillmentNodeUpdate,
+    OrderSource, OrderSourceCreate, OrderEvent, OrderAllocation, RoutingRequest,
+    OrderBulkCreate, OrderIngestResult, OrderBulkResult,
+)
+from .customer import Customer, CustomerCreate, CustomerSegment, CustomerSegmentCreate, SegmentationRequest
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -34,3 +34,6 @@ class Customer(CustomerBase):
 
 class SegmentationRequest(BaseModel):
     customer_ids: Optional[list[int]] = None # If None, segment all
+    mode: Literal["kmeans", "minibatch"] = "kmeans" # "minibatch" uses the ML service's persisted model
+    fit: bool = True # minibatch only: False assigns to existing segments without learning
+    n_segments: Optional[int] = None # kmeans only
@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from datetime import datetime
 from enum import Enum
 
@@ -11,12 +11,27 @@ class ChannelType(str, Enum):
 class FulfillmentNodeBase(BaseModel):
     name: str
     location: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    outlet_id: Optional[str] = None
     is_active: bool = True
     priority: int = 1
+    capacity: Optional[int] = None
 
 class FulfillmentNodeCreate(FulfillmentNodeBase):
     pass
 
+class FulfillmentNodeUpdate(BaseModel):
+    # Only the fields sent are changed
+    name: Optional[str] = None
+    location: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    outlet_id: Optional[str] = None
+    is_active: Optional[bool] = None
+    priority: Optional[int] = None
+    capacity: Optional[int] = None
+
 class FulfillmentNode(FulfillmentNodeBase):
     id: int
 
@@ -41,11 +56,31 @@ class OrderSourceBase(BaseModel):
     external_order_id: str
     channel_id: int
     sku_id: str
-    quantity: int
+    quantity: int = Field(gt=0)
+    destination_latitude: Optional[float] = Field(None, ge=-90, le=90)
+    destination_longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class OrderSourceCreate(OrderSourceBase):
     pass
 
+class OrderBulkCreate(BaseModel):
+    orders: List[OrderSourceCreate]
+
+class OrderIngestResult(BaseModel):
+    id: int
+    channel_id: int
+    external_order_id: str
+    created: bool # False if the channel had already sent this order
+
+class OrderBulkResult(BaseModel):
+    created: int
+    duplicates: int
+    results: List[OrderIngestResult] # In request order
+
+class OrderEvent(OrderSourceCreate):
+    # Published instead of written when EVENT_BACKEND isn't "sync"
+    created_at: datetime
+
 class OrderSource(OrderSourceBase):
     id: int
     status: str
@@ -55,5 +90,15 @@ class OrderSource(OrderSourceBase):
     class Config:
         from_attributes = True
 
+class OrderAllocation(BaseModel):
+    id: int
+    order_id: int
+    fulfillment_node_id: int
+    quantity: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class RoutingRequest(BaseModel):
     order_id: int
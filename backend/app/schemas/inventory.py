@@ -28,12 +28,15 @@ class InventoryBase(BaseModel):
     outlet_id: str
     quantity: int
     reorder_point: Optional[int] = 10
+    unit_cost: Optional[float] = 0.0
+    supplier_id: Optional[int] = None
 
 class InventoryCreate(InventoryBase):
     pass
 
 class Inventory(InventoryBase):
     id: int
+    reserved: int = 0
     last_updated: Optional[datetime] = None
 
     class Config:
@@ -56,6 +59,20 @@ class PurchaseOrder(PurchaseOrderBase):
     class Config:
         from_attributes = True
 
+class ReplenishmentRun(BaseModel):
+    id: int
+    status: str
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    last_inventory_id: int
+    pairs_scanned: int
+    pairs_below_reorder_point: int
+    units_ordered: int
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 class ReplenishRequest(BaseModel):
     sku_id: str
     outlet_id: str
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -34,5 +34,7 @@ class PriceLog(PriceLogBase):
 
 class OptimizeRequest(BaseModel):
     sku_id: str
-    current_price: float
+    current_price: Optional[float] = None # Used only when the SKU has no recorded price
     inventory_level: int
+    unit_cost: Optional[float] = None # Needed for the margin objective
+    objective: Literal["revenue", "margin"] = "margin"
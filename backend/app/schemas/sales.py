@@ -8,10 +8,15 @@ class SalesDataBase(BaseModel):
     quantity: float
     price: float
     outlet_id: Optional[str] = None
+    customer_id: Optional[int] = None
 
 class SalesDataCreate(SalesDataBase):
     pass
 
+class SalesEvent(SalesDataCreate):
+    # Published instead of written when EVENT_BACKEND isn't "sync"
+    event_id: str
+
 class SalesData(SalesDataBase):
     id: int
 
@@ -35,3 +40,25 @@ class Forecast(ForecastBase):
 class ForecastRequest(BaseModel):
     sku_id: str
     days: int = 7
+
+class BulkRowError(BaseModel):
+    line: int
+    error: str
+
+class BulkChunkResult(BaseModel):
+    chunk: int
+    rows: int
+    inserted: int
+    rejected: int
+    queued: int = 0 # Published for the event consumer instead of inserted
+    errors: List[BulkRowError] = []
+
+class BulkIngestResult(BaseModel):
+    chunks: List[BulkChunkResult]
+    total_inserted: int
+    total_rejected: int
+    total_queued: int = 0
+
+class EventQueued(BaseModel):
+    topic: str
+    status: str = "queued"
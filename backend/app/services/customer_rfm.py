@@ -0,0 +1,117 @@
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Float, Select, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+
+RFM = models.CustomerRFM
+
+
+def apply_sales(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Fold raw sales rows into the customer RFM features with one upsert.
+    Rows without a customer_id are ignored. The caller owns the transaction.
+    """
+    totals = {}
+    for row in rows:
+        customer_id = row.get("customer_id")
+        if customer_id is None:
+            continue
+        last, frequency, monetary = totals.get(customer_id, (row["timestamp"], 0, 0.0))
+        totals[customer_id] = (
+            max(last, row["timestamp"]),
+            frequency + 1,
+            monetary + row["quantity"] * row["price"],
+        )
+    if not totals:
+        return
+
+    now = datetime.utcnow()
+    stmt = insert(RFM).values([
+        {
+            "customer_id": customer_id,
+            "last_purchase_at": last,
+            "frequency": frequency,
+            "monetary": monetary,
+            "updated_at": now,
+        }
+        # Sorted so concurrent upserts take row locks in the same order
+        for customer_id, (last, frequency, monetary) in sorted(totals.items())
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["customer_id"],
+        set_={
+            "last_purchase_at": func.greatest(RFM.last_purchase_at, stmt.excluded.last_purchase_at),
+            "frequency": RFM.frequency + stmt.excluded.frequency,
+            "monetary": RFM.monetary + stmt.excluded.monetary,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+
+
+def refresh(db: Session, customer_ids: Optional[List[int]] = None) -> int:
+    """
+    Recompute RFM features from raw sales with one grouped INSERT ... SELECT,
+    for the given customers or everyone. Existing rows are overwritten in
+    place, so readers never see an empty table. Returns the number of rows
+    written. The caller owns the transaction.
+    """
+    sales = models.SalesData
+    query = select(
+        sales.customer_id,
+        func.max(sales.timestamp),
+        func.count(),
+        func.sum(sales.quantity * sales.price),
+        literal(datetime.utcnow()),
+    ).where(sales.customer_id.is_not(None)).group_by(sales.customer_id)
+    if customer_ids is not None:
+        query = query.where(sales.customer_id.in_(customer_ids))
+
+    stmt = insert(RFM).from_select(
+        ["customer_id", "last_purchase_at", "frequency", "monetary", "updated_at"], query
+    )
+    result = db.execute(stmt.on_conflict_do_update(
+        index_elements=["customer_id"],
+        set_={
+            "last_purchase_at": stmt.excluded.last_purchase_at,
+            "frequency": stmt.excluded.frequency,
+            "monetary": stmt.excluded.monetary,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+    return result.rowcount
+
+
+def features_query(customer_ids: Optional[List[int]] = None, as_of: Optional[datetime] = None) -> Select:
+    """
+    (customer_id, recency, frequency, monetary) rows, recency in days since
+    the last purchase. Usable from sync and async sessions alike.
+    """
+    as_of = as_of or datetime.utcnow()
+    recency = cast(func.extract("epoch", literal(as_of) - RFM.last_purchase_at), Float) / 86400.0
+    query = select(
+        RFM.customer_id, recency.label("recency"), RFM.frequency, RFM.monetary
+    ).order_by(RFM.customer_id)
+    if customer_ids is not None:
+        query = query.where(RFM.customer_id.in_(customer_ids))
+    return query
+
+
+if __name__ == "__main__":
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Recompute customer RFM features from raw sales data.")
+    parser.add_argument("--customer", type=int, action="append", help="Only refresh this customer (repeatable)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        written = refresh(db, args.customer)
+        db.commit()
+        print(f"Refreshed customer_rfm: {written} rows")
+    finally:
+        db.close()
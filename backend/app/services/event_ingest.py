@@ -0,0 +1,134 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Tuple, Type
+
+import psycopg2
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import exc, insert
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.core.config import settings
+from app.core.events import EventBatch
+from app.services.order_ingest import insert_orders
+from app.services.sales_ingest import apply_events
+
+logger = logging.getLogger(__name__)
+
+# Errors the database raises over the data itself, rather than over being
+# unavailable. Sales are COPYed through the raw psycopg2 cursor, whose
+# errors SQLAlchemy doesn't wrap.
+DATA_ERRORS = (exc.IntegrityError, exc.DataError, psycopg2.IntegrityError, psycopg2.DataError)
+
+# (topic, event, error)
+DeadLetter = Tuple[str, Any, str]
+
+
+def order_event(order_in: schemas.OrderSourceCreate, created_at) -> Dict[str, Any]:
+    return schemas.OrderEvent(**order_in.dict(), created_at=created_at).model_dump(mode="json")
+
+
+def sales_events(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validated sales rows as events, each with a new event_id.
+    """
+    events = jsonable_encoder(rows)
+    for event in events:
+        event["event_id"] = str(uuid.uuid4())
+    return events
+
+
+def _validate(
+    events: List[Any], schema: Type[BaseModel], topic: str
+) -> Tuple[List[Dict[str, Any]], List[DeadLetter]]:
+    rows, rejects = [], []
+    for event in events:
+        try:
+            rows.append(schema.model_validate(event).model_dump())
+        except ValidationError as e:
+            logger.warning("Dead-lettering invalid %s event %r: %s", topic, event, e)
+            rejects.append((topic, event, str(e)))
+    return rows, rejects
+
+
+def _dead_letter(db: Session, rejects: List[DeadLetter]) -> None:
+    if rejects:
+        now = datetime.utcnow()
+        db.execute(insert(models.EventDeadLetter), [
+            {"topic": topic, "payload": event, "error": error, "created_at": now}
+            for topic, event, error in rejects
+        ])
+
+
+def write_batch(db: Session, batch: EventBatch) -> Dict[str, Any]:
+    """
+    Write one batch of order and sales events in a single transaction:
+    orders and sales are inserted unless already stored (by channel and
+    external id, and by event_id), so redelivered events are skipped and
+    only new sales reach the rollups and forecast state. Events that fail
+    validation are dead-lettered in the same transaction. Returns counts
+    and the SKUs whose sales changed.
+    """
+    orders_topic, sales_topic = settings.KAFKA_ORDERS_TOPIC, settings.KAFKA_SALES_TOPIC
+    orders, order_rejects = _validate(batch.get(orders_topic, []), schemas.OrderEvent, orders_topic)
+    sales, sales_rejects = _validate(batch.get(sales_topic, []), schemas.SalesEvent, sales_topic)
+    try:
+        created = sum(new for _, new in insert_orders(db, orders))
+        new_sales = apply_events(db, sales)
+        _dead_letter(db, order_rejects + sales_rejects)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {
+        "orders": created,
+        "duplicate_orders": len(orders) - created,
+        "sales": len(new_sales),
+        "duplicate_sales": len(sales) - len(new_sales),
+        "rejected": len(order_rejects) + len(sales_rejects),
+        "sku_ids": {row["sku_id"] for row in new_sales},
+    }
+
+
+def write_events(db: Session, batch: EventBatch) -> Dict[str, Any]:
+    """
+    write_batch, isolating events the database rejects (a missing channel
+    or customer, a value out of range): a batch that fails on its data is
+    split in halves and each half retried, down to single events, which
+    are dead-lettered. Other errors, like the database being unavailable,
+    propagate for the caller to retry the whole batch.
+    """
+    try:
+        return write_batch(db, batch)
+    except DATA_ERRORS as e:
+        events = [(topic, event) for topic, events in batch.items() for event in events]
+        if len(events) > 1:
+            half = len(events) // 2
+            return _merge(write_events(db, _batch(events[:half])), write_events(db, _batch(events[half:])))
+        topic, event = events[0]
+        error = str(getattr(e, "orig", e)) # The driver's message, without the statement
+        logger.warning("Dead-lettering %s event %r the database rejected: %s", topic, event, error)
+        try:
+            _dead_letter(db, [(topic, event, error)])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return dict(_merge(), rejected=1)
+
+
+def _batch(events: List[Tuple[str, Any]]) -> EventBatch:
+    batch = {}
+    for topic, event in events:
+        batch.setdefault(topic, []).append(event)
+    return batch
+
+
+def _merge(*results: Dict[str, Any]) -> Dict[str, Any]:
+    merged = {"orders": 0, "duplicate_orders": 0, "sales": 0, "duplicate_sales": 0, "rejected": 0, "sku_ids": set()}
+    for result in results:
+        for key, value in result.items():
+            merged[key] = merged[key] | value if key == "sku_ids" else merged[key] + value
+    return merged
@@ -0,0 +1,177 @@
+import math
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services import sales_rollup
+
+# Same smoothing parameters as the ML service's fast Holt-Winters engine
+SEASON_LENGTH = 7
+ALPHA = 0.3
+BETA = 0.05
+GAMMA = 0.1
+PHI = 0.98
+Z_SCORE = 1.96
+
+# Longest run of zero-sale days replayed when a SKU wakes up after a gap
+MAX_GAP_DAYS = 365
+
+
+def apply_sale(db: Session, sku_id: str, timestamp: datetime, quantity: float) -> models.ForecastState:
+    """
+    Fold one sale into the SKU's running forecast state in O(1).
+    The caller owns the transaction.
+    """
+    return apply_sales(db, {(sku_id, timestamp.date()): quantity})[sku_id]
+
+
+def apply_sales(db: Session, daily: Dict[Tuple[str, date], float]) -> Dict[str, models.ForecastState]:
+    """
+    Fold per-(SKU, day) sale quantities into the running forecast states,
+    locking every affected state row with a single query.
+
+    Sales accumulate in each SKU's open daily bucket; once a sale lands on a
+    later day the bucket is closed into the smoothing state (plus one
+    zero-demand step per skipped day). Late sales for an already-closed day
+    are added to the open bucket rather than rewriting history.
+    The caller owns the transaction.
+    """
+    first_day = {}
+    for sku_id, day in daily:
+        first_day[sku_id] = min(day, first_day.get(sku_id, day))
+
+    now = datetime.utcnow()
+    db.execute(
+        insert(models.ForecastState)
+        .values([
+            {
+                "sku_id": sku_id,
+                "bucket_date": day,
+                "bucket_quantity": 0.0,
+                "season": [0.0] * SEASON_LENGTH,
+                "updated_at": now,
+            }
+            for sku_id, day in first_day.items()
+        ])
+        .on_conflict_do_nothing(index_elements=["sku_id"])
+    )
+    # Lock in a stable order so concurrent writers can't deadlock
+    states = {
+        state.sku_id: state
+        for state in db.query(models.ForecastState).filter(
+            models.ForecastState.sku_id.in_(list(first_day))
+        ).order_by(models.ForecastState.sku_id).with_for_update()
+    }
+
+    for sku_id, day in sorted(daily):
+        state = states[sku_id]
+        if day > state.bucket_date:
+            _advance(state, day)
+        state.bucket_quantity += daily[(sku_id, day)]
+        state.updated_at = now
+    return states
+
+
+def rebuild_state(db: Session, sku_id: str) -> Optional[models.ForecastState]:
+    """
+    Recompute a SKU's state from its daily sales rollup, one step per day.
+    Used to seed SKUs that predate incremental tracking.
+    """
+    daily = sales_rollup.daily_units(db, sku_id)
+    if not daily:
+        return None
+
+    state = db.query(models.ForecastState).filter(
+        models.ForecastState.sku_id == sku_id
+    ).with_for_update().first()
+    if not state:
+        state = models.ForecastState(sku_id=sku_id)
+    _reset(state, daily[0][0])
+
+    for day, quantity in daily:
+        if day > state.bucket_date:
+            _advance(state, day)
+        state.bucket_quantity += quantity
+    state.updated_at = datetime.utcnow()
+    db.add(state)
+    return state
+
+
+def forecast(state: models.ForecastState, days: int = 7) -> List[Dict[str, Any]]:
+    """
+    Forecast the days after the open bucket from the smoothing state alone,
+    in the same ds/yhat/yhat_lower/yhat_upper shape as the ML service.
+    """
+    level = state.level if state.level is not None else state.bucket_quantity
+    sigma = math.sqrt(state.sq_error / state.n_errors) if state.n_errors else 0.0
+
+    # Step 1 is the open bucket itself
+    records = []
+    damped = PHI
+    for step in range(2, days + 2):
+        damped += PHI ** step
+        ds = state.bucket_date + timedelta(days=step - 1)
+        yhat = max(level + state.trend * damped + state.season[_season_index(ds)], 0.0)
+        spread = Z_SCORE * sigma * math.sqrt(step)
+        records.append({
+            "ds": datetime.combine(ds, datetime.min.time()).isoformat(),
+            "yhat": yhat,
+            "yhat_lower": max(yhat - spread, 0.0),
+            "yhat_upper": yhat + spread,
+        })
+    return records
+
+
+def _reset(state: models.ForecastState, bucket_date: date) -> None:
+    state.bucket_date = bucket_date
+    state.bucket_quantity = 0.0
+    state.level = None
+    state.trend = 0.0
+    state.season = [0.0] * SEASON_LENGTH
+    state.n_observations = 0
+    state.sq_error = 0.0
+    state.n_errors = 0
+
+
+def _advance(state: models.ForecastState, new_date: date) -> None:
+    """
+    Close the open bucket and any empty days up to `new_date`.
+    """
+    gap = (new_date - state.bucket_date).days - 1
+    _observe(state, state.bucket_date, state.bucket_quantity)
+    for offset in range(max(gap - MAX_GAP_DAYS, 0) + 1, gap + 1):
+        _observe(state, state.bucket_date + timedelta(days=offset), 0.0)
+    state.bucket_date = new_date
+    state.bucket_quantity = 0.0
+
+
+def _observe(state: models.ForecastState, day: date, y: float) -> None:
+    season = list(state.season)
+    idx = _season_index(day)
+    s = season[idx]
+
+    if state.level is None:
+        state.level = y
+    else:
+        level = state.level
+        trend = state.trend
+        # Skip the first season while the seasonal indices warm up
+        if state.n_observations >= SEASON_LENGTH:
+            error = y - (level + PHI * trend + s)
+            state.sq_error += error ** 2
+            state.n_errors += 1
+        new_level = ALPHA * (y - s) + (1 - ALPHA) * (level + PHI * trend)
+        state.trend = BETA * (new_level - level) + (1 - BETA) * PHI * trend
+        state.level = new_level
+        season[idx] = GAMMA * (y - new_level) + (1 - GAMMA) * s
+
+    state.n_observations += 1
+    # Reassign so SQLAlchemy notices the array changed
+    state.season = season
+
+
+def _season_index(day: date) -> int:
+    return day.toordinal() % SEASON_LENGTH
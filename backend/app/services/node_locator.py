@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from redis.exceptions import RedisError
+from scipy.spatial import cKDTree
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+VERSION_KEY = "nodeidx:version"
+VERSION_CHECK_INTERVAL_SECONDS = 1.0
+
+
+def _unit_vectors(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([
+        np.cos(latitude) * np.cos(longitude), np.cos(latitude) * np.sin(longitude), np.sin(latitude)
+    ])
+
+
+class NodeLocator:
+    """
+    Per-process KD-tree over active nodes that have coordinates, for
+    k-nearest-node lookups in microseconds per order. Points are unit
+    vectors, so the nearest by straight-line distance are the nearest on
+    the globe.
+
+    Node changes bump a version in Redis (see `invalidate`), which each
+    worker checks at most once a second before a lookup; the tree is also
+    rebuilt after ROUTING_NODE_INDEX_TTL_SECONDS to pick up changes made
+    outside the API.
+    """
+
+    def __init__(self):
+        self._tree: Optional[cKDTree] = None
+        self._node_ids = np.empty(0, dtype=np.int64)
+        self._priorities = np.empty(0)
+        self._built_at = 0.0
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def nearest(self, db: AsyncSession, latitude: float, longitude: float, k: int) -> List[Tuple[int, float]]:
+        """
+        Up to k (node_id, distance_km) pairs, nearest first.
+        """
+        await self._ensure_fresh(db)
+        tree, node_ids = self._tree, self._node_ids
+        if tree is None or not len(node_ids):
+            return []
+        distance, index = self._query(tree, latitude, longitude, min(k, len(node_ids)))
+        return list(zip(node_ids[index].tolist(), distance.tolist()))
+
+    async def candidates(self, db: AsyncSession, latitude: float, longitude: float, k: int) -> List[int]:
+        """
+        The k nearest node ids, cheapest first, where a node's cost is its
+        priority plus ROUTING_COST_PER_KM per km away.
+        """
+        await self._ensure_fresh(db)
+        tree, node_ids, priorities = self._tree, self._node_ids, self._priorities
+        if tree is None or not len(node_ids):
+            return []
+        distance, index = self._query(tree, latitude, longitude, min(k, len(node_ids)))
+        cost = priorities[index] + distance * settings.ROUTING_COST_PER_KM
+        return node_ids[index[np.argsort(cost, kind="stable")]].tolist()
+
+    @staticmethod
+    def _query(tree: cKDTree, latitude: float, longitude: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        chord, index = tree.query(_unit_vectors(np.array([latitude]), np.array([longitude]))[0], k=k)
+        chord, index = np.atleast_1d(chord), np.atleast_1d(index) # Scalars when k is 1
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1)), index
+
+    async def invalidate(self) -> None:
+        self._built_at = 0.0
+        try:
+            await get_redis().incr(VERSION_KEY)
+        except RedisError as e:
+            logger.warning("Could not publish node index change: %s", e)
+
+    async def _ensure_fresh(self, db: AsyncSession) -> None:
+        now = time.monotonic()
+        stale = not self._built_at or now - self._built_at > settings.ROUTING_NODE_INDEX_TTL_SECONDS
+        if not stale and now - self._checked_at >= VERSION_CHECK_INTERVAL_SECONDS:
+            self._checked_at = now
+            stale = await self._current_version() != self._version
+        if stale:
+            async with self._lock:
+                if self._built_at < now: # Not rebuilt while we waited
+                    await self._rebuild(db)
+
+    async def _current_version(self) -> Optional[str]:
+        try:
+            return await get_redis().get(VERSION_KEY)
+        except RedisError as e:
+            logger.warning("Node index version unavailable: %s", e)
+            return self._version
+
+    async def _rebuild(self, db: AsyncSession) -> None:
+        version = await self._current_version()
+        rows = (await db.execute(
+            select(
+                models.FulfillmentNode.id, models.FulfillmentNode.priority,
+                models.FulfillmentNode.latitude, models.FulfillmentNode.longitude,
+            )
+            .where(
+                models.FulfillmentNode.is_active == True,
+                models.FulfillmentNode.latitude.is_not(None),
+                models.FulfillmentNode.longitude.is_not(None),
+            )
+        )).all()
+        node_ids = np.array([row.id for row in rows], dtype=np.int64)
+        priorities = np.array([row.priority or 0 for row in rows], dtype=float)
+        tree = None
+        if rows:
+            tree = cKDTree(_unit_vectors(
+                np.array([row.latitude for row in rows]), np.array([row.longitude for row in rows])
+            ))
+        self._tree, self._node_ids, self._priorities = tree, node_ids, priorities
+        self._version, self._built_at = version, time.monotonic()
+        self._checked_at = self._built_at
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.db.bulk import bulk_insert_ignore
+
+Order = models.OrderSource
+
+ORDER_KEY = ("channel_id", "external_order_id")
+ORDER_COLUMNS = (
+    "external_order_id", "channel_id", "sku_id", "quantity",
+    "destination_latitude", "destination_longitude", "status", "created_at",
+)
+
+
+def unknown_channels(db: Session, channel_ids) -> List[int]:
+    """
+    The ids among channel_ids with no channel, in one query.
+    """
+    channel_ids = set(channel_ids)
+    known = set(db.execute(select(models.Channel.id).where(models.Channel.id.in_(channel_ids))).scalars())
+    return sorted(channel_ids - known)
+
+
+def insert_orders(db: Session, orders: List[Dict[str, Any]]) -> List[Tuple[int, bool]]:
+    """
+    Insert validated orders as pending, skipping any whose (channel_id,
+    external_order_id) is already stored or repeated earlier in the list.
+    Orders without created_at get the current time. The caller owns the
+    commit.
+
+    Returns (order id, created) per input order, in order; a duplicate
+    gets the id of the order already stored.
+    """
+    now = datetime.utcnow()
+    rows = []
+    for order in orders:
+        row = {name: order.get(name) for name in ORDER_COLUMNS}
+        row.update(status="pending", created_at=row["created_at"] or now)
+        rows.append(row)
+    ids = {}
+    for statement, params in bulk_insert_ignore(
+        Order.__table__, ORDER_KEY, rows, settings.ORDER_BULK_MAX_SIZE, returning=("id",) + ORDER_KEY
+    ):
+        for order_id, channel_id, external_order_id in db.execute(statement, params):
+            ids[(channel_id, external_order_id)] = order_id
+
+    keys = [(row["channel_id"], row["external_order_id"]) for row in rows]
+    created = set(ids)
+    existing = {key for key in keys if key not in ids}
+    if existing:
+        for order_id, channel_id, external_order_id in db.execute(
+            select(Order.id, Order.channel_id, Order.external_order_id)
+            .where(tuple_(Order.channel_id, Order.external_order_id).in_(existing))
+        ):
+            ids[(channel_id, external_order_id)] = order_id
+
+    results = []
+    for key in keys:
+        results.append((ids[key], key in created))
+        created.discard(key) # Later repeats in the list are duplicates
+    return results
@@ -0,0 +1,182 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.core.config import settings
+from app.services import forecast_state
+
+Rollup = models.SalesDailyRollup
+Current = models.SkuCurrentPrice
+
+GUARDRAIL_WINDOW = timedelta(hours=24)
+
+# Postgres advisory lock key: one partition check at a time across processes
+PARTITION_LOCK_KEY = 4216002
+
+
+def history_query(sku_ids: List[str], as_of: Optional[date] = None) -> Select:
+    """
+    (sku_id, day, price, units) per SKU and day over the last
+    PRICING_HISTORY_DAYS, price being the day's average selling price
+    across outlets. Usable from sync and async sessions alike.
+    """
+    as_of = as_of or datetime.utcnow().date()
+    units = func.sum(Rollup.units)
+    return (
+        select(Rollup.sku_id, Rollup.day, (func.sum(Rollup.revenue) / units).label("price"), units.label("units"))
+        .where(Rollup.sku_id.in_(sku_ids), Rollup.day > as_of - timedelta(days=settings.PRICING_HISTORY_DAYS))
+        .group_by(Rollup.sku_id, Rollup.day)
+        .having(units > 0)
+    )
+
+
+def history_payload(rows: Iterable[Any]) -> Dict[str, List[Any]]:
+    """
+    Columnar `history` for the ML service's /optimize_price_batch.
+    """
+    history = {"sku_id": [], "price": [], "quantity": []}
+    for row in rows:
+        history["sku_id"].append(row.sku_id)
+        history["price"].append(row.price)
+        history["quantity"].append(row.units)
+    return history
+
+
+def demand_forecast(
+    sku_ids: List[str], states: Iterable[models.ForecastState], history: Dict[str, List[Any]]
+) -> List[float]:
+    """
+    Units expected over the next PRICING_FORECAST_HORIZON_DAYS at the current
+    price: the running forecast when the SKU has one, otherwise its trailing
+    daily average from `history`.
+    """
+    horizon = settings.PRICING_FORECAST_HORIZON_DAYS
+    forecasts = {
+        state.sku_id: sum(r["yhat"] for r in forecast_state.forecast(state, horizon)) for state in states
+    }
+    trailing = defaultdict(float)
+    for sku_id, quantity in zip(history["sku_id"], history["quantity"]):
+        trailing[sku_id] += quantity
+    return [
+        forecasts.get(sku_id, trailing[sku_id] / settings.PRICING_HISTORY_DAYS * horizon)
+        for sku_id in sku_ids
+    ]
+
+
+async def current_prices(db: AsyncSession, sku_ids: List[str]) -> Dict[str, models.SkuCurrentPrice]:
+    """
+    Current price rows by SKU: one primary-key lookup each, whatever the
+    size of price_logs.
+    """
+    rows = await db.execute(select(Current).where(Current.sku_id.in_(sku_ids)))
+    return {row.sku_id: row for row in rows.scalars()}
+
+
+async def reference_prices(
+    db: AsyncSession, current: Dict[str, models.SkuCurrentPrice], as_of: Optional[datetime] = None
+) -> Dict[str, float]:
+    """
+    The price each SKU had GUARDRAIL_WINDOW before `as_of`, which the max
+    daily increase is measured against.
+
+    Usually the current or previous price answers it. Only SKUs changed
+    more than once inside the window need price_logs: the old_price of
+    their first change in the window, found through the (sku_id,
+    timestamp) index in the newest partitions.
+    """
+    cutoff = (as_of or datetime.utcnow()) - GUARDRAIL_WINDOW
+    reference = {}
+    busy = []
+    for sku_id, row in current.items():
+        if row.changed_at <= cutoff:
+            reference[sku_id] = row.price
+        elif row.previous_changed_at is None or row.previous_changed_at <= cutoff:
+            reference[sku_id] = row.previous_price
+        else:
+            busy.append(sku_id)
+    if busy:
+        rows = await db.execute(
+            select(models.PriceLog.sku_id, models.PriceLog.old_price)
+            .where(models.PriceLog.sku_id.in_(busy), models.PriceLog.timestamp > cutoff)
+            .distinct(models.PriceLog.sku_id)
+            .order_by(models.PriceLog.sku_id, models.PriceLog.timestamp)
+        )
+        reference.update(rows.all())
+    return reference
+
+
+async def update_current_prices(db: AsyncSession, logs: List[Dict[str, Any]]) -> None:
+    """
+    Fold new price_logs rows (sku_id, timestamp, old_price, new_price;
+    at most one per SKU) into sku_current_prices with one upsert.
+    Unchanged prices are left alone. The caller owns the transaction.
+    """
+    if not logs:
+        return
+    stmt = insert(Current)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Current.sku_id],
+            set_={
+                "price": stmt.excluded.price,
+                "changed_at": stmt.excluded.changed_at,
+                "previous_price": Current.price,
+                "previous_changed_at": Current.changed_at,
+            },
+            where=Current.price.is_distinct_from(stmt.excluded.price),
+        ),
+        [
+            {
+                "sku_id": log["sku_id"],
+                "price": log["new_price"],
+                "changed_at": log["timestamp"],
+                "previous_price": log["old_price"],
+                "previous_changed_at": None,
+            }
+            for log in logs
+        ],
+    )
+
+
+def partition_name(month: date) -> str:
+    return f"price_logs_y{month.year}m{month.month:02d}"
+
+
+async def ensure_price_log_partitions(db: AsyncSession, as_of: Optional[date] = None) -> List[str]:
+    """
+    Create the monthly price_logs partitions from this month through
+    PRICE_LOG_PARTITION_MONTHS_AHEAD months ahead, and return the new ones.
+    Rows the default partition already holds for a new month are moved
+    into it. Creating one locks the parent table against writes until the
+    caller commits, so existing partitions are skipped. Concurrent callers wait on an advisory lock held until the
+    caller commits, so only one creates a missing partition.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(PARTITION_LOCK_KEY)))
+    month = (as_of or datetime.utcnow().date()).replace(day=1)
+    created = []
+    for _ in range(settings.PRICE_LOG_PARTITION_MONTHS_AHEAD + 1):
+        following = (month + timedelta(days=32)).replace(day=1)
+        name = partition_name(month)
+        if (await db.execute(select(func.to_regclass(name)))).scalar() is None:
+            bounds = {"start": month, "end": following}
+            # Hold off inserts until the partition is attached: one routed to the
+            # default partition meanwhile would fail its new partition constraint
+            await db.execute(text("LOCK TABLE price_logs IN SHARE ROW EXCLUSIVE MODE"))
+            await db.execute(text(f"CREATE TABLE {name} (LIKE price_logs INCLUDING DEFAULTS)"))
+            await db.execute(text(
+                f"WITH moved AS (DELETE FROM price_logs_default "
+                f"WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            await db.execute(text(
+                f"ALTER TABLE price_logs ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            ))
+            created.append(name)
+        month = following
+    return created
@@ -0,0 +1,197 @@
+import math
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.db.bulk import bulk_update
+from app.models.inventory import POStatus
+from app.services import forecast_state
+
+Inventory = models.Inventory
+Rollup = models.SalesDailyRollup
+
+
+def start_run(db: Session, resume: bool = True) -> models.ReplenishmentRun:
+    """
+    Continue the most recent interrupted run, or start a new one.
+    Only a run still marked running (its process died mid-run) is resumed:
+    a failed run's orders were planned against older stock, so it is closed
+    and the new run plans every row again into purchase orders of its own.
+    The caller must hold the planner lock.
+    """
+    unfinished = db.execute(
+        select(models.ReplenishmentRun)
+        .where(models.ReplenishmentRun.status == "running")
+        .order_by(models.ReplenishmentRun.id.desc())
+    ).scalars().all()
+    run = unfinished[0] if resume and unfinished else None
+    if run is None:
+        run = models.ReplenishmentRun(status="running", started_at=datetime.utcnow())
+        db.add(run)
+        db.flush()
+    for stale in unfinished:
+        if stale is not run:
+            stale.status = "failed"
+            stale.error = f"Superseded by run {run.id}"
+            stale.finished_at = datetime.utcnow()
+    db.commit()
+    return run
+
+
+def default_supplier_id(db: Session) -> Optional[int]:
+    """
+    The supplier used for inventory without a preferred one, as in
+    /inventory/replenish: the first supplier, if any.
+    """
+    return db.execute(select(models.Supplier.id).order_by(models.Supplier.id).limit(1)).scalar()
+
+
+def finish_run(db: Session, run: models.ReplenishmentRun, error: Optional[str] = None) -> None:
+    run.status = "failed" if error else "completed"
+    run.error = error
+    run.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def load_batch(
+    db: Session, after_id: int, limit: int, default_supplier: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    The next `limit` inventory rows after `after_id`, each with its preferred
+    supplier or else `default_supplier` (rows with neither are skipped), and
+    that supplier's lead time (PLANNER_DEFAULT_LEAD_TIME_DAYS when it has none).
+    """
+    supplier_id = func.coalesce(Inventory.supplier_id, default_supplier)
+    rows = db.execute(
+        select(
+            Inventory.id,
+            Inventory.sku_id,
+            Inventory.outlet_id,
+            Inventory.quantity,
+            Inventory.reorder_point,
+            Inventory.unit_cost,
+            supplier_id.label("supplier_id"),
+            func.coalesce(models.Supplier.lead_time_days, settings.PLANNER_DEFAULT_LEAD_TIME_DAYS).label("lead_time_days"),
+        )
+        .join(models.Supplier, models.Supplier.id == supplier_id)
+        .where(Inventory.id > after_id)
+        .order_by(Inventory.id)
+        .limit(limit)
+    ).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def demand_stats(db: Session, rows: List[Dict[str, Any]], as_of: Optional[date] = None) -> None:
+    """
+    Set forecast_mean and forecast_std (daily units) on each inventory row.
+
+    Outlet-level sales over the last PLANNER_DEMAND_WINDOW_DAYS come from the
+    daily rollup in one grouped query. When the SKU has a running forecast
+    state, the mean is its forecast over the planning horizon split by the
+    outlet's share of recent sales; otherwise it is the outlet's trailing
+    average. The std is the outlet's trailing daily std (zero days included).
+    """
+    as_of = as_of or datetime.utcnow().date()
+    window = settings.PLANNER_DEMAND_WINDOW_DAYS
+    sku_ids = sorted({row["sku_id"] for row in rows})
+
+    outlet_totals = {}
+    sku_totals = defaultdict(float)
+    for sku_id, outlet_id, units, units_sq in db.execute(
+        select(Rollup.sku_id, Rollup.outlet_id, func.sum(Rollup.units), func.sum(Rollup.units * Rollup.units))
+        .where(Rollup.sku_id.in_(sku_ids), Rollup.day > as_of - timedelta(days=window))
+        .group_by(Rollup.sku_id, Rollup.outlet_id)
+    ):
+        outlet_totals[(sku_id, outlet_id)] = (units, units_sq)
+        sku_totals[sku_id] += units
+
+    sku_forecast = {}
+    states = db.execute(
+        select(models.ForecastState).where(models.ForecastState.sku_id.in_(sku_ids))
+    ).scalars()
+    for state in states:
+        records = forecast_state.forecast(state, settings.PLANNER_FORECAST_HORIZON_DAYS)
+        sku_forecast[state.sku_id] = sum(r["yhat"] for r in records) / len(records)
+
+    for row in rows:
+        units, units_sq = outlet_totals.get((row["sku_id"], row["outlet_id"]), (0.0, 0.0))
+        trailing_mean = units / window
+        row["forecast_std"] = math.sqrt(max(units_sq / window - trailing_mean ** 2, 0.0))
+        if row["sku_id"] in sku_forecast and sku_totals[row["sku_id"]] > 0:
+            row["forecast_mean"] = sku_forecast[row["sku_id"]] * units / sku_totals[row["sku_id"]]
+        else:
+            row["forecast_mean"] = trailing_mean
+
+
+def optimizer_payload(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Columnar request body for the ML service's /optimize_inventory_batch.
+    """
+    return {
+        "forecast_mean": [row["forecast_mean"] for row in rows],
+        "forecast_std": [row["forecast_std"] for row in rows],
+        "lead_time_days": [row["lead_time_days"] for row in rows],
+        "service_level": settings.INVENTORY_SERVICE_LEVEL,
+        "holding_cost": [(row["unit_cost"] or 0.0) * settings.INVENTORY_HOLDING_COST_RATE for row in rows],
+        "ordering_cost": settings.INVENTORY_ORDERING_COST,
+    }
+
+
+def apply_plan(db: Session, run: models.ReplenishmentRun, rows: List[Dict[str, Any]], plan: Dict[str, List[int]]) -> None:
+    """
+    Store new reorder points, add orders for rows below them to the run's
+    per-(supplier, SKU) purchase orders, and advance the run's checkpoint,
+    all in one transaction so an interrupted run resumes exactly here.
+    """
+    reorder_points = []
+    orders = defaultdict(int)
+    below = 0
+    for row, reorder_point, order_quantity in zip(rows, plan["reorder_point"], plan["suggested_order_quantity"]):
+        reorder_points.append({"id": row["id"], "reorder_point": reorder_point})
+        if row["quantity"] < reorder_point:
+            below += 1
+            # At least enough to get back to the reorder point
+            orders[(row["supplier_id"], row["sku_id"])] += max(order_quantity, reorder_point - row["quantity"])
+
+    try:
+        for statement, params in bulk_update(
+            Inventory.__table__, "id", reorder_points, settings.BULK_UPDATE_CHUNK_SIZE, skip_unchanged=True
+        ):
+            db.execute(statement, params)
+
+        if orders:
+            # executemany, batched into multi-row INSERTs by SQLAlchemy
+            now = datetime.utcnow()
+            stmt = insert(models.PurchaseOrder)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    constraint="uq_purchase_orders_run_supplier_sku",
+                    set_={"quantity": models.PurchaseOrder.quantity + stmt.excluded.quantity},
+                ),
+                [
+                    {
+                        "run_id": run.id,
+                        "supplier_id": supplier_id,
+                        "sku_id": sku_id,
+                        "quantity": quantity,
+                        "status": POStatus.DRAFT.value,
+                        "created_at": now,
+                    }
+                    for (supplier_id, sku_id), quantity in sorted(orders.items())
+                ],
+            )
+
+        run.last_inventory_id = rows[-1]["id"]
+        run.pairs_scanned += len(rows)
+        run.pairs_below_reorder_point += below
+        run.units_ordered += sum(orders.values())
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
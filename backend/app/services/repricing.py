@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.core.config import settings
+from app.core.ml_client import MLClient
+from app.services import pricing
+
+Rule = models.PricingRule
+PriceLog = models.PriceLog
+
+MODEL_VERSION = "elasticity-v1"
+
+
+async def load_rules(db: AsyncSession) -> List[models.PricingRule]:
+    """
+    Every SKU's active pricing rule in one query (the newest one if a SKU
+    has several), ordered by SKU.
+    """
+    return (await db.execute(
+        select(Rule)
+        .where(Rule.is_active == True)
+        .distinct(Rule.sku_id)
+        .order_by(Rule.sku_id, Rule.id.desc())
+    )).scalars().all()
+
+
+async def stock_levels(db: AsyncSession, sku_ids: List[str]) -> Dict[str, Any]:
+    """
+    (units on hand across outlets, average unit cost) per SKU.
+    """
+    rows = await db.execute(
+        select(
+            models.Inventory.sku_id,
+            func.sum(models.Inventory.quantity),
+            func.avg(func.nullif(models.Inventory.unit_cost, 0.0)),
+        )
+        .where(models.Inventory.sku_id.in_(sku_ids))
+        .group_by(models.Inventory.sku_id)
+    )
+    return {sku_id: (quantity, unit_cost) for sku_id, quantity, unit_cost in rows}
+
+
+async def reprice_batch(
+    db: AsyncSession, ml: MLClient, rules: List[models.PricingRule], objective: str
+) -> List[Dict[str, Any]]:
+    """
+    Reprice one batch of SKUs with a single ML call and log every price
+    change in one INSERT. The caller owns the transaction.
+
+    The current price comes from sku_current_prices, falling back to the
+    last day's average selling price; SKUs with neither are skipped.
+    Increases are capped against the price 24 hours ago.
+    """
+    sku_ids = [rule.sku_id for rule in rules]
+    history_rows = (await db.execute(pricing.history_query(sku_ids))).all()
+    history = pricing.history_payload(history_rows)
+    states = (await db.execute(
+        select(models.ForecastState).where(models.ForecastState.sku_id.in_(sku_ids))
+    )).scalars().all()
+    current = await pricing.current_prices(db, sku_ids)
+    reference = await pricing.reference_prices(db, current)
+    stock = await stock_levels(db, sku_ids)
+
+    last_sold = {}
+    for row in sorted(history_rows, key=lambda row: row.day):
+        last_sold[row.sku_id] = row.price
+
+    results = []
+    priced = []
+    for rule in rules:
+        price = current[rule.sku_id].price if rule.sku_id in current else last_sold.get(rule.sku_id)
+        if price is None or price <= 0:
+            results.append({"sku_id": rule.sku_id, "status": "skipped", "reason": "No current price"})
+        else:
+            priced.append((rule, price))
+    if not priced:
+        return results
+
+    forecast = pricing.demand_forecast([rule.sku_id for rule, _ in priced], states, history)
+    plan = await ml.post_json(
+        "/optimize_price_batch",
+        {
+            "sku_id": [rule.sku_id for rule, _ in priced],
+            "current_price": [price for _, price in priced],
+            "forecast": forecast,
+            "inventory_level": [stock.get(rule.sku_id, (None, None))[0] for rule, _ in priced],
+            "min_price": [rule.min_price for rule, _ in priced],
+            "max_price": [rule.max_price for rule, _ in priced],
+            "max_increase_pct": [rule.max_daily_increase_pct for rule, _ in priced],
+            "reference_price": [reference.get(rule.sku_id) for rule, _ in priced],
+            "unit_cost": [stock.get(rule.sku_id, (None, None))[1] for rule, _ in priced],
+            "history": history,
+            "objective": objective,
+        },
+        timeout=settings.PRICING_ML_TIMEOUT_SECONDS,
+    )
+
+    now = datetime.utcnow()
+    logs = []
+    for (rule, price), new_price, reason in zip(priced, plan["recommended_price"], plan["reason"]):
+        status = "raised" if new_price > price else "lowered" if new_price < price else "held"
+        results.append({
+            "sku_id": rule.sku_id, "status": status, "old_price": price, "new_price": new_price, "reason": reason,
+        })
+        if status != "held":
+            logs.append({
+                "sku_id": rule.sku_id,
+                "timestamp": now,
+                "old_price": price,
+                "new_price": new_price,
+                "reason": reason,
+                "model_version": MODEL_VERSION,
+            })
+    if logs:
+        # executemany, batched into multi-row INSERTs by SQLAlchemy
+        await db.execute(insert(PriceLog), logs)
+        await pricing.update_current_prices(db, logs)
+    return results
+
+
+async def reprice_catalog(
+    db: AsyncSession, ml: MLClient, rules: List[models.PricingRule], objective: str = "margin",
+    batch_size: int = settings.PRICING_BATCH_SIZE,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Reprice every SKU with a rule, committing and yielding the per-SKU
+    results batch by batch. Batches committed before an error are kept.
+    """
+    for start in range(0, len(rules), batch_size):
+        try:
+            results = await reprice_batch(db, ml, rules[start:start + batch_size], objective)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        yield results
+
+
+def summarize(counts: Dict[str, int], results: List[Dict[str, Any]]) -> None:
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+
+if __name__ == "__main__":
+    from app.core.ml_client import create_ml_client
+    from app.db.session import AsyncSessionLocal
+
+    parser = argparse.ArgumentParser(description="Reprice every SKU that has an active pricing rule.")
+    parser.add_argument("--objective", choices=["revenue", "margin"], default="margin")
+    parser.add_argument("--batch-size", type=int, default=settings.PRICING_BATCH_SIZE)
+    args = parser.parse_args()
+
+    async def main():
+        ml = create_ml_client()
+        counts = {}
+        try:
+            async with AsyncSessionLocal() as db:
+                rules = await load_rules(db)
+                async for results in reprice_catalog(db, ml, rules, args.objective, args.batch_size):
+                    summarize(counts, results)
+                    print(json.dumps({"skus": sum(counts.values()), **counts}))
+        finally:
+            await ml.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,331 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.core.config import settings
+from app.core.ml_client import MLClient
+from app.db.bulk import bulk_update
+from app.services.stock_index import NodeStock
+
+Inventory = models.Inventory
+Node = models.FulfillmentNode
+
+
+class OutOfStock(Exception):
+    pass
+
+
+def sku_stock_loader(db: AsyncSession):
+    async def load(sku_id: str) -> NodeStock:
+        """
+        (priority, available units) for every active node stocking the SKU,
+        in one indexed query.
+        """
+        rows = await db.execute(
+            select(Node.id, Node.priority, Inventory.quantity - Inventory.reserved)
+            .join(Inventory, Inventory.outlet_id == Node.outlet_id)
+            .where(Inventory.sku_id == sku_id, Node.is_active == True)
+        )
+        return {node_id: (priority or 0, available or 0) for node_id, priority, available in rows}
+    return load
+
+
+async def reserve_in_db(db: AsyncSession, node_id: int, sku_id: str, quantity: int) -> bool:
+    """
+    Add to the node's reserved units if it still has them available.
+    The caller owns the transaction.
+    """
+    outlet_id = select(Node.outlet_id).where(Node.id == node_id).scalar_subquery()
+    result = await db.execute(
+        update(Inventory)
+        .where(
+            Inventory.outlet_id == outlet_id,
+            Inventory.sku_id == sku_id,
+            Inventory.quantity - Inventory.reserved >= quantity,
+        )
+        .values(reserved=Inventory.reserved + quantity)
+    )
+    return result.rowcount > 0
+
+
+def start_of_day() -> datetime:
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def allocated_today(db: AsyncSession, node_ids: List[int]) -> Dict[int, int]:
+    """
+    Units allocated to each node since the start of the day (UTC), which
+    count against its daily capacity.
+    """
+    rows = await db.execute(
+        select(models.OrderAllocation.fulfillment_node_id, func.sum(models.OrderAllocation.quantity))
+        .where(
+            models.OrderAllocation.fulfillment_node_id.in_(node_ids),
+            models.OrderAllocation.created_at >= start_of_day(),
+        )
+        .group_by(models.OrderAllocation.fulfillment_node_id)
+    )
+    return {node_id: int(units) for node_id, units in rows}
+
+
+async def full_nodes(db: AsyncSession, quantity: int) -> Set[int]:
+    """
+    Active nodes whose capacity left today is under `quantity`.
+    """
+    capacity = dict((await db.execute(
+        select(Node.id, Node.capacity).where(Node.is_active == True, Node.capacity.is_not(None))
+    )).all())
+    if not capacity:
+        return set()
+    allocated = await allocated_today(db, list(capacity))
+    return {node_id for node_id, units in capacity.items() if units - allocated.get(node_id, 0) < quantity}
+
+
+async def has_capacity(db: AsyncSession, node_id: int, quantity: int) -> bool:
+    """
+    Lock the node and check it can take `quantity` more units today, so
+    concurrent routing can't overfill it. The caller owns the transaction.
+    """
+    capacity = (await db.execute(select(Node.capacity).where(Node.id == node_id).with_for_update())).scalar()
+    if capacity is None:
+        return True
+    return capacity - (await allocated_today(db, [node_id])).get(node_id, 0) >= quantity
+
+
+async def ranked_nodes(db: AsyncSession, exclude: Set[int]) -> List[int]:
+    """
+    Active nodes not in `exclude`, highest priority first.
+    """
+    return list((await db.execute(
+        select(Node.id).where(Node.is_active == True, Node.id.not_in(exclude)).order_by(Node.priority, Node.id)
+    )).scalars())
+
+
+async def nearby_nodes(db: AsyncSession, locator, order: models.OrderSource) -> List[int]:
+    """
+    Candidate nodes near the order's destination, cheapest first; empty if
+    the order has no destination.
+    """
+    if locator is None or order.destination_latitude is None or order.destination_longitude is None:
+        return []
+    return await locator.candidates(
+        db, order.destination_latitude, order.destination_longitude, settings.ROUTING_CANDIDATE_NODES
+    )
+
+
+async def route(db: AsyncSession, index, order: models.OrderSource, locator=None) -> int:
+    """
+    Reserve the order's units at an active node that can ship all of them
+    and has the capacity left today, and assign the order to it: the
+    cheapest of the nodes nearest its destination when it has one, else the
+    highest-priority node. The index picks the node and reserves atomically;
+    the conditional UPDATE on inventory guards against a stale index showing
+    too much stock, and an index showing too little is reloaded before
+    giving up. Either way the SKU is reloaded at most once. Commits, and
+    returns the node id. Raises OutOfStock.
+    """
+    loader = sku_stock_loader(db)
+    full = await full_nodes(db, order.quantity)
+    candidates = [node_id for node_id in await nearby_nodes(db, locator, order) if node_id not in full]
+    for attempt in range(2):
+        # Full nodes are left out by naming the others; otherwise the index ranks them all
+        ranked = await ranked_nodes(db, full) if full else None
+        if ranked == []:
+            raise OutOfStock(order.sku_id)
+        node_id: Optional[int] = None
+        if candidates:
+            node_id = await index.reserve(order.sku_id, order.quantity, loader, candidates)
+        if node_id is None:
+            node_id = await index.reserve(order.sku_id, order.quantity, loader, ranked)
+        if node_id is None:
+            if attempt == 0:
+                # Restocks and released reservations may not have reached the index yet
+                await index.invalidate(order.sku_id)
+                continue
+            raise OutOfStock(order.sku_id)
+        try:
+            if not await has_capacity(db, node_id, order.quantity):
+                # Filled by a concurrent order since full_nodes looked
+                await index.release(order.sku_id, node_id, order.quantity)
+                full.add(node_id)
+                candidates = [candidate for candidate in candidates if candidate != node_id]
+                continue
+            reserved = await reserve_in_db(db, node_id, order.sku_id, order.quantity)
+            if reserved:
+                order.fulfillment_node_id = node_id
+                order.status = "routed"
+                db.add(models.OrderAllocation(
+                    order_id=order.id, fulfillment_node_id=node_id, quantity=order.quantity, created_at=datetime.utcnow()
+                ))
+                await db.commit()
+                return node_id
+        except Exception:
+            await db.rollback()
+            await index.release(order.sku_id, node_id, order.quantity)
+            raise
+        await index.invalidate(order.sku_id)
+    raise OutOfStock(order.sku_id)
+
+
+async def route_batch(
+    db: AsyncSession, ml: MLClient, index, limit: int, window_minutes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Route up to `limit` pending orders (oldest first, optionally only those
+    from the last `window_minutes`) in one min-cost assignment solved by
+    the ML service, allowing split shipments. A unit costs its node's
+    priority plus ROUTING_COST_PER_KM per km to the order's destination,
+    where both are known, and a node's capacity is reduced by the units
+    allocated to it today. The solve works on a snapshot of stock; only then are the
+    inventory rows and capped nodes the plan draws on locked and re-read,
+    and orders they no longer cover stay pending. Allocations, order
+    updates and reservations are written in one transaction.
+    """
+    # 1. Claim the batch; rows another batch holds are skipped
+    query = (
+        select(
+            models.OrderSource.id, models.OrderSource.sku_id, models.OrderSource.quantity,
+            models.OrderSource.destination_latitude, models.OrderSource.destination_longitude,
+        )
+        .where(
+            models.OrderSource.status == "pending", models.OrderSource.fulfillment_node_id.is_(None),
+            models.OrderSource.quantity > 0,
+        )
+        .order_by(models.OrderSource.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if window_minutes is not None:
+        query = query.where(models.OrderSource.created_at >= datetime.utcnow() - timedelta(minutes=window_minutes))
+    orders = (await db.execute(query)).all()
+    summary = {"orders": len(orders), "routed": 0, "split": 0, "unfilled": 0, "units": 0, "cost": 0.0}
+    if not orders:
+        await db.rollback()
+        return summary
+
+    # 2. Snapshot of stock at active nodes for these SKUs; nothing is locked during the solve
+    stock = (await db.execute(
+        select(
+            Inventory.id, Inventory.sku_id, (Inventory.quantity - Inventory.reserved).label("available"),
+            Node.id.label("node_id"), Node.priority, Node.capacity, Node.latitude, Node.longitude,
+        )
+        .join(Node, Node.outlet_id == Inventory.outlet_id)
+        .where(Inventory.sku_id.in_({order.sku_id for order in orders}), Node.is_active == True)
+        .order_by(Inventory.id)
+    )).all()
+    nodes = {}
+    for row in stock:
+        nodes.setdefault(row.node_id, row)
+    node_ids = list(nodes)
+    node_position = {node_id: i for i, node_id in enumerate(node_ids)}
+    capped = {node_id for node_id in node_ids if nodes[node_id].capacity is not None}
+    allocated = await allocated_today(db, list(capped)) if capped else {}
+
+    # 3. One solve for the whole batch
+    try:
+        plan = await ml.post_json(
+            "/route_orders",
+            {
+                "order_sku": [order.sku_id for order in orders],
+                "order_quantity": [order.quantity for order in orders],
+                "stock_node": [node_position[row.node_id] for row in stock],
+                "stock_sku": [row.sku_id for row in stock],
+                "stock_available": [max(row.available or 0, 0) for row in stock],
+                "node_cost": [float(nodes[node_id].priority or 0) for node_id in node_ids],
+                "node_capacity": [
+                    max(nodes[node_id].capacity - allocated.get(node_id, 0), 0) if node_id in capped else None
+                    for node_id in node_ids
+                ],
+                "order_latitude": [order.destination_latitude for order in orders],
+                "order_longitude": [order.destination_longitude for order in orders],
+                "node_latitude": [nodes[node_id].latitude for node_id in node_ids],
+                "node_longitude": [nodes[node_id].longitude for node_id in node_ids],
+                "shipment_cost": settings.ROUTING_SHIPMENT_COST,
+                "cost_per_km": settings.ROUTING_COST_PER_KM,
+                "time_limit": settings.ROUTING_SOLVER_TIME_LIMIT_SECONDS,
+            },
+            timeout=settings.ROUTING_SOLVER_TIME_LIMIT_SECONDS + settings.ML_TIMEOUT_SECONDS,
+        )
+    except Exception:
+        await db.rollback()
+        raise
+
+    # 4. Lock what the plan draws on, then write the orders it still covers in one transaction
+    inventory_row = {(row.node_id, row.sku_id): row.id for row in stock}
+    planned = defaultdict(list)
+    for i, position, quantity in zip(plan["order_index"], plan["node"], plan["quantity"]):
+        node_id = node_ids[position]
+        planned[i].append((inventory_row[(node_id, orders[i].sku_id)], node_id, quantity))
+    now = datetime.utcnow()
+    reserved = {}
+    allocations = []
+    shipments = defaultdict(list)
+    try:
+        locked = {}
+        if planned:
+            locked = {row.id: row for row in await db.execute(
+                select(Inventory.id, Inventory.reserved, (Inventory.quantity - Inventory.reserved).label("available"))
+                .where(Inventory.id.in_({row_id for parts in planned.values() for row_id, _, _ in parts}))
+                .order_by(Inventory.id)
+                .with_for_update()
+            )}
+        capacity_left = {}
+        planned_capped = sorted({node_id for parts in planned.values() for _, node_id, _ in parts} & capped)
+        if planned_capped:
+            await db.execute(select(Node.id).where(Node.id.in_(planned_capped)).order_by(Node.id).with_for_update())
+            allocated = await allocated_today(db, planned_capped)
+            capacity_left = {node_id: nodes[node_id].capacity - allocated.get(node_id, 0) for node_id in planned_capped}
+
+        available = {row_id: row.available or 0 for row_id, row in locked.items()}
+        for i, parts in planned.items():
+            if any(
+                available.get(row_id, 0) < quantity or capacity_left.get(node_id, quantity) < quantity
+                for row_id, node_id, quantity in parts
+            ):
+                continue # Stock or capacity went elsewhere during the solve
+            order = orders[i]
+            for row_id, node_id, quantity in parts:
+                available[row_id] -= quantity
+                if node_id in capacity_left:
+                    capacity_left[node_id] -= quantity
+                reserved[row_id] = reserved.get(row_id, locked[row_id].reserved or 0) + quantity
+                allocations.append({
+                    "order_id": order.id, "fulfillment_node_id": node_id, "quantity": quantity, "created_at": now,
+                })
+                shipments[order.id].append((quantity, node_id))
+
+        if allocations:
+            await db.execute(insert(models.OrderAllocation), allocations)
+            # The main shipment's node goes on the order itself
+            order_rows = [
+                {"id": order_id, "status": "routed", "fulfillment_node_id": max(parts)[1]}
+                for order_id, parts in shipments.items()
+            ]
+            for statement, params in bulk_update(
+                models.OrderSource.__table__, "id", order_rows, settings.BULK_UPDATE_CHUNK_SIZE
+            ):
+                await db.execute(statement, params)
+            for statement, params in bulk_update(
+                Inventory.__table__, "id", [{"id": row_id, "reserved": units} for row_id, units in reserved.items()],
+                settings.BULK_UPDATE_CHUNK_SIZE,
+            ):
+                await db.execute(statement, params)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    await index.invalidate(*{order.sku_id for order in orders})
+    summary.update(
+        routed=len(shipments),
+        split=sum(1 for parts in shipments.values() if len(parts) > 1),
+        unfilled=len(orders) - len(shipments),
+        units=sum(allocation["quantity"] for allocation in allocations),
+        cost=plan["cost"],
+        solver_status=plan["status"],
+    )
+    return summary
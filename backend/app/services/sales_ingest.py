@@ -0,0 +1,172 @@
+import csv
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.core.config import settings
+from app.db.bulk import bulk_insert_ignore, copy_rows
+from app.services import customer_rfm, forecast_state, sales_rollup
+
+SALES_COLUMNS = ("sku_id", "timestamp", "quantity", "price", "outlet_id", "customer_id")
+SALES_EVENT_COLUMNS = SALES_COLUMNS + ("event_id",)
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Cap on per-chunk error details returned to the caller
+MAX_REPORTED_ERRORS = 100
+
+
+class SalesStreamParser:
+    """
+    Incrementally splits an NDJSON or CSV byte stream into lines,
+    transparently gunzipping it if the first bytes are a gzip header.
+    CSV input must start with a header row naming SALES_COLUMNS.
+    """
+
+    def __init__(self, fmt: str):
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+        self.line_no = 0
+        self._decompressor = None
+        self._started = False
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        """
+        Returns the complete (line number, line) pairs available so far.
+        """
+        if not self._started and data:
+            self._started = True
+            if data[:2] == GZIP_MAGIC:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return self._number(lines)
+
+    def finish(self) -> List[Tuple[int, bytes]]:
+        if self._decompressor is not None:
+            self._buffer += self._decompressor.flush()
+        lines, self._buffer = self._buffer.split(b"\n"), b""
+        return self._number(lines)
+
+    def parse(self, lines: List[Tuple[int, bytes]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Validate a chunk of lines. Returns (rows, rejects).
+        """
+        rows, rejects = [], []
+        for line_no, line in lines:
+            try:
+                if self.fmt == "ndjson":
+                    record = schemas.SalesDataCreate.model_validate_json(line)
+                else:
+                    values = next(csv.reader([line.decode("utf-8")]))
+                    if len(values) != len(self.header):
+                        raise ValueError(f"Expected {len(self.header)} fields, got {len(values)}")
+                    record = schemas.SalesDataCreate.model_validate(
+                        {key: value or None for key, value in zip(self.header, values)}
+                    )
+                rows.append(record.model_dump())
+            except (ValidationError, ValueError) as e:
+                rejects.append({"line": line_no, "error": str(e)})
+        return rows, rejects
+
+    def _number(self, lines: List[bytes]) -> List[Tuple[int, bytes]]:
+        numbered = []
+        for line in lines:
+            self.line_no += 1
+            line = line.rstrip(b"\r")
+            if not line.strip():
+                continue
+            if self.fmt == "csv" and self.header is None:
+                self.header = [name.strip() for name in next(csv.reader([line.decode("utf-8")]))]
+                missing = {"sku_id", "timestamp", "quantity", "price"} - set(self.header)
+                if missing:
+                    raise ValueError(f"CSV header is missing columns: {', '.join(sorted(missing))}")
+                continue
+            numbered.append((self.line_no, line))
+        return numbered
+
+
+def apply_chunk(db: Session, rows: List[Dict[str, Any]], update_forecasts: bool = True) -> int:
+    """
+    COPY validated rows, add them to the daily rollup and customer RFM
+    features, then fold their per-(SKU, day) totals into the forecast
+    state. The caller owns the commit.
+    """
+    inserted = copy_rows(db, models.SalesData.__table__, SALES_COLUMNS, rows)
+    _apply_aggregates(db, rows, update_forecasts)
+    return inserted
+
+
+def apply_events(db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Like apply_chunk for sales events: rows whose event_id is already
+    stored (a redelivered event) are skipped, and only the rows inserted
+    reach the rollup, RFM features and forecast state. Returns those rows.
+    The caller owns the commit.
+    """
+    unique = {row["event_id"]: {name: row.get(name) for name in SALES_EVENT_COLUMNS} for row in rows}
+    inserted = set()
+    for statement, params in bulk_insert_ignore(
+        models.SalesData.__table__, ("event_id",), list(unique.values()), settings.EVENT_BATCH_SIZE,
+        returning=("event_id",),
+    ):
+        inserted.update(db.execute(statement, params).scalars())
+    new_rows = [unique[event_id] for event_id in inserted]
+    _apply_aggregates(db, new_rows)
+    return new_rows
+
+
+def _apply_aggregates(db: Session, rows: List[Dict[str, Any]], update_forecasts: bool = True) -> None:
+    sales_rollup.apply_sales(db, rows)
+    customer_rfm.apply_sales(db, rows)
+    if update_forecasts and rows:
+        daily = defaultdict(float)
+        for row in rows:
+            daily[(row["sku_id"], row["timestamp"].date())] += row["quantity"]
+        forecast_state.apply_sales(db, daily)
+
+
+def unknown_customers(db: Session, customer_ids) -> List[int]:
+    """
+    The ids among customer_ids (None ignored) with no customer, in one query.
+    """
+    customer_ids = {customer_id for customer_id in customer_ids if customer_id is not None}
+    if not customer_ids:
+        return []
+    known = set(db.execute(select(models.Customer.id).where(models.Customer.id.in_(customer_ids))).scalars())
+    return sorted(customer_ids - known)
+
+
+def write_chunk(
+    db: Session, rows: List[Dict[str, Any]], lines: List[int], update_forecasts: bool = True
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Write one validated chunk in a single transaction (see apply_chunk).
+    Rows naming a customer that doesn't exist are rejected rather than
+    failing the chunk; lines holds each row's line number for those
+    rejects. Returns (inserted, rejects).
+    """
+    try:
+        unknown = set(unknown_customers(db, (row["customer_id"] for row in rows)))
+        rejects = [
+            {"line": line, "error": f"Unknown customer_id: {row['customer_id']}"}
+            for line, row in zip(lines, rows) if row["customer_id"] in unknown
+        ]
+        if unknown:
+            rows = [row for row in rows if row["customer_id"] not in unknown]
+        inserted = apply_chunk(db, rows, update_forecasts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return inserted, rejects
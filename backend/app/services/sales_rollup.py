@@ -0,0 +1,104 @@
+import argparse
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import cast, delete, func, literal, select, Date
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+
+Rollup = models.SalesDailyRollup
+
+
+def apply_sales(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Add raw sales rows to the daily rollup with one upsert.
+    rows: dicts with sku_id, timestamp, quantity, price, outlet_id
+    The caller owns the transaction.
+    """
+    totals = defaultdict(lambda: [0.0, 0.0, 0])
+    for row in rows:
+        key = (row["sku_id"], row.get("outlet_id") or "", row["timestamp"].date())
+        bucket = totals[key]
+        bucket[0] += row["quantity"]
+        bucket[1] += row["quantity"] * row["price"]
+        bucket[2] += 1
+    if not totals:
+        return
+
+    stmt = insert(Rollup).values([
+        {
+            "sku_id": sku_id,
+            "outlet_id": outlet_id,
+            "day": day,
+            "units": units,
+            "revenue": revenue,
+            "transaction_count": count,
+        }
+        # Sorted so concurrent upserts take row locks in the same order
+        for (sku_id, outlet_id, day), (units, revenue, count) in sorted(totals.items())
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["sku_id", "outlet_id", "day"],
+        set_={
+            "units": Rollup.units + stmt.excluded.units,
+            "revenue": Rollup.revenue + stmt.excluded.revenue,
+            "transaction_count": Rollup.transaction_count + stmt.excluded.transaction_count,
+        },
+    ))
+
+
+def rebuild(db: Session, sku_id: Optional[str] = None) -> int:
+    """
+    Recompute the rollup from raw sales, for one SKU or the whole table.
+    Returns the number of rollup rows written. The caller owns the transaction.
+    """
+    sales = models.SalesData
+    day = cast(sales.timestamp, Date)
+    outlet = func.coalesce(sales.outlet_id, literal(""))
+    query = select(
+        sales.sku_id,
+        outlet,
+        day,
+        func.sum(sales.quantity),
+        func.sum(sales.quantity * sales.price),
+        func.count(),
+    ).group_by(sales.sku_id, outlet, day)
+
+    clear = delete(Rollup)
+    if sku_id is not None:
+        query = query.where(sales.sku_id == sku_id)
+        clear = clear.where(Rollup.sku_id == sku_id)
+
+    db.execute(clear)
+    result = db.execute(insert(Rollup).from_select(
+        ["sku_id", "outlet_id", "day", "units", "revenue", "transaction_count"], query
+    ))
+    return result.rowcount
+
+
+def daily_units(db: Session, sku_id: str) -> List[Tuple[date, float]]:
+    """
+    Units sold per day for a SKU across all outlets, oldest first.
+    """
+    return db.query(Rollup.day, func.sum(Rollup.units)).filter(
+        Rollup.sku_id == sku_id
+    ).group_by(Rollup.day).order_by(Rollup.day).all()
+
+
+if __name__ == "__main__":
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollup from raw sales data.")
+    parser.add_argument("--sku", help="Only rebuild this SKU")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        written = rebuild(db, args.sku)
+        db.commit()
+        print(f"Rebuilt sales_daily_rollup: {written} rows")
+    finally:
+        db.close()
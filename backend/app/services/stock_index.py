@@ -0,0 +1,271 @@
+import bisect
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.core.redis import get_redis
+
+# node_id -> (priority, available units) for one SKU
+NodeStock = Dict[int, Tuple[int, int]]
+Loader = Callable[[str], Awaitable[NodeStock]]
+
+# SKUs whose inventory quantity or reserved units changed through the ORM
+# in a committed transaction; indexes drop them before their next
+# reservation. Bulk statements invalidate their SKUs themselves.
+_stale_lock = threading.Lock()
+_stale_skus: Set[str] = set()
+_SESSION_KEY = "stock_index_stale_skus"
+
+
+@event.listens_for(models.Inventory, "after_insert")
+@event.listens_for(models.Inventory, "after_update")
+def _track_stock_change(mapper, connection, target) -> None:
+    attrs = inspect(target).attrs
+    if attrs.quantity.history.has_changes() or attrs.reserved.history.has_changes():
+        Session.object_session(target).info.setdefault(_SESSION_KEY, set()).add(target.sku_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_stock_changes(session: Session) -> None:
+    sku_ids = session.info.pop(_SESSION_KEY, None)
+    if sku_ids:
+        with _stale_lock:
+            _stale_skus.update(sku_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stock_changes(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def _take_stale_skus() -> List[str]:
+    with _stale_lock:
+        sku_ids = list(_stale_skus)
+        _stale_skus.clear()
+    return sku_ids
+
+
+# Lua scripts run atomically, so concurrent reservations can't oversell.
+# KEYS per SKU: a hash of available units per node (plus a "_" marker so
+# an SKU with no stock still counts as loaded), a hash of node priorities
+# and a sorted set of the nodes that have stock, scored by priority. Key
+# names share a hash tag, so they land in one Redis Cluster slot, and
+# include a generation number that invalidate_all bumps.
+GENERATION_KEY = "stockidx:generation"
+GENERATION_CHECK_INTERVAL_SECONDS = 1.0
+RESERVE_PAGE_SIZE = 32 # Nodes read per ZRANGE while looking for enough stock
+
+# ARGV: quantity, page size, then optionally candidate node ids in order
+# of preference (default: nodes with stock by priority, read page by page
+# so a reservation touches only the top of the ranking). Returns the node
+# id, 0 if no candidate can ship the whole quantity, or -1 if the SKU isn't
+# loaded.
+_RESERVE = """
+local stock, ranked = KEYS[1], KEYS[3]
+if redis.call('EXISTS', stock) == 0 then
+    return -1
+end
+local quantity = tonumber(ARGV[1])
+local function take(node)
+    local available = tonumber(redis.call('HGET', stock, node) or '0')
+    if node == '_' or available < quantity then
+        return false
+    end
+    if redis.call('HINCRBY', stock, node, -quantity) <= 0 then
+        redis.call('ZREM', ranked, node)
+    end
+    return true
+end
+if #ARGV > 2 then
+    for i = 3, #ARGV do
+        if take(ARGV[i]) then
+            return tonumber(ARGV[i])
+        end
+    end
+    return 0
+end
+local page = tonumber(ARGV[2])
+local start = 0
+while true do
+    local nodes = redis.call('ZRANGE', ranked, start, start + page - 1)
+    for _, node in ipairs(nodes) do
+        if take(node) then
+            return tonumber(node)
+        end
+    end
+    if #nodes < page then
+        return 0
+    end
+    start = start + page
+end
+"""
+
+# ARGV: node_id, quantity
+_RELEASE = """
+local stock, priority, ranked = KEYS[1], KEYS[2], KEYS[3]
+if redis.call('HEXISTS', stock, ARGV[1]) == 1 then
+    if redis.call('HINCRBY', stock, ARGV[1], ARGV[2]) > 0 then
+        redis.call('ZADD', ranked, redis.call('HGET', priority, ARGV[1]), ARGV[1])
+    end
+end
+return 0
+"""
+
+# ARGV: ttl, then node_id, priority, available triples.
+# A concurrent load that got there first wins.
+_LOAD = """
+local stock, priority, ranked = KEYS[1], KEYS[2], KEYS[3]
+if redis.call('EXISTS', stock) == 1 then
+    return 0
+end
+redis.call('HSET', stock, '_', 0)
+for i = 2, #ARGV, 3 do
+    redis.call('HSET', stock, ARGV[i], ARGV[i + 2])
+    redis.call('HSET', priority, ARGV[i], ARGV[i + 1])
+    if tonumber(ARGV[i + 2]) > 0 then
+        redis.call('ZADD', ranked, ARGV[i + 1], ARGV[i])
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ARGV[1])
+end
+return 1
+"""
+
+
+class MemoryStockIndex:
+    """
+    Per-process stock index: for each SKU, the nodes that have stock kept
+    sorted by (priority, node id), plus available units per node. SKUs are
+    loaded on first use. `reserve` takes the first node with enough stock,
+    among `candidates` in the given order when passed. Only safe as the
+    sole reservation guard with a single worker; the database check in
+    routing covers the rest.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stock: Dict[str, Dict[int, int]] = {}
+        self._priority: Dict[str, Dict[int, int]] = {}
+        self._ranked: Dict[str, list] = {}
+
+    async def reserve(
+        self, sku_id: str, quantity: int, loader: Loader, candidates: Optional[List[int]] = None
+    ) -> Optional[int]:
+        stale = _take_stale_skus()
+        if stale:
+            await self.invalidate(*stale)
+        if sku_id not in self._stock:
+            self._load(sku_id, await loader(sku_id))
+        with self._lock:
+            stock, ranked = self._stock.get(sku_id), self._ranked.get(sku_id)
+            if stock is None: # Invalidated while loading
+                return None
+            # Walk the ranking only as far as the first node with enough stock
+            order = candidates if candidates else (node_id for _, node_id in ranked)
+            for node_id in order:
+                if stock.get(node_id, 0) >= quantity:
+                    stock[node_id] -= quantity
+                    if stock[node_id] <= 0:
+                        entry = (self._priority[sku_id][node_id], node_id)
+                        del ranked[bisect.bisect_left(ranked, entry)]
+                    return node_id
+        return None
+
+    async def release(self, sku_id: str, node_id: int, quantity: int) -> None:
+        with self._lock:
+            stock = self._stock.get(sku_id)
+            if stock is None or node_id not in stock:
+                return
+            if stock[node_id] <= 0 < stock[node_id] + quantity:
+                bisect.insort(self._ranked[sku_id], (self._priority[sku_id][node_id], node_id))
+            stock[node_id] += quantity
+
+    async def invalidate(self, *sku_ids: str) -> None:
+        with self._lock:
+            for sku_id in sku_ids:
+                self._stock.pop(sku_id, None)
+
+    async def invalidate_all(self) -> None:
+        with self._lock:
+            self._stock.clear()
+
+    def _load(self, sku_id: str, nodes: NodeStock) -> None:
+        with self._lock:
+            if sku_id in self._stock:
+                return
+            self._priority[sku_id] = {node_id: priority for node_id, (priority, _) in nodes.items()}
+            self._ranked[sku_id] = sorted(
+                (priority, node_id) for node_id, (priority, available) in nodes.items() if available > 0
+            )
+            self._stock[sku_id] = {node_id: available for node_id, (_, available) in nodes.items()}
+
+
+class RedisStockIndex:
+    """
+    Stock index shared by every worker through Redis. Each reservation is
+    one Lua call; SKUs are loaded on first use and expire after
+    ROUTING_INDEX_TTL_SECONDS so they pick up stock changes made elsewhere.
+    The generation is re-read at most once a second, so other workers see
+    invalidate_all within about a second.
+    """
+
+    def __init__(self):
+        self._generation: Optional[str] = None
+        self._generation_at = 0.0
+
+    async def reserve(
+        self, sku_id: str, quantity: int, loader: Loader, candidates: Optional[List[int]] = None
+    ) -> Optional[int]:
+        stale = _take_stale_skus()
+        if stale:
+            await self.invalidate(*stale)
+        redis = get_redis()
+        keys = await self._keys(sku_id)
+        args = [quantity, RESERVE_PAGE_SIZE, *(candidates or [])]
+        node_id = await redis.eval(_RESERVE, len(keys), *keys, *args)
+        if node_id == -1:
+            await self._load(keys, await loader(sku_id))
+            node_id = await redis.eval(_RESERVE, len(keys), *keys, *args)
+        return node_id if node_id > 0 else None
+
+    async def release(self, sku_id: str, node_id: int, quantity: int) -> None:
+        keys = await self._keys(sku_id)
+        await get_redis().eval(_RELEASE, len(keys), *keys, node_id, quantity)
+
+    async def invalidate(self, *sku_ids: str) -> None:
+        keys = [key for sku_id in sku_ids for key in await self._keys(sku_id)]
+        # One DELETE per SKU: a multi-key command must stay within one cluster slot
+        redis = get_redis()
+        for start in range(0, len(keys), 3):
+            await redis.delete(*keys[start:start + 3])
+
+    async def invalidate_all(self) -> None:
+        # Old generations simply expire
+        self._generation = str(await get_redis().incr(GENERATION_KEY))
+        self._generation_at = time.monotonic()
+
+    async def _keys(self, sku_id: str) -> List[str]:
+        now = time.monotonic()
+        if self._generation is None or now - self._generation_at >= GENERATION_CHECK_INTERVAL_SECONDS:
+            self._generation = await get_redis().get(GENERATION_KEY) or "0"
+            self._generation_at = now
+        prefix = f"stockidx:{{{self._generation}:{sku_id}}}"
+        return [f"{prefix}:stock", f"{prefix}:priority", f"{prefix}:ranked"]
+
+    async def _load(self, keys: List[str], nodes: NodeStock) -> None:
+        args = [settings.ROUTING_INDEX_TTL_SECONDS]
+        for node_id, (priority, available) in nodes.items():
+            args += [node_id, priority, available]
+        await get_redis().eval(_LOAD, len(keys), *keys, *args)
+
+
+def create_stock_index():
+    if settings.ROUTING_STOCK_INDEX == "memory":
+        return MemoryStockIndex()
+    return RedisStockIndex()
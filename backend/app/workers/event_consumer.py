@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+
+from app.core.cache import invalidate
+from app.core.config import settings
+from app.core.events import EVENT_TOPICS, EventBatch, KafkaEventConsumer
+from app.core.redis import close_redis, init_redis
+from app.db.session import SessionLocal
+from app.services import event_ingest
+
+logger = logging.getLogger("app.workers.event_consumer")
+
+
+def _collect(consumer, batch_size: int, timeout_ms: int) -> EventBatch:
+    """
+    Poll until batch_size events arrive or timeout_ms passes after the first.
+    """
+    batch = defaultdict(list)
+    count, deadline = 0, None
+    while count < batch_size:
+        wait_ms = timeout_ms if deadline is None else int((deadline - time.monotonic()) * 1000)
+        if wait_ms <= 0:
+            break
+        polled = consumer.poll(max_records=batch_size - count, timeout_ms=wait_ms)
+        for topic, events in polled.items():
+            batch[topic].extend(events)
+            count += len(events)
+        if not count:
+            break # Nothing within a full timeout; let the caller check for shutdown
+        if deadline is None:
+            deadline = time.monotonic() + timeout_ms / 1000
+    return batch
+
+
+async def consume(consumer, batch_size: int, timeout_ms: int, stop: Optional[asyncio.Event] = None) -> None:
+    """
+    Read order and sales events from `consumer` (subscribed to
+    EVENT_TOPICS) in batches and write each batch in one transaction,
+    committing offsets only once it is written. Events the database
+    rejects are dead-lettered (see event_ingest.write_events); any other
+    failed write rewinds to the last committed offsets and retries after
+    EVENT_RETRY_BACKOFF_SECONDS, so delivery is at least once.
+    """
+    db = SessionLocal()
+    try:
+        while stop is None or not stop.is_set():
+            batch = await asyncio.to_thread(_collect, consumer, batch_size, timeout_ms)
+            if not any(batch.values()):
+                continue
+            started = time.monotonic()
+            try:
+                result = await asyncio.to_thread(event_ingest.write_events, db, batch)
+            except Exception:
+                logger.exception("Batch write failed; retrying from the last committed offsets")
+                await asyncio.to_thread(consumer.rewind)
+                await asyncio.sleep(settings.EVENT_RETRY_BACKOFF_SECONDS)
+                continue
+            try:
+                await asyncio.to_thread(consumer.commit)
+            except Exception:
+                # The batch is written; a rebalance may hand it out again, and
+                # its orders and sales are then skipped as duplicates
+                logger.warning("Offset commit failed; the batch may be redelivered", exc_info=True)
+
+            if result["orders"]:
+                await invalidate("analytics:fulfillment")
+            if result["sales"]:
+                await invalidate("analytics:sales")
+                await invalidate("forecast", *result["sku_ids"])
+            logger.info(
+                "Wrote %s orders and %s sales (%s and %s duplicates skipped, %s rejected) in %.2f s",
+                result["orders"], result["sales"], result["duplicate_orders"], result["duplicate_sales"],
+                result["rejected"],
+                time.monotonic() - started,
+            )
+    finally:
+        await asyncio.to_thread(consumer.close)
+        db.close()
+
+
+async def run_consumer(batch_size: int, timeout_ms: int) -> None:
+    consumer = KafkaEventConsumer(EVENT_TOPICS)
+    init_redis()
+    try:
+        await consume(consumer, batch_size, timeout_ms)
+    finally:
+        await close_redis()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write order and sales events from Kafka to Postgres in batches.")
+    parser.add_argument("--batch-size", type=int, default=settings.EVENT_BATCH_SIZE)
+    parser.add_argument("--batch-timeout-ms", type=int, default=settings.EVENT_BATCH_TIMEOUT_MS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run_consumer(args.batch_size, args.batch_timeout_ms))
+
+
+if __name__ == "__main__":
+    main()
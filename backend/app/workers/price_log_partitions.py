@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.db.session import AsyncSessionLocal
+from app.services import pricing
+
+logger = logging.getLogger("app.workers.price_log_partitions")
+
+
+async def ensure_partitions() -> List[str]:
+    """
+    Create any missing price_logs partitions in one transaction.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            created = await pricing.ensure_price_log_partitions(db)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    if created:
+        logger.info("Created price_logs partitions: %s", ", ".join(created))
+    return created
+
+
+async def maintain(interval_seconds: float, stop: Optional[asyncio.Event] = None) -> None:
+    """
+    Check the partitions now and every interval_seconds until `stop` is
+    set. A failed check is logged and retried at the next interval; rows
+    for a month without a partition land in price_logs_default meanwhile.
+    """
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        try:
+            await ensure_partitions()
+        except Exception:
+            logger.exception("price_logs partition check failed")
+        try:
+            await asyncio.wait_for(stop.wait(), interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create the upcoming monthly price_logs partitions.")
+    parser.add_argument("--every-hours", type=float, help="Keep running and check at this interval")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.every_hours:
+        asyncio.run(maintain(args.every_hours * 3600))
+    else:
+        asyncio.run(ensure_partitions())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app import models
+from app.core.cache import invalidate
+from app.core.config import settings
+from app.core.ml_client import create_ml_client
+from app.core.redis import close_redis, init_redis
+from app.db.session import SessionLocal, engine
+from app.services import replenishment
+
+logger = logging.getLogger("app.workers.replenishment_planner")
+
+# Postgres advisory lock key: at most one planner runs at a time
+PLANNER_LOCK_KEY = 4216001
+
+
+async def run_planner(batch_size: int, resume: bool = True) -> models.ReplenishmentRun:
+    """
+    Scan all inventory in id order, batch by batch, ordering from each row's
+    preferred supplier or else the default one: compute
+    demand from sales, get reorder points and order quantities from the ML
+    service in one call per batch, then store them and the consolidated
+    purchase orders. Each batch commits together with the run checkpoint,
+    so an interrupted run picks up at the next batch; a failed run is not
+    resumed (see replenishment.start_run).
+    """
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(select(func.pg_try_advisory_lock(PLANNER_LOCK_KEY))).scalar():
+            raise RuntimeError("Another replenishment planner is already running")
+        # The lock is session-level: end the transaction but keep the connection
+        lock_conn.commit()
+        try:
+            return await _run_locked(batch_size, resume)
+        finally:
+            lock_conn.execute(select(func.pg_advisory_unlock(PLANNER_LOCK_KEY)))
+            lock_conn.commit()
+
+
+async def _run_locked(batch_size: int, resume: bool) -> models.ReplenishmentRun:
+    db = SessionLocal()
+    ml = create_ml_client()
+    init_redis()
+    try:
+        run = await asyncio.to_thread(replenishment.start_run, db, resume)
+        default_supplier = await asyncio.to_thread(replenishment.default_supplier_id, db)
+        total = await asyncio.to_thread(_count_remaining, db, run.last_inventory_id, default_supplier)
+        logger.info("Run %s: %s inventory rows to plan after id %s", run.id, total, run.last_inventory_id)
+
+        started = time.monotonic()
+        done = 0
+        try:
+            while True:
+                rows = await asyncio.to_thread(
+                    replenishment.load_batch, db, run.last_inventory_id, batch_size, default_supplier
+                )
+                if not rows:
+                    break
+                await asyncio.to_thread(replenishment.demand_stats, db, rows)
+                plan = await ml.post_json("/optimize_inventory_batch", replenishment.optimizer_payload(rows))
+                await asyncio.to_thread(replenishment.apply_plan, db, run, rows, plan)
+
+                done += len(rows)
+                rate = done / max(time.monotonic() - started, 1e-9)
+                logger.info(
+                    "Run %s: %s/%s rows (%.0f rows/s), %s below reorder point, %s units ordered",
+                    run.id, done, total, rate, run.pairs_below_reorder_point, run.units_ordered,
+                )
+        except Exception as e:
+            await asyncio.to_thread(replenishment.finish_run, db, run, str(e))
+            raise
+
+        await asyncio.to_thread(replenishment.finish_run, db, run)
+        await invalidate("analytics:inventory")
+        logger.info(
+            "Run %s completed: %s rows scanned, %s below reorder point, %s units ordered",
+            run.id, run.pairs_scanned, run.pairs_below_reorder_point, run.units_ordered,
+        )
+        return run
+    finally:
+        await ml.aclose()
+        await close_redis()
+        db.close()
+
+
+def _count_remaining(db, after_id: int, default_supplier) -> int:
+    query = select(func.count()).select_from(models.Inventory).where(models.Inventory.id > after_id)
+    if default_supplier is None:
+        query = query.where(models.Inventory.supplier_id.is_not(None))
+    return db.execute(query).scalar()
+
+
+def _seconds_until(daily_at: str) -> float:
+    hour, minute = (int(part) for part in daily_at.split(":"))
+    now = datetime.now()
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plan replenishment and create purchase orders in bulk.")
+    parser.add_argument("--batch-size", type=int, default=settings.PLANNER_BATCH_SIZE)
+    parser.add_argument("--fresh", action="store_true", help="Start a new run instead of resuming an interrupted one")
+    parser.add_argument("--daily-at", metavar="HH:MM", help="Keep running and plan every day at this local time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if not args.daily_at:
+        asyncio.run(run_planner(args.batch_size, resume=not args.fresh))
+        return
+
+    while True:
+        delay = _seconds_until(args.daily_at)
+        logger.info("Next replenishment run in %.0f s", delay)
+        time.sleep(delay)
+        try:
+            # Each day plans against that day's stock, so never resume yesterday's run
+            asyncio.run(run_planner(args.batch_size, resume=False))
+        except Exception:
+            # Keep the schedule alive; tomorrow's run starts over
+            logger.exception("Replenishment run failed")
+
+
+if __name__ == "__main__":
+    main()
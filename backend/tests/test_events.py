@@ -0,0 +1,124 @@
+import asyncio
+
+from app.core.events import MemoryEventBus
+from app.workers import event_consumer
+
+
+def _result(**counts):
+    result = {"orders": 0, "duplicate_orders": 0, "sales": 0, "duplicate_sales": 0, "rejected": 0, "sku_ids": set()}
+    result.update(counts)
+    return result
+
+
+def test_memory_bus_redelivers_until_commit():
+    bus = MemoryEventBus()
+    consumer = bus.consumer(["orders", "sales"])
+    bus.publish("orders", {"external_order_id": "a"})
+    bus.publish("sales", {"event_id": "s1"})
+    bus.publish("orders", {"external_order_id": "b"})
+
+    batch = event_consumer._collect(consumer, batch_size=10, timeout_ms=50)
+    assert batch["orders"] == [{"external_order_id": "a"}, {"external_order_id": "b"}]
+    assert batch["sales"] == [{"event_id": "s1"}]
+
+    # Uncommitted events come back after a rewind
+    consumer.rewind()
+    assert event_consumer._collect(consumer, batch_size=10, timeout_ms=50) == batch
+
+    consumer.commit()
+    consumer.rewind()
+    assert not any(event_consumer._collect(consumer, batch_size=10, timeout_ms=50).values())
+
+    bus.publish("sales", {"event_id": "s2"})
+    assert event_consumer._collect(consumer, batch_size=10, timeout_ms=50)["sales"] == [{"event_id": "s2"}]
+
+
+def test_memory_bus_batches_up_to_batch_size():
+    bus = MemoryEventBus()
+    consumer = bus.consumer(["sales"])
+    for i in range(5):
+        bus.publish("sales", {"event_id": str(i)})
+
+    assert len(event_consumer._collect(consumer, batch_size=3, timeout_ms=50)["sales"]) == 3
+    consumer.commit()
+    assert len(event_consumer._collect(consumer, batch_size=3, timeout_ms=50)["sales"]) == 2
+
+
+def test_consume_retries_a_failed_write(monkeypatch):
+    bus = MemoryEventBus()
+    consumer = bus.consumer(["orders", "sales"])
+    bus.publish("orders", {"external_order_id": "a"})
+    bus.publish("sales", {"event_id": "s1", "sku_id": "A"})
+
+    writes = []
+
+    async def run():
+        stop = asyncio.Event()
+
+        def write_events(db, batch):
+            writes.append({topic: list(events) for topic, events in batch.items()})
+            if len(writes) == 1:
+                raise ConnectionError("database unavailable")
+            stop.set()
+            return _result(orders=1, sales=1, sku_ids={"A"})
+
+        monkeypatch.setattr(event_consumer.event_ingest, "write_events", write_events)
+        await asyncio.wait_for(event_consumer.consume(consumer, batch_size=10, timeout_ms=50, stop=stop), 5)
+
+    invalidated = []
+
+    async def invalidate(*args):
+        invalidated.append(args)
+
+    monkeypatch.setattr(event_consumer, "invalidate", invalidate)
+    monkeypatch.setattr(event_consumer, "SessionLocal", lambda: _NullSession())
+    monkeypatch.setattr(event_consumer.settings, "EVENT_RETRY_BACKOFF_SECONDS", 0)
+    asyncio.run(run())
+
+    # The same events were read again after the failure, then committed
+    assert len(writes) == 2
+    assert writes[0] == writes[1]
+    assert ("forecast", "A") in invalidated
+    consumer.rewind()
+    assert not any(event_consumer._collect(consumer, batch_size=10, timeout_ms=50).values())
+
+
+def test_consume_survives_a_failed_offset_commit(monkeypatch):
+    bus = MemoryEventBus()
+    consumer = bus.consumer(["orders"])
+    bus.publish("orders", {"external_order_id": "a"})
+
+    def commit():
+        raise RuntimeError("rebalanced")
+
+    async def run():
+        stop = asyncio.Event()
+        writes = []
+
+        def write_events(db, batch):
+            writes.append(batch)
+            if len(writes) == 1:
+                # Queue another event so the loop has to keep going after the failed commit
+                bus.publish("orders", {"external_order_id": "b"})
+            else:
+                stop.set()
+            return _result(duplicate_orders=1)
+
+        monkeypatch.setattr(event_consumer.event_ingest, "write_events", write_events)
+        await asyncio.wait_for(event_consumer.consume(consumer, batch_size=1, timeout_ms=50, stop=stop), 5)
+        return writes
+
+    async def invalidate(*args):
+        pass
+
+    monkeypatch.setattr(consumer, "commit", commit)
+    monkeypatch.setattr(event_consumer, "invalidate", invalidate)
+    monkeypatch.setattr(event_consumer, "SessionLocal", lambda: _NullSession())
+    writes = asyncio.run(run())
+
+    assert len(writes) == 2
+
+
+class _NullSession:
+    def close(self):
+        pass
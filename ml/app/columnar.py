@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError: # Arrow input is optional
+    pa = None
+
+RFM_COLUMNS = ("customer_id", "recency", "frequency", "monetary")
+FEATURE_COLUMNS = RFM_COLUMNS[1:]
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPES = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+
+
+class RFMColumns:
+    """
+    Accumulates customer RFM data as NumPy column chunks, never as
+    per-customer Python objects.
+
+    NDJSON input is columnar: each line is one batch such as
+    {"customer_id": [...], "recency": [...], "frequency": [...], "monetary": [...]}.
+    Arrow input is an IPC stream (or file) with the same column names.
+    """
+
+    def __init__(self):
+        self._ids = []
+        self._features = []
+        self._buffer = b""
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._ids)
+
+    def feed_ndjson(self, data):
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            self._add_line(line)
+
+    def finish_ndjson(self):
+        line, self._buffer = self._buffer, b""
+        self._add_line(line)
+
+    def add_arrow(self, payload):
+        if pa is None:
+            raise RuntimeError("pyarrow is not installed")
+        source = pa.py_buffer(payload)
+        try:
+            table = pa.ipc.open_stream(source).read_all()
+        except pa.ArrowInvalid:
+            table = pa.ipc.open_file(source).read_all()
+        missing = [name for name in RFM_COLUMNS if name not in table.column_names]
+        if missing:
+            raise ValueError(f"Arrow data is missing columns: {', '.join(missing)}")
+        self._add_batch({name: table.column(name).to_numpy() for name in RFM_COLUMNS})
+
+    def arrays(self):
+        """
+        Returns (customer_ids, features) with features shaped (n, 3).
+        """
+        if not self._ids:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(FEATURE_COLUMNS)))
+        return np.concatenate(self._ids), np.concatenate(self._features)
+
+    def _add_line(self, line):
+        if not line.strip():
+            return
+        record = json.loads(line)
+        missing = [name for name in RFM_COLUMNS if name not in record]
+        if missing:
+            raise ValueError(f"Batch is missing columns: {', '.join(missing)}")
+        self._add_batch(record)
+
+    def _add_batch(self, columns):
+        ids = np.asarray(columns["customer_id"], dtype=np.int64)
+        features = np.column_stack([np.asarray(columns[name], dtype=float) for name in FEATURE_COLUMNS])
+        if len(features) != len(ids):
+            raise ValueError("Columns in a batch must have the same length")
+        if len(ids) and not np.isfinite(features).all():
+            raise ValueError("Features must be finite numbers")
+        self._ids.append(ids)
+        self._features.append(features)
+
+
+def assignment_lines(customer_ids, segments, labels, chunk_size):
+    """
+    Streamed NDJSON response: a header line with the labels and count, then
+    one {"customer_id": [...], "segment": [...]} line per chunk.
+    """
+    yield json.dumps({"labels": labels, "count": int(len(customer_ids))}) + "\n"
+    for start in range(0, len(customer_ids), chunk_size):
+        yield json.dumps({
+            "customer_id": customer_ids[start:start + chunk_size].tolist(),
+            "segment": segments[start:start + chunk_size].tolist(),
+        }) + "\n"
@@ -1,25 +1,60 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Any
-from models.forecasting import DemandForecaster
-from models.pricing import DynamicPricingEngine
-from models.inventory import ReplenishmentOptimizer
-from models.customer import CustomerSegmenter
+import json
+import os
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Dict, Any, Literal, Optional, Tuple, Union
+from models.fast_forecasting import FastForecaster
+from models.forecasting import DemandForecaster, fit_and_predict
+from models.registry import ModelRegistry
+from models.pricing import DynamicPricingEngine, fit_elasticities
+from models.inventory import ReplenishmentOptimizer, simulate_chunk
+from models.routing import DEFAULT_SHIPMENT_COST, DEFAULT_TIME_LIMIT_SECONDS, OrderAllocator
+from models.customer import CustomerSegmenter, IncrementalSegmenter, default_labels
+from app import columnar
 
 app = FastAPI(title="OptiBrain ML Service")
 
-forecaster = DemandForecaster()
+model_registry = ModelRegistry()
+fast_forecaster = FastForecaster()
 pricing_engine = DynamicPricingEngine()
 inventory_optimizer = ReplenishmentOptimizer()
 customer_segmenter = CustomerSegmenter()
+incremental_segmenter = IncrementalSegmenter()
+
+# Prophet fits and inventory simulations are CPU-bound, so they go to worker processes
+FORECAST_POOL_WORKERS = int(os.getenv("FORECAST_POOL_WORKERS", os.cpu_count() or 1))
+SIMULATION_CHUNK_SIZE = int(os.getenv("SIMULATION_CHUNK_SIZE", "5")) # SKUs per pool task
+_process_pool = None
+
+def get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=FORECAST_POOL_WORKERS)
+    return _process_pool
+
+@app.on_event("shutdown")
+def shutdown_process_pool():
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
 
 class HistoryPoint(BaseModel):
     ds: str
     y: float
 
+ForecastEngine = Literal["prophet", "fast"]
+FastMethod = Literal["auto", "seasonal_naive", "holt_winters", "croston"]
+
 class PredictRequest(BaseModel):
+    sku_id: Optional[str] = None
     history: List[HistoryPoint]
     days: int = 7
+    engine: ForecastEngine = "prophet"
+    method: FastMethod = "auto" # Only used by the fast engine
 
 @app.get("/")
 def root():
@@ -31,20 +66,95 @@ def predict(request: PredictRequest):
         # Convert request to DataFrame-like structure
         data = [{"ds": h.ds, "y": h.y} for h in request.history]
         
-        # Train and Predict (In a real scenario, we would load a pre-trained model)
-        forecaster.train(data)
+        if request.engine == "fast":
+            forecast = fast_forecaster.forecast_batch([data], request.days, request.method)[0]
+            return {"forecast": forecast}
+
+        # Reuse the fitted model unless this SKU's history has changed
+        forecaster = model_registry.get_or_train(request.sku_id, data)
         forecast = forecaster.predict(request.days)
         
         return {"forecast": forecast}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchPredictItem(BaseModel):
+    sku_id: str
+    history: List[HistoryPoint]
+
+class BatchPredictRequest(BaseModel):
+    items: List[BatchPredictItem]
+    days: int = 7
+    engine: ForecastEngine = "prophet"
+    method: FastMethod = "auto" # Only used by the fast engine
+
+def _forecast_line(sku_id, forecast=None, error=None):
+    if error is not None:
+        result = {"sku_id": sku_id, "error": error}
+    else:
+        result = {"sku_id": sku_id, "forecast": forecast}
+    return json.dumps(result, default=lambda o: o.isoformat()) + "\n"
+
+@app.post("/predict_batch")
+def predict_batch(request: BatchPredictRequest):
+    """
+    Forecast many SKUs in one call.
+    With the Prophet engine, cached models are served straight from the
+    registry and the rest are fit in parallel worker processes; the fast
+    engine forecasts the whole batch in one vectorized pass. Results stream back as NDJSON, one line
+    per SKU, in completion order.
+    """
+    def generate_fast():
+        histories = [[{"ds": h.ds, "y": h.y} for h in item.history] for item in request.items]
+        try:
+            forecasts = fast_forecaster.forecast_batch(histories, request.days, request.method)
+        except Exception as e:
+            for item in request.items:
+                yield _forecast_line(item.sku_id, error=str(e))
+            return
+        for item, forecast in zip(request.items, forecasts):
+            yield _forecast_line(item.sku_id, forecast)
+
+    def generate():
+        pending = {}
+        for item in request.items:
+            data = [{"ds": h.ds, "y": h.y} for h in item.history]
+            fingerprint = model_registry.fingerprint(data)
+            try:
+                forecaster = model_registry.get(item.sku_id, fingerprint)
+                if forecaster is not None:
+                    yield _forecast_line(item.sku_id, forecaster.predict(request.days))
+                    continue
+                future = get_process_pool().submit(fit_and_predict, data, request.days)
+                pending[future] = (item.sku_id, fingerprint)
+            except Exception as e:
+                yield _forecast_line(item.sku_id, error=str(e))
+
+        for future in as_completed(pending):
+            sku_id, fingerprint = pending[future]
+            try:
+                model_json, forecast = future.result()
+                model_registry.put(sku_id, fingerprint, DemandForecaster.from_json(model_json))
+                yield _forecast_line(sku_id, forecast)
+            except Exception as e:
+                yield _forecast_line(sku_id, error=str(e))
+
+    if request.engine == "fast":
+        return StreamingResponse(generate_fast(), media_type="application/x-ndjson")
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+PricingObjective = Literal["revenue", "margin"]
+
 class PricingRequest(BaseModel):
     current_price: float
     forecast: float
     inventory_level: int
     min_price: float
     max_price: float
+    elasticity: Optional[float] = None # The price is held when unknown
+    unit_cost: Optional[float] = None # Required for the margin objective
+    max_increase_pct: Optional[float] = None # Fraction, e.g. 0.1 = 10%
+    objective: PricingObjective = "margin"
 
 @app.post("/optimize_price")
 def optimize_price(request: PricingRequest):
@@ -54,17 +164,100 @@ def optimize_price(request: PricingRequest):
             request.forecast,
             request.inventory_level,
             request.min_price,
-            request.max_price
+            request.max_price,
+            request.elasticity,
+            request.unit_cost,
+            request.max_increase_pct,
+            request.objective
         )
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class PriceHistory(BaseModel):
+    # Columnar observations, e.g. one per SKU and day
+    sku_id: List[str]
+    price: List[float]
+    quantity: List[float]
+
+class PricingBatchRequest(BaseModel):
+    # Columnar: element i of each list describes the same SKU; None = not set
+    sku_id: List[str]
+    current_price: List[float]
+    forecast: List[float]
+    inventory_level: Optional[List[Optional[float]]] = None
+    min_price: List[float]
+    max_price: List[float]
+    max_increase_pct: Optional[List[Optional[float]]] = None
+    reference_price: Optional[List[Optional[float]]] = None # Guardrail base, e.g. the price 24h ago
+    unit_cost: Optional[List[Optional[float]]] = None
+    elasticity: Optional[List[Optional[float]]] = None # Overrides fitted values
+    history: Optional[PriceHistory] = None # Used to fit elasticities
+    objective: PricingObjective = "margin"
+
+def _optional_column(values):
+    return None if values is None else np.array([np.nan if v is None else v for v in values], dtype=float)
+
+@app.post("/optimize_price_batch")
+def optimize_price_batch(request: PricingBatchRequest):
+    """
+    Price the whole catalog in one call: fit per-SKU elasticities from
+    `history` and search a price grid for every SKU in a single NumPy pass.
+    """
+    n = len(request.sku_id)
+    columns = [request.current_price, request.forecast, request.min_price, request.max_price]
+    if any(len(column) != n for column in columns):
+        raise HTTPException(status_code=400, detail="All per-SKU lists must have the same length")
+
+    optional = [request.inventory_level, request.max_increase_pct, request.reference_price, request.unit_cost, request.elasticity]
+    if any(column is not None and len(column) != n for column in optional):
+        raise HTTPException(status_code=400, detail="All per-SKU lists must have the same length")
+    history = request.history
+    if history is not None and not len(history.sku_id) == len(history.price) == len(history.quantity):
+        raise HTTPException(status_code=400, detail="history.sku_id, price and quantity must have the same length")
+
+    elasticity = _optional_column(request.elasticity)
+    fitted_points = np.zeros(n, dtype=np.int64)
+    if request.history is not None and request.history.sku_id:
+        positions = {sku_id: i for i, sku_id in enumerate(request.sku_id)}
+        index = np.array([positions.get(sku_id, -1) for sku_id in request.history.sku_id])
+        known = index >= 0
+        fitted, fitted_points = fit_elasticities(
+            index[known],
+            np.asarray(request.history.price)[known],
+            np.asarray(request.history.quantity)[known],
+            n,
+        )
+        elasticity = fitted if elasticity is None else np.where(np.isnan(elasticity), fitted, elasticity)
+
+    try:
+        result = pricing_engine.optimize_batch(
+            request.current_price,
+            request.forecast,
+            _optional_column(request.inventory_level),
+            request.min_price,
+            request.max_price,
+            elasticity=elasticity,
+            unit_cost=_optional_column(request.unit_cost),
+            max_increase_pct=_optional_column(request.max_increase_pct),
+            reference_price=_optional_column(request.reference_price),
+            objective=request.objective,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result["sku_id"] = request.sku_id
+    result["history_points"] = fitted_points.tolist()
+    return JSONResponse(result)
+
 class InventoryRequest(BaseModel):
     forecast_mean: float
     forecast_std: float
     lead_time_days: int
     service_level: float = 0.95
+    holding_cost: Optional[float] = None # Per unit per year
+    ordering_cost: Optional[float] = None # Per order
 
 @app.post("/optimize_inventory")
 def optimize_inventory(request: InventoryRequest):
@@ -73,26 +266,255 @@ def optimize_inventory(request: InventoryRequest):
             request.forecast_mean,
             request.forecast_std,
             request.lead_time_days,
-            request.service_level
+            request.service_level,
+            request.holding_cost,
+            request.ordering_cost
         )
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class InventoryBatchRequest(BaseModel):
+    # Columnar: element i of each list describes the same SKU/outlet pair
+    forecast_mean: List[float]
+    forecast_std: List[float]
+    lead_time_days: List[float]
+    service_level: Union[float, List[float]] = 0.95
+    holding_cost: Union[None, float, List[float]] = None
+    ordering_cost: Union[None, float, List[float]] = None
+
+@app.post("/optimize_inventory_batch")
+def optimize_inventory_batch(request: InventoryBatchRequest):
+    """
+    Vectorized /optimize_inventory; returns one list per output field in
+    input order.
+    """
+    try:
+        result = inventory_optimizer.optimize_batch(
+            request.forecast_mean,
+            request.forecast_std,
+            request.lead_time_days,
+            request.service_level,
+            request.holding_cost,
+            request.ordering_cost
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Plain lists skip FastAPI's per-element response encoding
+    return JSONResponse({key: values.tolist() for key, values in result.items()})
+
+class SimulationItem(BaseModel):
+    sku_id: str
+    demand_mean: float # Daily units
+    demand_std: float
+    lead_time_mean: float # Days
+    lead_time_std: float = 0.0
+    holding_cost: float # Per unit per year
+    ordering_cost: float # Per order
+    initial_stock: Optional[float] = None # Defaults to each policy's S
+    policies: Optional[List[Tuple[float, float]]] = None # Candidate (s, S); a grid around ROP/EOQ if omitted
+
+class SimulationRequest(BaseModel):
+    items: List[SimulationItem]
+    target_fill_rate: float = 0.95
+    n_paths: int = 1000
+    horizon_days: int = 90
+    seed: Optional[int] = None
+
+@app.post("/simulate_inventory_policies")
+def simulate_inventory_policies(request: SimulationRequest):
+    """
+    Monte Carlo sweep of (s, S) policies per SKU; returns the cheapest
+    policy meeting target_fill_rate (or the best fill rate if none does)
+    with its simulated fill rate, stockout probability and costs.
+    SKUs are simulated in chunks across the process pool.
+    """
+    if not 0 < request.target_fill_rate <= 1:
+        raise HTTPException(status_code=400, detail="target_fill_rate must be in (0, 1]")
+    if request.n_paths < 1 or request.horizon_days < 1:
+        raise HTTPException(status_code=400, detail="n_paths and horizon_days must be positive")
+    items = [item.dict() for item in request.items]
+    chunks = [items[i:i + SIMULATION_CHUNK_SIZE] for i in range(0, len(items), SIMULATION_CHUNK_SIZE)]
+    # Distinct but reproducible seeds per chunk when a seed is given
+    seeds = [None if request.seed is None else request.seed + i for i in range(len(chunks))]
+    futures = [
+        get_process_pool().submit(
+            simulate_chunk, chunk, request.target_fill_rate, request.n_paths, request.horizon_days, seed
+        )
+        for chunk, seed in zip(chunks, seeds)
+    ]
+    try:
+        return {"results": [result for future in futures for result in future.result()]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+Latitude = Annotated[float, Field(ge=-90, le=90)]
+Longitude = Annotated[float, Field(ge=-180, le=180)]
+
+class OrderRoutingRequest(BaseModel):
+    # Columnar: orders, stock entries (node index into the node lists) and nodes
+    order_sku: List[str]
+    order_quantity: List[int]
+    stock_node: List[int]
+    stock_sku: List[str]
+    stock_available: List[int]
+    node_cost: List[float] # Per unit shipped
+    node_capacity: Optional[List[Optional[float]]] = None # Units per batch; None = unlimited
+    # Order destinations and node locations in degrees; None = unknown (see OrderAllocator.allocate)
+    order_latitude: Optional[List[Optional[Latitude]]] = None
+    order_longitude: Optional[List[Optional[Longitude]]] = None
+    node_latitude: Optional[List[Optional[Latitude]]] = None
+    node_longitude: Optional[List[Optional[Longitude]]] = None
+    shipment_cost: float = DEFAULT_SHIPMENT_COST
+    cost_per_km: float = 0.0 # Per unit shipped
+    time_limit: float = DEFAULT_TIME_LIMIT_SECONDS
+
+@app.post("/route_orders")
+def route_orders(request: OrderRoutingRequest):
+    """
+    Assign a batch of orders to nodes at minimum cost, allowing split
+    shipments, with one mixed-integer program.
+    """
+    if len(request.order_sku) != len(request.order_quantity):
+        raise HTTPException(status_code=400, detail="order_sku and order_quantity must have the same length")
+    if not len(request.stock_node) == len(request.stock_sku) == len(request.stock_available):
+        raise HTTPException(status_code=400, detail="Stock lists must have the same length")
+    if request.node_capacity is not None and len(request.node_capacity) != len(request.node_cost):
+        raise HTTPException(status_code=400, detail="node_capacity and node_cost must have the same length")
+    if any(node < 0 or node >= len(request.node_cost) for node in request.stock_node):
+        raise HTTPException(status_code=400, detail="stock_node must index into node_cost")
+    order_location = node_location = None
+    if request.order_latitude is not None and request.node_latitude is not None:
+        columns = [request.order_latitude, request.order_longitude, request.node_latitude, request.node_longitude]
+        if any(column is None for column in columns):
+            raise HTTPException(status_code=400, detail="Latitude and longitude must be given together")
+        if not len(request.order_latitude) == len(request.order_longitude) == len(request.order_sku):
+            raise HTTPException(status_code=400, detail="Order coordinates must match the orders")
+        if not len(request.node_latitude) == len(request.node_longitude) == len(request.node_cost):
+            raise HTTPException(status_code=400, detail="Node coordinates must match node_cost")
+        order_location = np.column_stack([_optional_column(request.order_latitude),
+                                          _optional_column(request.order_longitude)])
+        node_location = np.column_stack([_optional_column(request.node_latitude),
+                                         _optional_column(request.node_longitude)])
+
+    allocator = OrderAllocator(request.shipment_cost, request.time_limit, cost_per_km=request.cost_per_km)
+    try:
+        result = allocator.allocate(
+            request.order_sku,
+            request.order_quantity,
+            request.stock_node,
+            request.stock_sku,
+            request.stock_available,
+            request.node_cost,
+            _optional_column(request.node_capacity),
+            order_location,
+            node_location,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(result)
+
 class CustomerData(BaseModel):
     customer_id: int
     recency: float  # Days since last purchase
     frequency: int  # Number of purchases
     monetary: float # Total spend
 
+SegmentationMode = Literal["kmeans", "minibatch"]
+
 class CustomerSegmentationRequest(BaseModel):
     customers: List[CustomerData]
+    # "kmeans" refits on this batch alone; "minibatch" uses the persisted
+    # incremental model, updating it with the batch first when fit is true
+    mode: SegmentationMode = "kmeans"
+    fit: bool = True
+    n_segments: Optional[int] = None # kmeans mode only
+
+class SegmenterConfig(BaseModel):
+    n_segments: int = 3
+    labels: Optional[List[str]] = None
 
 @app.post("/segment_customers")
 def segment_customers(request: CustomerSegmentationRequest):
+    customer_data = [c.dict() for c in request.customers]
+    if request.mode == "minibatch":
+        if not request.fit and not incremental_segmenter.fitted:
+            raise HTTPException(status_code=409, detail="Segmenter has not been fitted yet")
+        try:
+            result = incremental_segmenter.segment_customers(customer_data, fit=request.fit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"segments": result, "labels": incremental_segmenter.labels}
+
     try:
-        customer_data = [c.dict() for c in request.customers]
-        result = customer_segmenter.segment_customers(customer_data)
-        return {"segments": result}
+        # A fresh instance per request, as in _segment_features
+        segmenter = CustomerSegmenter(n_segments=request.n_segments or customer_segmenter.n_segments)
+        result = segmenter.segment_customers(customer_data)
+        return {"segments": result, "labels": default_labels(segmenter.n_segments)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/segment_customers/stream")
+async def segment_customers_stream(
+    request: Request,
+    mode: SegmentationMode = "kmeans",
+    fit: bool = True,
+    n_segments: Optional[int] = None,
+    chunk_size: int = Query(10000, gt=0),
+):
+    """
+    Columnar /segment_customers for very large customer sets.
+    Body: columnar NDJSON batches, or an Arrow IPC stream/file when the
+    Content-Type says so (needs pyarrow). Data goes straight into NumPy
+    arrays. Response: streamed NDJSON, a header with labels and count and
+    then `chunk_size` assignments per line.
+    """
+    content_type = request.headers.get("content-type", columnar.NDJSON_MEDIA_TYPE).split(";")[0].strip()
+    columns = columnar.RFMColumns()
+    try:
+        if content_type in columnar.ARROW_MEDIA_TYPES:
+            if columnar.pa is None:
+                raise HTTPException(status_code=415, detail="Arrow input requires pyarrow")
+            columns.add_arrow(await request.body())
+        else:
+            async for data in request.stream():
+                columns.feed_ndjson(data)
+            columns.finish_ndjson()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid customer data: {e}")
+
+    customer_ids, features = columns.arrays()
+    if mode == "minibatch" and not fit and not incremental_segmenter.fitted:
+        raise HTTPException(status_code=409, detail="Segmenter has not been fitted yet")
+    try:
+        segments, labels = await run_in_threadpool(_segment_features, features, mode, fit, n_segments)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        columnar.assignment_lines(customer_ids, segments, labels, chunk_size),
+        media_type=columnar.NDJSON_MEDIA_TYPE,
+    )
+
+def _segment_features(features, mode, fit, n_segments):
+    if mode == "minibatch":
+        return incremental_segmenter.segment_features(features, fit=fit), incremental_segmenter.labels
+    # A fresh instance per call: KMeans refits in place, and calls run concurrently
+    segmenter = CustomerSegmenter(n_segments=n_segments or customer_segmenter.n_segments)
+    return segmenter.segment_features(features), default_labels(segmenter.n_segments)
+
+@app.get("/segmenter")
+def get_segmenter():
+    return incremental_segmenter.info()
+
+@app.post("/segmenter/reset")
+def reset_segmenter(config: SegmenterConfig):
+    """
+    Discard the persisted incremental model and change the segment count.
+    """
+    try:
+        incremental_segmenter.reset(config.n_segments, config.labels)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return incremental_segmenter.info()
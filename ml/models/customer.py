@@ -1,7 +1,30 @@
+import os
+import tempfile
+import threading
+
+import joblib
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 
+DEFAULT_ARTIFACT_PATH = os.getenv(
+    "SEGMENTER_ARTIFACT_PATH",
+    os.path.join(tempfile.gettempdir(), "optibrain-models", "segmenter.joblib"),
+)
+DEFAULT_N_SEGMENTS = int(os.getenv("SEGMENTER_N_SEGMENTS", "3"))
+
+# Feature column order: recency, frequency, monetary
+MONETARY = 2
+
+
+def default_labels(n_segments):
+    """
+    Segment names, lowest to highest mean spend.
+    """
+    if n_segments == 3:
+        return ["Low Value", "Medium Value", "High Value"]
+    return [f"Value Tier {i + 1}" for i in range(n_segments)]
+
 class CustomerSegmenter:
     def __init__(self, n_segments=3):
         self.n_segments = n_segments
@@ -28,31 +51,184 @@ class CustomerSegmenter:
             [item['recency'], item['frequency'], item['monetary']]
             for item in customer_data
         ])
-        
+        return dict(zip(customer_ids, self.segment_features(features).tolist()))
+
+    def segment_features(self, features):
+        """
+        Array version of segment_customers.
+        features: array of shape (n, 3) in recency, frequency, monetary order
+        Returns an array of segment ids (0 = lowest mean spend).
+        """
+        features = np.asarray(features, dtype=float)
+        if len(features) < self.n_segments:
+            return np.zeros(len(features), dtype=int)
+
         # Normalize features
         features_scaled = self.scaler.fit_transform(features)
         
         # Perform clustering
         cluster_labels = self.kmeans.fit_predict(features_scaled)
         
-        # Map segment IDs (0=Low Value, 1=Medium Value, 2=High Value)
-        # Based on mean monetary value of each cluster
-        cluster_means = []
-        for i in range(self.n_segments):
-            cluster_mask = cluster_labels == i
-            if cluster_mask.any():
-                mean_monetary = features[cluster_mask, 2].mean()
-                cluster_means.append((i, mean_monetary))
+        # Rank clusters by mean monetary value (0=Low Value ... n-1=High Value)
+        cluster_spend = np.bincount(cluster_labels, weights=features[:, MONETARY], minlength=self.n_segments)
+        cluster_sizes = np.bincount(cluster_labels, minlength=self.n_segments)
+        cluster_means = np.where(cluster_sizes > 0, cluster_spend / np.maximum(cluster_sizes, 1), np.inf)
+        segment_mapping = np.empty(self.n_segments, dtype=int)
+        segment_mapping[np.argsort(cluster_means, kind="stable")] = np.arange(self.n_segments)
         
-        # Sort by monetary value
-        cluster_means.sort(key=lambda x: x[1])
-        
-        # Create mapping: original_cluster -> ranked_segment
-        segment_mapping = {cluster_means[i][0]: i for i in range(len(cluster_means))}
-        
-        # Map customers to segments
-        result = {}
-        for customer_id, cluster_id in zip(customer_ids, cluster_labels):
-            result[customer_id] = segment_mapping[cluster_id]
-        
-        return result
+        return segment_mapping[cluster_labels]
+
+class IncrementalSegmenter:
+    """
+    RFM segmentation with MiniBatchKMeans that learns from streamed chunks.
+
+    The scaler and centroids persist to `artifact_path`, so segment ids stay
+    stable across requests and restarts: segment i is always the cluster
+    with the i-th lowest centroid spend. `predict` is a plain NumPy distance
+    computation against the stored centroids and never refits.
+    """
+
+    def __init__(self, n_segments=DEFAULT_N_SEGMENTS, labels=None,
+                 artifact_path=DEFAULT_ARTIFACT_PATH, random_state=42):
+        self.artifact_path = artifact_path
+        self.random_state = random_state
+        self._lock = threading.Lock()
+        if artifact_path and os.path.exists(artifact_path):
+            self._load()
+        else:
+            self.reset(n_segments, labels, save=False)
+
+    def reset(self, n_segments=DEFAULT_N_SEGMENTS, labels=None, save=True):
+        """
+        Drop the learned model and start over with a new segment count.
+        """
+        labels = list(labels) if labels else default_labels(n_segments)
+        if len(labels) != n_segments:
+            raise ValueError(f"Expected {n_segments} labels, got {len(labels)}")
+        with self._lock:
+            self.n_segments = n_segments
+            self.labels = labels
+            self.scaler = StandardScaler()
+            self.kmeans = MiniBatchKMeans(
+                n_clusters=n_segments, random_state=self.random_state, n_init=3
+            )
+            self.n_samples_seen = 0
+            self._refresh()
+            if save:
+                self._save()
+
+    @property
+    def fitted(self):
+        return self._snapshot is not None
+
+    def partial_fit(self, features, save=True):
+        """
+        Update the scaler and centroids with one chunk of RFM rows.
+        features: array of shape (n, 3) in recency, frequency, monetary order
+        """
+        features = np.asarray(features, dtype=float)
+        if len(features) == 0:
+            return
+        with self._lock:
+            # MiniBatchKMeans needs at least n_clusters rows in its first batch
+            if not self.fitted and len(features) < self.n_segments:
+                raise ValueError(
+                    f"First batch needs at least {self.n_segments} customers, got {len(features)}"
+                )
+            if hasattr(self.kmeans, "cluster_centers_"):
+                # Carry the centroids over to the updated scale, so they stay
+                # in the same place in raw RFM units
+                centers = self.scaler.inverse_transform(self.kmeans.cluster_centers_)
+                self.scaler.partial_fit(features)
+                self.kmeans.cluster_centers_ = np.ascontiguousarray(self.scaler.transform(centers))
+            else:
+                self.scaler.partial_fit(features)
+            self.kmeans.partial_fit(self.scaler.transform(features))
+            self.n_samples_seen += len(features)
+            self._refresh()
+            if save:
+                self._save()
+
+    def predict(self, features):
+        """
+        Segment id per row (0 = lowest spend). Requires a fitted model.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("Segmenter has not been fitted yet")
+        mean, scale, centroids, rank = snapshot
+        scaled = (np.asarray(features, dtype=float) - mean) / scale
+        distances = ((scaled[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        return rank[distances.argmin(axis=1)]
+
+    def segment_customers(self, customer_data, fit=True):
+        """
+        Same contract as CustomerSegmenter.segment_customers, optionally
+        learning from the batch before assigning it.
+        """
+        if not customer_data:
+            return {}
+        customer_ids = [item['customer_id'] for item in customer_data]
+        features = np.array([
+            [item['recency'], item['frequency'], item['monetary']]
+            for item in customer_data
+        ], dtype=float)
+        return dict(zip(customer_ids, self.segment_features(features, fit=fit).tolist()))
+
+    def segment_features(self, features, fit=True, batch_size=100000):
+        """
+        Array version of segment_customers. When fitting, the rows are fed
+        to partial_fit in `batch_size` chunks and saved once at the end.
+        """
+        features = np.asarray(features, dtype=float)
+        if fit and len(features):
+            for start in range(0, len(features), batch_size):
+                self.partial_fit(features[start:start + batch_size], save=False)
+            with self._lock:
+                self._save()
+        return self.predict(features)
+
+    def info(self):
+        return {
+            "n_segments": self.n_segments,
+            "labels": self.labels,
+            "fitted": self.fitted,
+            "n_samples_seen": self.n_samples_seen,
+        }
+
+    def _refresh(self):
+        # Snapshot the arrays predict() needs, ranked by centroid spend;
+        # swapped in as one tuple so predict() never sees a half update
+        if not hasattr(self.kmeans, "cluster_centers_"):
+            self._snapshot = None
+            return
+        centroids = self.kmeans.cluster_centers_.copy()
+        spend = self.scaler.inverse_transform(centroids)[:, MONETARY]
+        rank = np.empty(self.n_segments, dtype=int)
+        rank[np.argsort(spend, kind="stable")] = np.arange(self.n_segments)
+        self._snapshot = (self.scaler.mean_.copy(), self.scaler.scale_.copy(), centroids, rank)
+
+    def _save(self):
+        if not self.artifact_path:
+            return
+        directory = os.path.dirname(self.artifact_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        joblib.dump({
+            "n_segments": self.n_segments,
+            "labels": self.labels,
+            "scaler": self.scaler,
+            "kmeans": self.kmeans,
+            "n_samples_seen": self.n_samples_seen,
+        }, tmp_path)
+        os.replace(tmp_path, self.artifact_path)
+
+    def _load(self):
+        artifact = joblib.load(self.artifact_path)
+        self.n_segments = artifact["n_segments"]
+        self.labels = artifact["labels"]
+        self.scaler = artifact["scaler"]
+        self.kmeans = artifact["kmeans"]
+        self.n_samples_seen = artifact["n_samples_seen"]
+        self._refresh()
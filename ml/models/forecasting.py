@@ -1,5 +1,6 @@
 import pandas as pd
 from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
 
 class DemandForecaster:
     def __init__(self):
@@ -30,3 +31,32 @@ class DemandForecaster:
         future_forecast = forecast.tail(days)
         
         return future_forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].to_dict('records')
+
+    def to_json(self):
+        """
+        Serialize the fitted model.
+        """
+        if not self.model:
+            raise ValueError("Model not trained")
+
+        return model_to_json(self.model)
+
+    @classmethod
+    def from_json(cls, payload):
+        """
+        Restore a forecaster from `to_json` output.
+        """
+        forecaster = cls()
+        forecaster.model = model_from_json(payload)
+        return forecaster
+
+
+def fit_and_predict(data, days=7):
+    """
+    Fit a fresh model and forecast in one call.
+    Module-level so it can run in a worker process; returns the serialized
+    model alongside the forecast so the caller can cache it.
+    """
+    forecaster = DemandForecaster()
+    forecaster.train(data)
+    return forecaster.to_json(), forecaster.predict(days)
@@ -1,30 +1,237 @@
 import numpy as np
+from scipy.special import ndtri
+
+DAYS_PER_YEAR = 365
+DEFAULT_COVER_DAYS = 14 # Order quantity when holding/ordering costs are unknown
 
 class ReplenishmentOptimizer:
-    def __init__(self):
-        pass
+    def __init__(self, default_cover_days=DEFAULT_COVER_DAYS):
+        self.default_cover_days = default_cover_days
 
-    def optimize_inventory(self, forecast_mean, forecast_std, lead_time_days, service_level=0.95):
+    def optimize_inventory(self, forecast_mean, forecast_std, lead_time_days, service_level=0.95,
+                           holding_cost=None, ordering_cost=None):
+        """
+        Calculate Reorder Point (ROP) and Order Quantity for one SKU.
+        See optimize_batch for the formulas.
         """
-        Calculate Reorder Point (ROP) and Order Quantity.
+        result = self.optimize_batch(
+            [forecast_mean], [forecast_std], [lead_time_days], service_level,
+            holding_cost=None if holding_cost is None else [holding_cost],
+            ordering_cost=None if ordering_cost is None else [ordering_cost],
+        )
+        return {key: int(values[0]) for key, values in result.items()}
+
+    def optimize_batch(self, forecast_mean, forecast_std, lead_time_days, service_level=0.95,
+                       holding_cost=None, ordering_cost=None):
+        """
+        Vectorized ROP, safety stock and order quantity for many SKUs at once.
         ROP = (Avg Daily Demand * Lead Time) + Safety Stock
-        Safety Stock = Z * StdDev * sqrt(Lead Time)
-        """
-        # Z-score for service level (approximate)
-        z_score = 1.645 if service_level == 0.95 else 1.96 # 95% vs 97.5%
-        
-        avg_daily_demand = forecast_mean
-        std_dev_demand = forecast_std
-        
-        safety_stock = z_score * std_dev_demand * np.sqrt(lead_time_days)
-        reorder_point = (avg_daily_demand * lead_time_days) + safety_stock
-        
-        # Simple EOQ-like logic for order quantity (mocked for now)
-        # In reality, we'd use holding costs and ordering costs
-        economic_order_quantity = avg_daily_demand * 14 # 2 weeks of stock
-        
+        Safety Stock = Z * StdDev * sqrt(Lead Time), Z = inverse normal CDF of the service level
+        EOQ = sqrt(2 * Annual Demand * Ordering Cost / Annual Holding Cost per unit)
+
+        Inputs are arrays of equal length (service_level and the costs may
+        be scalars). Where holding or ordering cost is missing or not
+        positive, the order quantity falls back to `default_cover_days` of demand.
+        Returns a dict of integer arrays.
+        """
+        mean = np.asarray(forecast_mean, dtype=float)
+        std = np.asarray(forecast_std, dtype=float)
+        lead_time = np.asarray(lead_time_days, dtype=float)
+        service_level = np.asarray(service_level, dtype=float)
+        if not (mean.shape == std.shape == lead_time.shape) or mean.ndim != 1:
+            raise ValueError("forecast_mean, forecast_std and lead_time_days must be 1-D arrays of equal length")
+        if np.any((service_level <= 0) | (service_level >= 1)):
+            raise ValueError("service_level must be strictly between 0 and 1")
+
+        z_score = ndtri(service_level)
+        # Below a 50% service level z is negative; never plan negative stock
+        safety_stock = np.maximum(z_score * std * np.sqrt(lead_time), 0.0)
+        reorder_point = mean * lead_time + safety_stock
+
+        order_quantity = mean * self.default_cover_days
+        if holding_cost is not None and ordering_cost is not None:
+            holding = np.broadcast_to(np.asarray(holding_cost, dtype=float), mean.shape)
+            ordering = np.broadcast_to(np.asarray(ordering_cost, dtype=float), mean.shape)
+            has_costs = (holding > 0) & (ordering > 0)
+            eoq = np.sqrt(2 * mean * DAYS_PER_YEAR * ordering / np.where(has_costs, holding, 1.0))
+            order_quantity = np.where(has_costs, eoq, order_quantity)
+
         return {
-            "reorder_point": int(np.ceil(reorder_point)),
-            "safety_stock": int(np.ceil(safety_stock)),
-            "suggested_order_quantity": int(np.ceil(economic_order_quantity))
+            "reorder_point": np.ceil(reorder_point).astype(np.int64),
+            "safety_stock": np.ceil(safety_stock).astype(np.int64),
+            "suggested_order_quantity": np.ceil(np.maximum(order_quantity, 0.0)).astype(np.int64),
         }
+
+
+# (s, S) candidates per SKU when none are given: reorder levels at these
+# safety factors times order sizes at these multiples of EOQ
+CANDIDATE_SAFETY_FACTORS = (0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0)
+CANDIDATE_ORDER_MULTIPLES = (0.5, 1.0, 1.5, 2.0)
+
+
+def candidate_policies(demand_mean, demand_std, lead_time_mean, lead_time_std,
+                       holding_cost, ordering_cost, default_cover_days=DEFAULT_COVER_DAYS):
+    """
+    Grid of (s, S) policies around the analytic ROP and EOQ, using the
+    standard deviation of demand over a random lead time.
+    """
+    lead_demand_std = np.sqrt(lead_time_mean * demand_std ** 2 + (demand_mean * lead_time_std) ** 2)
+    reorder_levels = demand_mean * lead_time_mean + np.array(CANDIDATE_SAFETY_FACTORS) * lead_demand_std
+    if holding_cost > 0 and ordering_cost > 0:
+        base_quantity = np.sqrt(2 * demand_mean * DAYS_PER_YEAR * ordering_cost / holding_cost)
+    else:
+        base_quantity = demand_mean * default_cover_days
+    order_sizes = np.maximum(np.array(CANDIDATE_ORDER_MULTIPLES) * base_quantity, 1.0)
+    return [(float(s), float(s + q)) for s in np.ceil(reorder_levels) for q in np.ceil(order_sizes)]
+
+
+class InventorySimulator:
+    """
+    Vectorized Monte Carlo evaluation of (s, S) policies: each day, on-hand
+    stock meets gamma-distributed demand (unmet demand is lost), and when
+    the inventory position (on hand + on order) drops to s an order up to S
+    is placed and arrives after a random lead time.
+
+    Arrays are shaped (SKUs, policies, paths), so every policy of every SKU
+    in a chunk advances one day per NumPy operation. All policies of a SKU
+    see the same demand and lead-time draws (common random numbers), which
+    makes comparisons between them far less noisy.
+    """
+
+    def __init__(self, n_paths=1000, horizon_days=90, seed=None):
+        self.n_paths = n_paths
+        self.horizon_days = horizon_days
+        self.seed = seed
+
+    def simulate(self, s, S, demand_mean, demand_std, lead_time_mean, lead_time_std,
+                 holding_cost, ordering_cost, initial_stock=None):
+        """
+        s, S: arrays shaped (n_skus, n_policies)
+        Other parameters: arrays shaped (n_skus,); holding_cost is per unit per year.
+        initial_stock defaults to each policy's S, for all SKUs or (NaN) per SKU.
+        Returns a dict of (n_skus, n_policies) arrays: fill_rate,
+        stockout_probability (share of days with unmet demand), holding_cost,
+        ordering_cost and total_cost over the horizon, averaged over paths.
+        """
+        rng = np.random.default_rng(self.seed)
+        s = np.asarray(s, dtype=float)[:, :, None]
+        S = np.asarray(S, dtype=float)[:, :, None]
+        per_sku = lambda a: np.asarray(a, dtype=float)[:, None, None]
+        mean, std = per_sku(demand_mean), per_sku(demand_std)
+        lead_mean, lead_std = per_sku(lead_time_mean), per_sku(lead_time_std)
+        n_skus, n_policies = s.shape[:2]
+        shape = (n_skus, n_policies, self.n_paths)
+        draw_shape = (n_skus, 1, self.n_paths)
+
+        # Gamma demand matching mean and std; a near-zero std is near-deterministic
+        gamma_shape = np.clip((mean / np.maximum(std, 1e-9)) ** 2, 1e-3, 1e6)
+        gamma_scale = np.where(mean > 0, mean / gamma_shape, 0.0)
+        max_lead = max(int(np.ceil((lead_mean + 4 * lead_std).max())), 1)
+
+        # float32 and in-place updates: the loop is memory-bound
+        start = S if initial_stock is None else np.where(np.isnan(per_sku(initial_stock)), S, per_sku(initial_stock))
+        on_hand = np.broadcast_to(start, shape).astype(np.float32)
+        position = on_hand.copy()
+        s = s.astype(np.float32)
+        S = S.astype(np.float32)
+        pipeline = np.zeros((max_lead + 1,) + shape, dtype=np.float32) # Arrivals, by day % (max_lead + 1)
+        served = np.empty(shape, dtype=np.float32)
+        ordering = np.empty(shape, dtype=bool)
+        demand_total = np.zeros(draw_shape)
+        served_total = np.zeros(shape, dtype=np.float32)
+        stockout_days = np.zeros(shape, dtype=np.int32)
+        stock_days = np.zeros(shape, dtype=np.float32)
+        orders = np.zeros(shape, dtype=np.int32)
+
+        for day in range(self.horizon_days):
+            slot = day % (max_lead + 1)
+            on_hand += pipeline[slot]
+            pipeline[slot] = 0.0
+
+            demand = (rng.standard_gamma(gamma_shape, size=draw_shape) * gamma_scale).astype(np.float32)
+            np.minimum(on_hand, demand, out=served)
+            on_hand -= served
+            position -= served
+            demand_total += demand
+            served_total += served
+            stockout_days += served < demand
+            stock_days += on_hand
+
+            np.less_equal(position, s, out=ordering)
+            sku_idx, policy_idx, path_idx = np.nonzero(ordering)
+            if len(sku_idx):
+                lead = np.clip(np.rint(lead_mean + lead_std * rng.standard_normal(draw_shape)), 1, max_lead)
+                arrival = ((day + lead[sku_idx, 0, path_idx]) % (max_lead + 1)).astype(int)
+                quantity = S[sku_idx, policy_idx, 0] - position[sku_idx, policy_idx, path_idx]
+                pipeline[arrival, sku_idx, policy_idx, path_idx] += quantity
+                position[sku_idx, policy_idx, path_idx] += quantity
+                orders[sku_idx, policy_idx, path_idx] += 1
+
+        demand_sum = demand_total.sum(axis=2) # Same for every policy
+        holding = stock_days.mean(axis=2, dtype=float) * per_sku(holding_cost)[:, :, 0] / DAYS_PER_YEAR
+        ordering_cost_total = orders.mean(axis=2) * per_sku(ordering_cost)[:, :, 0]
+        return {
+            "fill_rate": np.where(demand_sum > 0, served_total.sum(axis=2, dtype=float) / np.maximum(demand_sum, 1e-12), 1.0),
+            "stockout_probability": stockout_days.mean(axis=2) / self.horizon_days,
+            "holding_cost": holding,
+            "ordering_cost": ordering_cost_total,
+            "total_cost": holding + ordering_cost_total,
+        }
+
+    def best_policies(self, items, target_fill_rate=0.95):
+        """
+        Pick the cheapest simulated (s, S) policy meeting the target fill
+        rate for each item, or the highest fill rate if none does.
+        items: dicts with sku_id, demand_mean, demand_std, lead_time_mean,
+        lead_time_std, holding_cost, ordering_cost and optional
+        initial_stock and policies ([(s, S), ...]).
+        """
+        if not items:
+            return []
+        policies = [
+            item.get("policies") or candidate_policies(
+                item["demand_mean"], item["demand_std"], item["lead_time_mean"],
+                item.get("lead_time_std", 0.0), item["holding_cost"], item["ordering_cost"],
+            )
+            for item in items
+        ]
+        # Pad to a rectangle by repeating each SKU's last policy
+        width = max(len(p) for p in policies)
+        grid = np.array([p + [p[-1]] * (width - len(p)) for p in policies], dtype=float)
+        column = lambda key, default=0.0: [item.get(key, default) for item in items]
+
+        metrics = self.simulate(
+            grid[:, :, 0], grid[:, :, 1],
+            column("demand_mean"), column("demand_std"),
+            column("lead_time_mean"), column("lead_time_std"),
+            column("holding_cost"), column("ordering_cost"),
+            column("initial_stock", None), # None becomes NaN: that item starts at S
+        )
+
+        results = []
+        for i, item in enumerate(items):
+            n = len(policies[i])
+            fill_rate = metrics["fill_rate"][i, :n]
+            meets = fill_rate >= target_fill_rate
+            if meets.any():
+                best = int(np.argmin(np.where(meets, metrics["total_cost"][i, :n], np.inf)))
+            else:
+                best = int(np.argmax(fill_rate))
+            result = {
+                "sku_id": item["sku_id"],
+                "s": float(grid[i, best, 0]),
+                "S": float(grid[i, best, 1]),
+                "meets_target": bool(meets[best]),
+                "policies_evaluated": n,
+            }
+            result.update({key: float(values[i, best]) for key, values in metrics.items()})
+            results.append(result)
+        return results
+
+
+def simulate_chunk(items, target_fill_rate, n_paths, horizon_days, seed=None):
+    """
+    Process-pool entry point: best (s, S) policies for one chunk of SKUs.
+    """
+    simulator = InventorySimulator(n_paths=n_paths, horizon_days=horizon_days, seed=seed)
+    return simulator.best_policies(items, target_fill_rate)
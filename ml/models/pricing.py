@@ -1,29 +1,168 @@
+import numpy as np
+
+OBJECTIVES = ("revenue", "margin")
+
+MIN_ELASTICITY = -5.0
+MAX_ELASTICITY = -0.1 # Demand must fall as price rises for the search to be meaningful
+MIN_HISTORY_POINTS = 8
+GRID_SIZE = 51
+MIN_PRICE = 0.01 # Keeps candidates positive, where constant-elasticity demand is defined
+# Largest move from the current price per run (0.1 = 10%). Constant-elasticity
+# revenue is monotonic in price, so without it the search lands on a bound.
+MAX_STEP_PCT = 0.1
+
+
+def fit_elasticities(sku_index, price, quantity, n_skus, min_points=MIN_HISTORY_POINTS):
+    """
+    Per-SKU log-log price elasticity, fitted for every SKU at once.
+    sku_index: int array mapping each observation to its SKU (0..n_skus-1)
+    price, quantity: observations (e.g. daily average price and units sold)
+    Returns (elasticity, n_points); SKUs without a usable fit (too few
+    points, no price variation) get NaN.
+    """
+    sku_index = np.asarray(sku_index, dtype=np.int64)
+    price = np.asarray(price, dtype=float)
+    quantity = np.asarray(quantity, dtype=float)
+    valid = (price > 0) & (quantity > 0)
+    sku_index, x, y = sku_index[valid], np.log(price[valid]), np.log(quantity[valid])
+
+    # Per-SKU sums for ordinary least squares of y = a + b * x
+    count = np.bincount(sku_index, minlength=n_skus).astype(float)
+    sum_x = np.bincount(sku_index, weights=x, minlength=n_skus)
+    sum_y = np.bincount(sku_index, weights=y, minlength=n_skus)
+    sum_xx = np.bincount(sku_index, weights=x * x, minlength=n_skus)
+    sum_xy = np.bincount(sku_index, weights=x * y, minlength=n_skus)
+    denominator = count * sum_xx - sum_x ** 2
+
+    usable = (count >= min_points) & (denominator > 1e-9 * np.maximum(count, 1) ** 2)
+    slope = np.where(usable, (count * sum_xy - sum_x * sum_y) / np.where(usable, denominator, 1.0), np.nan)
+    return np.clip(slope, MIN_ELASTICITY, MAX_ELASTICITY), count.astype(np.int64)
+
+
 class DynamicPricingEngine:
-    def __init__(self):
-        pass
+    def __init__(self, grid_size=GRID_SIZE):
+        self.grid_size = grid_size
+
+    def optimize_price(self, current_price, forecast, inventory_level, min_price, max_price,
+                       elasticity=None, unit_cost=None, max_increase_pct=None,
+                       objective="margin", max_step_pct=MAX_STEP_PCT):
+        """
+        Single-SKU version of optimize_batch.
+        """
+        result = self.optimize_batch(
+            [current_price], [forecast], [inventory_level], [min_price], [max_price],
+            elasticity=[np.nan if elasticity is None else elasticity],
+            unit_cost=None if unit_cost is None else [unit_cost],
+            max_increase_pct=None if max_increase_pct is None else [max_increase_pct],
+            objective=objective,
+            max_step_pct=max_step_pct,
+        )
+        return {
+            "recommended_price": result["recommended_price"][0],
+            "reason": result["reason"][0],
+            "elasticity": result["elasticity"][0],
+            "expected_units": result["expected_units"][0],
+        }
 
-    def optimize_price(self, current_price, forecast, inventory_level, min_price, max_price):
+    def optimize_batch(self, current_price, forecast, inventory_level, min_price, max_price,
+                       elasticity=None, unit_cost=None, max_increase_pct=None, reference_price=None,
+                       objective="margin", max_step_pct=MAX_STEP_PCT):
         """
-        Simple rule-based optimization for now.
-        Real implementation would use elasticity models.
+        Choose a price per SKU from a grid of candidates in one NumPy pass.
+
+        Demand at price p is forecast * (p / current_price) ** elasticity,
+        capped by inventory_level since unstocked units can't be sold. Each
+        candidate is scored by margin ((p - unit_cost) * units) or revenue
+        (p * units) and the best one wins.
+
+        Candidates lie within [min_price, max_price] and, where
+        max_increase_pct is given, at most that fraction (0.1 = 10%, as in
+        PricingRule.max_daily_increase_pct) above reference_price (defaults
+        to current_price). Unset bounds default to half and twice the
+        current price. The min_price floor wins a conflict. Within those
+        bounds, candidates stay within max_step_pct of current_price where
+        the two overlap. The current price is always a candidate when
+        allowed, and wins ties.
+
+        SKUs without an elasticity, or without a unit cost under the margin
+        objective, hold their price (moved only into the allowed range).
+        All arguments except objective and max_step_pct are arrays of one
+        value per SKU (NaN = not set). Returns a dict of lists.
         """
-        recommended_price = current_price
-
-        # High demand -> Increase price
-        if forecast > 100: # Arbitrary threshold
-            recommended_price *= 1.10
-        # Low demand -> Decrease price
-        elif forecast < 20:
-            recommended_price *= 0.90
-        
-        # Low inventory -> Increase price
-        if inventory_level < 10:
-            recommended_price *= 1.05
-            
-        # Apply constraints
-        recommended_price = max(min_price, min(recommended_price, max_price))
-        
+        if objective not in OBJECTIVES:
+            raise ValueError(f"objective must be one of {', '.join(OBJECTIVES)}")
+        current = np.asarray(current_price, dtype=float)
+        n = len(current)
+        column = lambda values, default: np.full(n, default) if values is None else np.asarray(values, dtype=float)
+        demand = np.maximum(np.nan_to_num(column(forecast, 0.0)), 0.0)
+        stock = column(inventory_level, np.nan)
+        stock = np.where(np.isnan(stock), np.inf, stock)
+        low = column(min_price, np.nan)
+        low = np.maximum(np.where(np.isnan(low), current / 2, low), MIN_PRICE)
+        high = column(max_price, np.nan)
+        beta = column(elasticity, np.nan)
+        cost = column(unit_cost, np.nan)
+        if np.any(current <= 0):
+            raise ValueError("current_price must be positive")
+
+        # Guardrail: cap increases relative to the reference price
+        increase = column(max_increase_pct, np.nan)
+        reference = column(reference_price, np.nan)
+        reference = np.where(np.isnan(reference), current, reference)
+        capped = ~np.isnan(increase)
+        high = np.where(capped, np.fmin(high, reference * (1 + np.nan_to_num(increase))), high)
+        high = np.where(np.isnan(high), current * 2, high)
+        high = np.maximum(high, low)
+        if max_step_pct is not None:
+            # The step window narrows the rule's range but never leaves it: a
+            # price outside the range moves to the nearest bound in one go
+            low, high = (
+                np.clip(np.maximum(low, current * (1 - max_step_pct)), low, high),
+                np.clip(np.minimum(high, current * (1 + max_step_pct)), low, high),
+            )
+
+        # (n, 1 + grid) candidates: the current price (clipped into range) first, so it wins ties
+        steps = np.linspace(0.0, 1.0, self.grid_size)
+        prices = np.round(low[:, None] + (high - low)[:, None] * steps[None, :], 2)
+        clipped = np.clip(current, low, high)
+        clipped = np.where(clipped == current, current, np.round(clipped, 2))
+        prices = np.concatenate([clipped[:, None], prices], axis=1)
+
+        # Held SKUs are scored at the current price, where the unknown elasticity doesn't matter
+        unknown = np.isnan(beta)
+        no_cost = np.isnan(cost) if objective == "margin" else np.zeros(n, dtype=bool)
+        hold = unknown | no_cost
+        units = np.minimum(demand[:, None] * (prices / current[:, None]) ** np.where(unknown, 0.0, beta)[:, None], stock[:, None])
+        unit_value = prices - np.nan_to_num(cost)[:, None] if objective == "margin" else prices
+        score = unit_value * units
+
+        best = np.where(hold, 0, np.argmax(score, axis=1))
+        rows = np.arange(n)
+        recommended = prices[rows, best]
+        best_units = units[rows, best]
+        reason = np.select(
+            [
+                hold & (recommended > current), hold & (recommended < current), unknown, no_cost,
+                recommended > current, recommended < current,
+            ],
+            [
+                "Raise: below the allowed price range", "Lower: above the allowed price range",
+                "Hold: no elasticity fitted for this SKU", "Hold: no unit cost for the margin objective",
+                "Raise: higher " + objective + " at the fitted elasticity",
+                "Lower: higher " + objective + " at the fitted elasticity",
+            ],
+            default="Hold: current price is optimal",
+        )
+        expected = np.where(no_cost, np.nan, score[rows, best])
         return {
-            "recommended_price": round(recommended_price, 2),
-            "reason": "Demand-Inventory Optimization"
+            "recommended_price": recommended.tolist(),
+            "expected_units": best_units.tolist(),
+            "expected_" + objective: _nullable(expected),
+            "elasticity": _nullable(beta),
+            "reason": reason.tolist(),
         }
+
+
+def _nullable(values):
+    # NaN isn't valid JSON
+    return [None if np.isnan(value) else value for value in values.tolist()]
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from models.forecasting import DemandForecaster
+
+DEFAULT_STORAGE_DIR = os.getenv(
+    "MODEL_REGISTRY_DIR", os.path.join(tempfile.gettempdir(), "optibrain-models")
+)
+DEFAULT_MAX_IN_MEMORY = int(os.getenv("MODEL_REGISTRY_MAX_IN_MEMORY", "256"))
+# Fits are serialized per stripe of keys rather than per key, so the locks
+# don't grow with the catalog; keys sharing a stripe just wait on each other
+LOCK_STRIPES = 64
+
+
+class ModelRegistry:
+    """
+    Cache of fitted forecasters keyed by SKU and a fingerprint of the
+    training history.
+
+    Fitted models are serialized to local disk and the most recently used
+    ones are kept in memory, so a model is only refit when its history changes.
+    """
+
+    def __init__(self, storage_dir=DEFAULT_STORAGE_DIR, max_in_memory=DEFAULT_MAX_IN_MEMORY):
+        self.storage_dir = storage_dir
+        self.max_in_memory = max_in_memory
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        # Reentrant: get_or_train holds its stripe while put takes it again
+        self._key_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        os.makedirs(self.storage_dir, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(data):
+        """
+        Stable hash of a training history (order-insensitive).
+        data: List of dicts with 'ds' and 'y'
+        """
+        points = sorted((str(d["ds"]), float(d["y"])) for d in data)
+        payload = json.dumps(points, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_or_train(self, sku_id, data):
+        """
+        Return a fitted forecaster for this SKU/history, training it only
+        if neither memory nor disk holds a model for the same fingerprint.
+        """
+        fingerprint = self.fingerprint(data)
+        key = sku_id or fingerprint
+
+        # Serialize fits per SKU (stripe, see LOCK_STRIPES) so concurrent requests don't train twice
+        with self._key_lock(key):
+            forecaster = self.get(key, fingerprint)
+            if forecaster is None:
+                forecaster = DemandForecaster()
+                forecaster.train(data)
+                self.put(key, fingerprint, forecaster)
+        return forecaster
+
+    def get(self, key, fingerprint):
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._models.move_to_end(key)
+                return entry[1]
+
+        # No exists() check first: a put for a newer history may remove the
+        # file in between, which reads the same as the model never being stored
+        try:
+            with open(self._model_path(key, fingerprint), "r") as f:
+                forecaster = DemandForecaster.from_json(f.read())
+        except FileNotFoundError:
+            return None
+        self._remember(key, fingerprint, forecaster)
+        return forecaster
+
+    def put(self, key, fingerprint, forecaster):
+        model_dir = self._model_dir(key)
+        os.makedirs(model_dir, exist_ok=True)
+
+        # Serialized with fits of the key; readers only ever open complete files
+        with self._key_lock(key):
+            # Write atomically, then drop models fit on stale histories. Temp
+            # files are left alone: they may be another worker process's write
+            fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(forecaster.to_json())
+            os.replace(tmp_path, self._model_path(key, fingerprint))
+            for name in os.listdir(model_dir):
+                if name.endswith(".json") and name != f"{fingerprint}.json":
+                    try:
+                        os.remove(os.path.join(model_dir, name))
+                    except FileNotFoundError:
+                        pass
+
+            self._remember(key, fingerprint, forecaster)
+
+    def _remember(self, key, fingerprint, forecaster):
+        with self._lock:
+            self._models[key] = (fingerprint, forecaster)
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_in_memory:
+                self._models.popitem(last=False)
+
+    def _key_lock(self, key):
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _model_dir(self, key):
+        # Hash the key so arbitrary SKU strings are safe directory names
+        return os.path.join(self.storage_dir, hashlib.sha1(str(key).encode("utf-8")).hexdigest())
+
+    def _model_path(self, key, fingerprint):
+        return os.path.join(self._model_dir(key), f"{fingerprint}.json")
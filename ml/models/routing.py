@@ -0,0 +1,192 @@
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_matrix, vstack
+
+DEFAULT_SHIPMENT_COST = 5.0 # Fixed cost per (order, node) shipment, which discourages splits
+DEFAULT_TIME_LIMIT_SECONDS = 10.0
+DEFAULT_MIP_GAP = 0.02 # Stop once within 2% of the best possible shipping cost
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km between points given in degrees; NaN where
+    either point is unknown.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class OrderAllocator:
+    def __init__(self, shipment_cost=DEFAULT_SHIPMENT_COST, time_limit=DEFAULT_TIME_LIMIT_SECONDS,
+                 mip_gap=DEFAULT_MIP_GAP, cost_per_km=0.0):
+        self.shipment_cost = shipment_cost
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.cost_per_km = cost_per_km
+
+    def allocate(self, order_sku, order_quantity, stock_node, stock_sku, stock_available,
+                 node_cost, node_capacity=None, order_location=None, node_location=None):
+        """
+        Min-cost assignment of orders to nodes as one mixed-integer program.
+
+        Orders are (sku, quantity); stock entries are (node index, sku,
+        available units); node_cost is the cost per unit shipped from each
+        node and node_capacity (NaN = unlimited) caps the units a node ships
+        in this batch. An order can be split across nodes that stock its
+        SKU, each shipment adding `shipment_cost`. With order destinations
+        and node locations ((lat, lon) rows, NaN = unknown), each unit also
+        costs `cost_per_km` times the distance it travels; a node of unknown
+        location is costed as the order's farthest node. Orders are
+        filled whole or not at all; an unfilled order is penalized above
+        anything shipping it could cost, so orders go unfilled only when
+        stock or capacity runs out.
+
+        Returns a dict: allocations as parallel order_index/node/quantity
+        lists, a per-order `fulfilled` list, the solver status and the cost.
+        """
+        order_quantity = np.asarray(order_quantity, dtype=np.int64)
+        stock_node = np.asarray(stock_node, dtype=np.int64)
+        stock_available = np.maximum(np.asarray(stock_available, dtype=np.int64), 0)
+        node_cost = np.asarray(node_cost, dtype=float)
+        n_orders, n_nodes = len(order_quantity), len(node_cost)
+        if np.any(order_quantity <= 0):
+            raise ValueError("Order quantities must be positive")
+
+        # Arcs: every (order, stock entry) pair with the same SKU
+        _, codes = np.unique(np.concatenate([np.asarray(order_sku, dtype=str), np.asarray(stock_sku, dtype=str)]),
+                             return_inverse=True)
+        order_code, stock_code = codes[:n_orders], codes[n_orders:]
+        by_code = np.argsort(stock_code, kind="stable")
+        counts = np.bincount(stock_code, minlength=codes.max() + 1 if len(codes) else 0)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        per_order = counts[order_code] if n_orders else np.zeros(0, dtype=np.int64)
+        arc_order = np.repeat(np.arange(n_orders), per_order)
+        offsets = np.arange(len(arc_order)) - np.repeat(np.cumsum(per_order) - per_order, per_order)
+        arc_stock = by_code[np.repeat(starts[order_code], per_order) + offsets] if len(arc_order) else arc_order
+        keep = stock_available[arc_stock] > 0
+        arc_order, arc_stock = arc_order[keep], arc_stock[keep]
+        arc_node = stock_node[arc_stock]
+        n_arcs = len(arc_order)
+
+        if n_arcs == 0:
+            return self._result(arc_order, arc_node, np.zeros(0), np.zeros(n_orders, dtype=bool), "no stock", 0.0)
+
+        unit_cost = node_cost[arc_node]
+        if self.cost_per_km and order_location is not None and node_location is not None:
+            order_location = np.asarray(order_location, dtype=float).reshape(-1, 2)
+            node_location = np.asarray(node_location, dtype=float).reshape(-1, 2)
+            distance = haversine_km(order_location[arc_order, 0], order_location[arc_order, 1],
+                                    node_location[arc_node, 0], node_location[arc_node, 1])
+            # A node of unknown location counts as the order's farthest known
+            # one, so it isn't preferred for free; an order of unknown
+            # destination gets no distance term at all
+            farthest = np.zeros(n_orders)
+            np.maximum.at(farthest, arc_order, np.nan_to_num(distance))
+            destination_known = ~np.isnan(order_location[arc_order]).any(axis=1)
+            distance = np.where(np.isnan(distance), np.where(destination_known, farthest[arc_order], 0.0), distance)
+            unit_cost = unit_cost + self.cost_per_km * distance
+        # More than any way of shipping the order could cost
+        penalty = order_quantity * unit_cost.max() + self.shipment_cost * np.bincount(arc_order, minlength=n_orders) + 1.0
+
+        # Variables: units per arc (x), shipment used per arc (y), order left unfilled (u).
+        # Penalizing u rather than rewarding fills keeps the objective at the scale
+        # of the shipping cost, which the solver's relative gap is measured against.
+        x_upper = np.minimum(order_quantity[arc_order], stock_available[arc_stock])
+        c = np.concatenate([unit_cost, np.full(n_arcs, self.shipment_cost), penalty])
+        n_vars = 2 * n_arcs + n_orders
+        arcs = np.arange(n_arcs)
+
+        def rows(row, col, value, n_rows):
+            return coo_matrix((value, (row, col)), shape=(n_rows, n_vars))
+
+        # Each order gets all of its units, or none
+        demand = rows(
+            np.concatenate([arc_order, np.arange(n_orders)]),
+            np.concatenate([arcs, 2 * n_arcs + np.arange(n_orders)]),
+            np.concatenate([np.ones(n_arcs), order_quantity.astype(float)]),
+            n_orders,
+        )
+        # Stock per (node, SKU)
+        stock = rows(arc_stock, arcs, np.ones(n_arcs), len(stock_available))
+        # Units only flow on arcs whose shipment is paid for
+        link = rows(
+            np.concatenate([arcs, arcs]),
+            np.concatenate([arcs, n_arcs + arcs]),
+            np.concatenate([np.ones(n_arcs), -x_upper.astype(float)]),
+            n_arcs,
+        )
+        matrices = [demand, stock, link]
+        lower = [order_quantity.astype(float), np.zeros(len(stock_available)), np.full(n_arcs, -np.inf)]
+        upper = [order_quantity.astype(float), stock_available.astype(float), np.zeros(n_arcs)]
+
+        capacity = None if node_capacity is None else np.asarray(node_capacity, dtype=float)
+        if capacity is not None and not np.isnan(capacity).all():
+            capped = ~np.isnan(capacity[arc_node])
+            matrices.append(rows(arc_node[capped], arcs[capped], np.ones(capped.sum()), n_nodes))
+            lower.append(np.zeros(n_nodes))
+            upper.append(np.where(np.isnan(capacity), np.inf, capacity))
+
+        result = milp(
+            c,
+            integrality=np.ones(n_vars),
+            bounds=Bounds(np.zeros(n_vars), np.concatenate([x_upper, np.ones(n_arcs), np.ones(n_orders)])),
+            constraints=LinearConstraint(vstack(matrices).tocsr(), np.concatenate(lower), np.concatenate(upper)),
+            options={"time_limit": self.time_limit, "mip_rel_gap": self.mip_gap},
+        )
+        if result.x is None:
+            units, fulfilled = np.zeros(n_arcs), np.zeros(n_orders, dtype=bool)
+        else:
+            units = np.round(result.x[:n_arcs])
+            fulfilled = np.round(result.x[2 * n_arcs:]) == 0
+        # A solve stopped by the time limit can leave fillable orders behind
+        self._fill_greedy(arc_order, arc_stock, arc_node, unit_cost, x_upper, order_quantity,
+                          stock_available, capacity, units, fulfilled)
+        cost = float(unit_cost @ units + self.shipment_cost * np.count_nonzero(units))
+        return self._result(arc_order, arc_node, units, fulfilled, result.message, cost)
+
+    @staticmethod
+    def _fill_greedy(arc_order, arc_stock, arc_node, unit_cost, x_upper, order_quantity,
+                     stock_available, capacity, units, fulfilled):
+        """
+        Fill unfilled orders from what stock and capacity remain, cheapest
+        node first, preferring a single shipment. Updates units and
+        fulfilled in place.
+        """
+        unfilled = np.flatnonzero(~fulfilled)
+        if not len(unfilled):
+            return
+        stock_left = stock_available - np.bincount(arc_stock, weights=units, minlength=len(stock_available))
+        capacity_left = np.full(int(arc_node.max()) + 1, np.inf) if capacity is None else np.where(
+            np.isnan(capacity), np.inf, capacity)
+        capacity_left = capacity_left - np.bincount(arc_node, weights=units, minlength=len(capacity_left))
+        bounds = np.searchsorted(arc_order, np.stack([unfilled, unfilled + 1]))
+        for i, start, end in zip(unfilled, bounds[0], bounds[1]):
+            arcs = start + np.argsort(unit_cost[start:end], kind="stable")
+            room = np.minimum(np.minimum(stock_left[arc_stock[arcs]], capacity_left[arc_node[arcs]]), x_upper[arcs])
+            needed = order_quantity[i]
+            if room.sum() < needed:
+                continue
+            whole = np.flatnonzero(room >= needed)
+            take = np.zeros(len(arcs))
+            if len(whole):
+                take[whole[0]] = needed
+            else:
+                take = np.minimum(room, np.maximum(needed - (np.cumsum(room) - room), 0))
+            units[arcs] += take
+            np.subtract.at(stock_left, arc_stock[arcs], take)
+            np.subtract.at(capacity_left, arc_node[arcs], take)
+            fulfilled[i] = True
+
+    @staticmethod
+    def _result(arc_order, arc_node, units, fulfilled, status, cost):
+        used = units > 0
+        return {
+            "order_index": arc_order[used].tolist(),
+            "node": arc_node[used].tolist(),
+            "quantity": units[used].astype(np.int64).tolist(),
+            "fulfilled": fulfilled.tolist(),
+            "status": status,
+            "cost": cost,
+        }
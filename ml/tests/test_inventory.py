@@ -0,0 +1,56 @@
+import pytest
+
+from models.inventory import InventorySimulator
+
+
+def item(sku_id, **overrides):
+    values = dict(
+        sku_id=sku_id, demand_mean=10.0, demand_std=2.0, lead_time_mean=3.0, lead_time_std=0.5,
+        holding_cost=5.0, ordering_cost=20.0, policies=[(40.0, 80.0)],
+    )
+    values.update(overrides)
+    return values
+
+
+@pytest.fixture
+def simulator():
+    return InventorySimulator(n_paths=200, horizon_days=60, seed=7)
+
+
+def test_no_items(simulator):
+    assert simulator.best_policies([]) == []
+
+
+def test_cheapest_policy_meeting_the_target_wins(simulator):
+    # (0, 10) is cheapest but stocks out; (200, 400) meets the target at a higher holding cost
+    [result] = simulator.best_policies([
+        item("A", holding_cost=365.0, policies=[(0.0, 10.0), (200.0, 400.0), (40.0, 80.0)]),
+    ])
+    assert (result["s"], result["S"]) == (40.0, 80.0)
+    assert result["meets_target"]
+    assert result["policies_evaluated"] == 3
+
+
+def test_highest_fill_rate_wins_when_no_policy_meets_the_target(simulator):
+    [result] = simulator.best_policies([item("A", demand_mean=50.0, policies=[(0.0, 1.0), (5.0, 20.0)])])
+    assert (result["s"], result["S"]) == (5.0, 20.0)
+    assert not result["meets_target"]
+
+
+def test_policy_lists_of_different_lengths(simulator):
+    results = simulator.best_policies([
+        item("A", policies=[(40.0, 80.0)]),
+        item("B", policies=[(0.0, 1.0), (40.0, 80.0), (60.0, 120.0)]),
+    ])
+    assert [r["sku_id"] for r in results] == ["A", "B"]
+    assert [r["policies_evaluated"] for r in results] == [1, 3]
+    assert (results[0]["s"], results[0]["S"]) == (40.0, 80.0)
+
+
+def test_missing_initial_stock_defaults_to_that_items_S(simulator):
+    partial = simulator.best_policies([item("A", initial_stock=0.0), item("B")])
+    explicit = simulator.best_policies([item("A", initial_stock=0.0), item("B", initial_stock=80.0)])
+    defaulted = simulator.best_policies([item("A"), item("B")])
+    assert partial == explicit
+    # A still starts empty rather than at S
+    assert partial[0]["fill_rate"] < defaulted[0]["fill_rate"]
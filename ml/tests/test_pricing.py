@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from models.pricing import DynamicPricingEngine, fit_elasticities
+
+
+@pytest.fixture
+def engine():
+    return DynamicPricingEngine()
+
+
+def test_current_price_above_max_price_moves_to_the_max(engine):
+    result = engine.optimize_batch([100.0], [10.0], None, [10.0], [50.0], elasticity=[-1.5], unit_cost=[5.0])
+    assert result["recommended_price"] == [50.0]
+
+
+def test_current_price_below_min_price_moves_to_the_min(engine):
+    result = engine.optimize_batch([5.0], [10.0], None, [10.0], [100.0], elasticity=[-1.5], unit_cost=[1.0])
+    assert result["recommended_price"] == [10.0]
+
+
+def test_increase_cap_holds_against_the_step_window(engine):
+    result = engine.optimize_batch(
+        [100.0], [10.0], None, [10.0], [200.0], elasticity=[-0.5], unit_cost=[5.0],
+        max_increase_pct=[0.1], reference_price=[50.0],
+    )
+    assert result["recommended_price"][0] <= 55.0
+
+
+def test_min_price_floor_wins_over_the_increase_cap(engine):
+    result = engine.optimize_batch(
+        [100.0], [10.0], None, [80.0], [200.0], elasticity=[-3.0], unit_cost=[5.0],
+        max_increase_pct=[0.1], reference_price=[50.0],
+    )
+    assert result["recommended_price"] == [80.0]
+
+
+def test_moves_stay_within_the_step(engine):
+    result = engine.optimize_batch(
+        [10.0, 10.0], [100.0, 100.0], None, [1.0, 1.0], [100.0, 100.0],
+        elasticity=[-0.5, -5.0], unit_cost=[1.0, 9.0], max_step_pct=0.1,
+    )
+    assert result["recommended_price"] == [11.0, 11.0]
+
+
+def test_margin_optimum_inside_the_step_window(engine):
+    # Constant elasticity -2 and cost 5: margin peaks at 5 * -2 / (1 - 2) = 10
+    result = engine.optimize_batch([10.0], [100.0], None, [1.0], [100.0], elasticity=[-2.0], unit_cost=[5.0])
+    assert result["recommended_price"] == [10.0]
+    assert result["reason"] == ["Hold: current price is optimal"]
+
+
+def test_stock_caps_expected_units(engine):
+    result = engine.optimize_batch([10.0], [100.0], [20.0], [1.0], [100.0], elasticity=[-2.0], unit_cost=[5.0])
+    assert result["expected_units"] == [20.0]
+
+
+def test_unfitted_or_uncosted_skus_hold(engine):
+    result = engine.optimize_batch(
+        [10.0, 10.0], [100.0, 100.0], None, [1.0, 1.0], [100.0, 100.0],
+        elasticity=[np.nan, -2.0], unit_cost=[5.0, np.nan],
+    )
+    assert result["recommended_price"] == [10.0, 10.0]
+    assert result["elasticity"] == [None, -2.0]
+    assert result["expected_margin"][1] is None
+
+
+def test_revenue_objective_needs_no_cost(engine):
+    result = engine.optimize_batch([10.0], [100.0], None, [1.0], [100.0], elasticity=[-0.5], objective="revenue")
+    assert result["recommended_price"] == [11.0]
+
+
+def test_unknown_objective_is_rejected(engine):
+    with pytest.raises(ValueError):
+        engine.optimize_batch([10.0], [1.0], None, [1.0], [100.0], objective="volume")
+
+
+def test_fit_elasticities_recovers_the_slope():
+    price = np.tile([8.0, 9.0, 10.0, 11.0, 12.0], 4)
+    quantity = 1000 * price ** -1.8
+    elasticity, points = fit_elasticities(np.zeros(len(price), dtype=int), price, quantity, 2)
+    assert elasticity[0] == pytest.approx(-1.8)
+    assert np.isnan(elasticity[1])
+    assert points.tolist() == [20, 0]
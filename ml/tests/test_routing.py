@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from models.routing import OrderAllocator
+
+
+@pytest.fixture
+def allocator():
+    return OrderAllocator(shipment_cost=5.0)
+
+
+def shipments(result):
+    return sorted(zip(result["order_index"], result["node"], result["quantity"]))
+
+
+def test_cheapest_node_ships_the_whole_order(allocator):
+    result = allocator.allocate(["A"], [4], [0, 1], ["A", "A"], [10, 10], [2.0, 1.0])
+    assert shipments(result) == [(0, 1, 4)]
+    assert result["fulfilled"] == [True]
+    assert result["cost"] == 4 * 1.0 + 5.0
+
+
+def test_order_is_split_when_no_node_has_enough(allocator):
+    result = allocator.allocate(["A"], [10], [0, 1], ["A", "A"], [6, 6], [1.0, 2.0])
+    assert shipments(result) == [(0, 0, 6), (0, 1, 4)]
+    assert result["fulfilled"] == [True]
+
+
+def test_orders_are_filled_whole_or_not_at_all(allocator):
+    result = allocator.allocate(["A", "A"], [6, 6], [0], ["A"], [10], [1.0])
+    assert sorted(result["fulfilled"]) == [False, True]
+    assert sum(result["quantity"]) == 6
+
+
+def test_capacity_caps_a_node_across_orders(allocator):
+    result = allocator.allocate(
+        ["A", "B"], [5, 5], [0, 0, 1], ["A", "B", "B"], [10, 10, 10], [1.0, 3.0], node_capacity=[5, np.nan],
+    )
+    assert shipments(result) == [(0, 0, 5), (1, 1, 5)]
+    assert result["fulfilled"] == [True, True]
+
+
+def test_capacity_leaves_an_order_unfilled(allocator):
+    result = allocator.allocate(["A", "A"], [5, 5], [0], ["A"], [10], [1.0], node_capacity=[5])
+    assert sorted(result["fulfilled"]) == [False, True]
+    assert sum(result["quantity"]) == 5
+
+
+def test_distance_outweighs_priority(allocator):
+    allocator.cost_per_km = 0.02
+    result = allocator.allocate(
+        ["A"], [1], [0, 1], ["A", "A"], [5, 5], [1.0, 2.0],
+        order_location=[(6.93, 79.85)], node_location=[(9.66, 80.02), (6.90, 79.86)],
+    )
+    assert shipments(result) == [(0, 1, 1)]
+
+
+def test_no_stock(allocator):
+    result = allocator.allocate(["A"], [1], [0], ["B"], [5], [1.0])
+    assert result["fulfilled"] == [False]
+    assert result["status"] == "no stock"
+
+
+def test_non_positive_quantity_is_rejected(allocator):
+    with pytest.raises(ValueError):
+        allocator.allocate(["A"], [0], [0], ["A"], [5], [1.0])
+
+
+def test_greedy_fill_prefers_one_shipment_from_the_cheapest_node():
+    # One order of 4 on three arcs, nothing allocated by the solver yet
+    arc_order, arc_stock, arc_node = np.array([0, 0, 0]), np.array([0, 1, 2]), np.array([0, 1, 2])
+    unit_cost = np.array([3.0, 1.0, 2.0])
+    units, fulfilled = np.zeros(3), np.array([False])
+    OrderAllocator._fill_greedy(
+        arc_order, arc_stock, arc_node, unit_cost, np.array([4, 2, 4]), np.array([4]),
+        np.array([4, 2, 4]), None, units, fulfilled,
+    )
+    assert units.tolist() == [0.0, 0.0, 4.0]
+    assert fulfilled.tolist() == [True]
+
+
+def test_greedy_fill_splits_within_capacity():
+    arc_order, arc_stock, arc_node = np.array([0, 0]), np.array([0, 1]), np.array([0, 1])
+    units, fulfilled = np.zeros(2), np.array([False])
+    OrderAllocator._fill_greedy(
+        arc_order, arc_stock, arc_node, np.array([1.0, 2.0]), np.array([5, 4]), np.array([5]),
+        np.array([5, 4]), np.array([3.0, np.nan]), units, fulfilled,
+    )
+    assert units.tolist() == [3.0, 2.0]
+    assert fulfilled.tolist() == [True]